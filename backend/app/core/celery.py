@@ -0,0 +1,76 @@
+"""
+Celery application for the async job queue.
+
+Workers are scaled independently of the API:
+    celery -A app.core.celery worker -Q ai.high,ai.default,ai.low --concurrency 2
+
+Each job runs an AIService/VoiceService call through
+app.services.job_queue.run_job, which records the outcome in the shared
+Redis job store the API polls. Tasks are acknowledged only after they
+finish and each worker prefetches one task at a time, so a crashed worker's
+job is redelivered and a long job never holds others back in its prefetch
+buffer. Queues are consumed in priority order.
+"""
+import asyncio
+import os
+
+from celery import Celery
+from celery.signals import worker_process_init
+from kombu import Queue
+
+from app.services.job_queue import PRIORITIES, QUEUE_PREFIX, JobServices, RedisJobStore, run_job
+
+celery_app = Celery(
+    'agriwise',
+    broker=os.getenv('CELERY_BROKER_URL', 'redis://localhost:6379/0'),
+    backend=os.getenv('CELERY_RESULT_BACKEND'),
+)
+celery_app.conf.update(
+    task_queues=[Queue(f'{QUEUE_PREFIX}.{priority}') for priority in PRIORITIES],
+    task_default_queue=f'{QUEUE_PREFIX}.default',
+    task_acks_late=True,
+    task_reject_on_worker_lost=True,
+    worker_prefetch_multiplier=int(os.getenv('CELERY_PREFETCH_MULTIPLIER', '1')),
+    broker_transport_options={'queue_order_strategy': 'priority'},
+    # Results live in the job store, not the Celery result backend
+    task_ignore_result=True,
+    task_serializer='json',
+    accept_content=['json'],
+)
+
+# `celery -A app.core.celery` looks for an attribute named app
+app = celery_app
+
+_loop = None
+_store = None
+_services = None
+
+
+def _run(coroutine):
+    """Run on one event loop per worker process, so AIService's batcher and pools stay bound to it"""
+    global _loop
+    if _loop is None:
+        _loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(_loop)
+    return _loop.run_until_complete(coroutine)
+
+
+def _context():
+    global _store, _services
+    if _store is None:
+        _store = RedisJobStore(os.getenv('REDIS_URL', 'redis://localhost:6379'))
+        _services = JobServices()
+    return _store, _services
+
+
+@worker_process_init.connect
+def _load_models(**kwargs):
+    """Start loading models when the worker process starts, not on its first job"""
+    _, services = _context()
+    _run(services.ai())
+
+
+@celery_app.task(name='agriwise.run_job')
+def execute_job(job_id: str):
+    store, services = _context()
+    return _run(run_job(store, services, job_id))
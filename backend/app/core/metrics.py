@@ -0,0 +1,253 @@
+"""
+In-process metrics with Prometheus text exposition.
+
+Counters, gauges and histograms are plain Python objects updated under a
+per-metric lock, cheap enough to record on every request. ``span`` times a
+block of code into the per-stage histogram, ``MetricsMiddleware`` records
+request counts, latency and in-flight requests per route template, and
+``REGISTRY.render()`` produces the ``/metrics`` response.
+
+Each worker process keeps its own metrics; scrape every worker (or run one
+worker per container) to see them all.
+"""
+import bisect
+import math
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Dict, Iterable, List, Tuple
+
+# Seconds; spans image stages (sub-ms) up to slow batch requests
+DEFAULT_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0
+)
+
+# Route label for requests that matched no route, so unknown paths can't grow the label set
+UNMATCHED_ROUTE = 'unmatched'
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = '') -> str:
+    pairs = [
+        '{}="{}"'.format(name, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for name, value in zip(names, values)
+    ]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return '+Inf'
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric(ABC):
+    kind = ''
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    @abstractmethod
+    def _samples(self) -> List[str]:
+        ...
+
+    def render(self) -> str:
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+        return '\n'.join(lines + self._samples())
+
+
+class Counter(_Metric):
+    """Monotonically increasing count per label set"""
+
+    kind = 'counter'
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *labelvalues: str, amount: float = 1):
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0) + amount
+
+    def value(self, *labelvalues: str) -> float:
+        return self._values.get(labelvalues, 0)
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            snapshot = sorted(self._values.items())
+        return [f'{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}' for labels, value in snapshot]
+
+
+class Gauge(Counter):
+    """A value per label set that can go up and down"""
+
+    kind = 'gauge'
+
+    def set(self, value: float, *labelvalues: str):
+        with self._lock:
+            self._values[labelvalues] = value
+
+    def dec(self, *labelvalues: str, amount: float = 1):
+        self.inc(*labelvalues, amount=-amount)
+
+
+class Histogram(_Metric):
+    """Bucketed distribution of observed values per label set"""
+
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                 buckets: Iterable[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> [per-bucket counts (last one is +Inf), sum]
+        self._values: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, *labelvalues: str):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._values.get(labelvalues)
+            if series is None:
+                series = self._values[labelvalues] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def count(self, *labelvalues: str) -> int:
+        series = self._values.get(labelvalues)
+        return sum(series[0]) if series else 0
+
+    def _samples(self) -> List[str]:
+        lines = []
+        with self._lock:
+            snapshot = [(labels, list(counts), total) for labels, (counts, total) in sorted(self._values.items())]
+        for labels, counts, total in snapshot:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f'{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}')
+            label_text = _format_labels(self.labelnames, labels)
+            lines.append(f'{self.name}_sum{label_text} {_format_value(total)}')
+            lines.append(f'{self.name}_count{label_text} {cumulative}')
+        return lines
+
+
+class MetricsRegistry:
+    """Named metrics, rendered together in the Prometheus text format"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name: str, *args, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, *args, **kwargs)
+            elif type(metric) is not cls:
+                raise ValueError(f"Metric {name} is already registered as a {metric.kind}")
+            return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> Counter:
+        return self._get_or_create(Counter, name, documentation, labelnames)
+
+    def gauge(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> Gauge:
+        return self._get_or_create(Gauge, name, documentation, labelnames)
+
+    def histogram(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                  buckets: Iterable[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._get_or_create(Histogram, name, documentation, labelnames, buckets)
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return '\n'.join(metric.render() for metric in metrics) + '\n'
+
+
+REGISTRY = MetricsRegistry()
+
+HTTP_REQUESTS = REGISTRY.counter(
+    'agriwise_http_requests_total', 'HTTP requests by route template and status code', ('method', 'route', 'status')
+)
+HTTP_LATENCY = REGISTRY.histogram(
+    'agriwise_http_request_duration_seconds', 'HTTP request latency by route template', ('method', 'route')
+)
+HTTP_IN_FLIGHT = REGISTRY.gauge('agriwise_http_requests_in_flight', 'HTTP requests currently being served')
+STAGE_LATENCY = REGISTRY.histogram(
+    'agriwise_stage_duration_seconds', 'Time spent in internal processing stages', ('stage',)
+)
+MODEL_LOAD_SECONDS = REGISTRY.gauge('agriwise_model_load_seconds', 'Time taken to load each model', ('model',))
+MODEL_READY = REGISTRY.gauge('agriwise_model_ready', 'Whether a model has finished loading', ('model',))
+
+
+class span:
+    """
+    Time a block into the stage histogram:
+
+        with span('decode'):
+            image = Image.open(...)
+    """
+
+    __slots__ = ('stage', 'started')
+
+    def __init__(self, stage: str):
+        self.stage = stage
+
+    def __enter__(self) -> "span":
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        STAGE_LATENCY.observe(time.perf_counter() - self.started, self.stage)
+        return False
+
+
+def observe_stage(stage: str, seconds: float):
+    """Record a stage timing measured elsewhere (e.g. on a worker process)"""
+    STAGE_LATENCY.observe(seconds, stage)
+
+
+class MetricsMiddleware:
+    """
+    Pure ASGI middleware recording request count, latency and in-flight
+    requests. Requests are labelled with the matched route's path template
+    (``/api/v1/weather/{location}``), never the raw path.
+    """
+
+    def __init__(self, app, exclude: Iterable[str] = ('/metrics',)):
+        self.app = app
+        self.exclude = frozenset(exclude)
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or scope['path'] in self.exclude:
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        started = time.perf_counter()
+
+        async def send_with_status(message):
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+            await send(message)
+
+        HTTP_IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            HTTP_IN_FLIGHT.dec()
+            # The router stores the matched route in the (shared) scope
+            route = scope.get('route')
+            template = getattr(route, 'path', None) or UNMATCHED_ROUTE
+            HTTP_LATENCY.observe(time.perf_counter() - started, scope['method'], template)
+            HTTP_REQUESTS.inc(scope['method'], template, str(status))
+
+
+def render_latest() -> Tuple[bytes, str]:
+    """The /metrics response body and content type"""
+    return REGISTRY.render().encode(), 'text/plain; version=0.0.4; charset=utf-8'
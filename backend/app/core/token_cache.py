@@ -0,0 +1,303 @@
+import base64
+import hashlib
+import json
+import logging
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+JWT_BACKENDS = ('jose', 'pyjwt')
+
+# Upper bound on how long a verified token is trusted without re-checking its signature
+MAX_TTL_SECONDS = float(os.getenv('JWT_CACHE_MAX_TTL_SECONDS', '900'))
+
+
+class TokenRevokedError(Exception):
+    """Raised for a token, or a token of a user, that has been revoked"""
+
+
+def make_verifier(backend: str = 'jose') -> Callable[[str], Dict[str, Any]]:
+    """
+    The function that checks a token's signature and returns its claims.
+
+    ``jose`` is the existing ``verify_token``; ``pyjwt`` decodes with PyJWT
+    using the same SECRET_KEY and ALGORITHM settings, which is noticeably
+    cheaper per call for HMAC tokens.
+    """
+    if backend not in JWT_BACKENDS:
+        raise ValueError(f"Unknown JWT backend '{backend}', expected one of {JWT_BACKENDS}")
+
+    if backend == 'jose':
+        from app.core.security import verify_token
+        return verify_token
+
+    import jwt
+
+    from app.core.config import settings
+
+    secret_key = getattr(settings, 'SECRET_KEY', None)
+    if not secret_key:
+        raise ValueError("JWT_BACKEND=pyjwt needs SECRET_KEY in the settings (environment or .env file)")
+    algorithms = [getattr(settings, 'ALGORITHM', None) or 'HS256']
+
+    def verify_pyjwt(token: str) -> Dict[str, Any]:
+        return jwt.decode(token, secret_key, algorithms=algorithms)
+
+    return verify_pyjwt
+
+
+def _unverified_claims(token: str) -> Dict[str, Any]:
+    """The payload segment without checking the signature; only used to size revocation entries"""
+    try:
+        payload = token.split('.')[1]
+        return json.loads(base64.urlsafe_b64decode(payload + '=' * (-len(payload) % 4)))
+    except Exception:
+        return {}
+
+
+class RedisRevocationStore:
+    """
+    Revocations shared by every worker through Redis.
+
+    A revoked token is a key named after its digest that expires with the
+    token; a revoked user is a key holding the ``iat`` cutoff. Calls are
+    synchronous with a short timeout: they only happen on a cache miss, a
+    periodic re-check or a revocation.
+    """
+
+    def __init__(self, redis_url: str, namespace: str = 'agriwise:revoked', timeout: float = 0.1):
+        import redis
+
+        self.namespace = namespace
+        self._redis = redis.Redis.from_url(redis_url, socket_timeout=timeout, socket_connect_timeout=timeout)
+
+    def revoke_token(self, digest: bytes, ttl: float):
+        self._redis.set(f'{self.namespace}:token:{digest.hex()}', 1, ex=max(1, math.ceil(ttl)))
+
+    def revoke_subject(self, subject: str, cutoff: float):
+        self._redis.set(f'{self.namespace}:subject:{subject}', cutoff)
+
+    def lookup(self, digest: bytes, subject: str) -> Tuple[bool, Optional[float]]:
+        """Whether the token is revoked, and the user's cutoff if any"""
+        pipe = self._redis.pipeline(transaction=False)
+        pipe.exists(f'{self.namespace}:token:{digest.hex()}')
+        pipe.get(f'{self.namespace}:subject:{subject}')
+        revoked, cutoff = pipe.execute()
+        return bool(revoked), float(cutoff) if cutoff is not None else None
+
+
+class VerifiedTokenCache:
+    """
+    Bounded LRU of tokens whose signature has already been verified.
+
+    Entries are keyed by the SHA-256 of the token (the token itself is never
+    kept) and hold the decoded claims until the token's ``exp``, capped at
+    ``max_ttl`` seconds. Only successful verifications are cached, so a bad
+    token pays the full check every time.
+
+    ``revoke`` rejects one token until it expires; ``revoke_subject`` rejects
+    every token of a user issued before now (by ``iat``). Without a
+    ``revocations`` store they only apply to this process. With one (Redis,
+    when REDIS_URL is set) they are written there too, every cache miss is
+    checked against it, and cached tokens are re-checked at most every
+    ``recheck_seconds``, so a revocation in one worker reaches the others
+    within that interval. If the store is unreachable, tokens are accepted
+    on the local state alone and the store is retried after
+    ``store_retry_seconds``.
+    """
+
+    def __init__(self, verify: Callable[[str], Dict[str, Any]], max_entries: int = 10000,
+                 max_ttl: float = MAX_TTL_SECONDS, clock: Callable[[], float] = time.time,
+                 revocations: Optional[RedisRevocationStore] = None, recheck_seconds: float = 5.0,
+                 store_retry_seconds: float = 30.0):
+        self.verify_signature = verify
+        self.max_entries = max_entries
+        self.max_ttl = max_ttl
+        self.clock = clock
+        self.revocations = revocations
+        self.recheck_seconds = recheck_seconds
+        self.store_retry_seconds = store_retry_seconds
+        self._store_disabled_until = 0.0
+
+        # digest -> (claims, expires_at, revocations last checked at)
+        self._entries: OrderedDict = OrderedDict()
+        # digest -> expires_at, and subject -> tokens issued before this time are revoked
+        self._revoked_tokens: Dict[bytes, float] = {}
+        self._revoked_subjects: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.rejected = 0
+        self.store_checks = 0
+        self.store_errors = 0
+
+    @classmethod
+    def from_env(cls) -> "VerifiedTokenCache":
+        verify = make_verifier(os.getenv('JWT_BACKEND', 'jose'))
+        revocations = None
+        redis_url = os.getenv('REDIS_URL')
+        if redis_url:
+            try:
+                revocations = RedisRevocationStore(redis_url)
+            except Exception as e:
+                logger.warning(f"Token revocations are per worker, Redis unavailable: {str(e)}")
+        return cls(
+            verify,
+            max_entries=int(os.getenv('JWT_CACHE_SIZE', '10000')),
+            revocations=revocations,
+            recheck_seconds=float(os.getenv('JWT_REVOCATION_CHECK_SECONDS', '5')),
+        )
+
+    @staticmethod
+    def _digest(token: str) -> bytes:
+        return hashlib.sha256(token.encode()).digest()
+
+    def _check_revoked(self, digest: bytes, claims: Dict[str, Any]):
+        if digest in self._revoked_tokens:
+            raise TokenRevokedError("Token has been revoked")
+        cutoff = self._revoked_subjects.get(str(claims.get('sub')))
+        if cutoff is not None and claims.get('iat') is not None and claims['iat'] < cutoff:
+            raise TokenRevokedError("Token has been revoked")
+
+    def verify(self, token: str) -> Dict[str, Any]:
+        """Claims of a valid token; raises whatever the verifier raises, or TokenRevokedError"""
+        digest = self._digest(token)
+        now = self.clock()
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is not None:
+                claims, expires_at, checked_at = entry
+                if expires_at > now:
+                    self._entries.move_to_end(digest)
+                    self.hits += 1
+                    if not self._needs_store_check(checked_at, now):
+                        return claims
+                else:
+                    del self._entries[digest]
+                    self.expirations += 1
+                    entry = None
+            if entry is None:
+                self.misses += 1
+
+        # A cached token due for a revocation re-check skips the signature check
+        if entry is None:
+            # Outside the lock: the signature check is the expensive part
+            claims = self.verify_signature(token)
+            if not claims:
+                raise ValueError("Invalid token")
+        checked = self._sync_revocations(digest, claims, now)
+
+        with self._lock:
+            try:
+                self._check_revoked(digest, claims)
+            except TokenRevokedError:
+                self.rejected += 1
+                self._entries.pop(digest, None)
+                raise
+            if entry is not None:
+                if checked and digest in self._entries:
+                    self._entries[digest] = (claims, expires_at, now)
+                return claims
+
+            expires_at = now + self.max_ttl
+            if 'exp' in claims:
+                expires_at = min(expires_at, float(claims['exp']))
+            if expires_at > now:
+                self._entries[digest] = (claims, expires_at, now if checked else 0.0)
+                self._entries.move_to_end(digest)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+                    self.evictions += 1
+        return claims
+
+    def _store_available(self, now: float) -> bool:
+        return self.revocations is not None and now >= self._store_disabled_until
+
+    def _needs_store_check(self, checked_at: float, now: float) -> bool:
+        return self._store_available(now) and now - checked_at >= self.recheck_seconds
+
+    def _store_failed(self, error: Exception, now: float):
+        self.store_errors += 1
+        self._store_disabled_until = now + self.store_retry_seconds
+        logger.warning(f"Token revocation store error, retrying in {self.store_retry_seconds:.0f}s: {str(error)}")
+
+    def _sync_revocations(self, digest: bytes, claims: Dict[str, Any], now: float) -> bool:
+        """Copy this token's and user's revocations from the shared store; False if it couldn't be asked"""
+        if not self._store_available(now):
+            return False
+        subject = str(claims.get('sub'))
+        try:
+            revoked, cutoff = self.revocations.lookup(digest, subject)
+        except Exception as e:
+            self._store_failed(e, now)
+            return False
+        with self._lock:
+            self.store_checks += 1
+            if revoked:
+                self._revoked_tokens[digest] = float(claims.get('exp', now + self.max_ttl))
+            if cutoff is not None and cutoff > self._revoked_subjects.get(subject, float('-inf')):
+                self._revoked_subjects[subject] = cutoff
+        return True
+
+    def revoke(self, token: str):
+        """
+        Reject this token from now on, until it would have expired anyway.
+        Raises if the shared store can't record it, since other workers
+        would still accept the token.
+        """
+        digest = self._digest(token)
+        now = self.clock()
+        with self._lock:
+            entry = self._entries.pop(digest, None)
+            claims = entry[0] if entry else _unverified_claims(token)
+            expires_at = float(claims.get('exp', now + self.max_ttl))
+            self._revoked_tokens[digest] = expires_at
+            # Drop denylist entries for tokens that have expired on their own
+            for expired in [d for d, until in self._revoked_tokens.items() if until <= now]:
+                del self._revoked_tokens[expired]
+        if self.revocations is not None and expires_at > now:
+            self.revocations.revoke_token(digest, expires_at - now)
+
+    def revoke_subject(self, subject: str, issued_before: Optional[float] = None):
+        """
+        Reject tokens of a user issued before ``issued_before`` (default now).
+        Tokens without an ``iat`` can't be dated, so they are only evicted
+        and re-verified; revoke those individually. Raises like ``revoke``.
+        """
+        cutoff = issued_before if issued_before is not None else self.clock()
+        with self._lock:
+            self._revoked_subjects[str(subject)] = cutoff
+            for digest in [d for d, entry in self._entries.items() if str(entry[0].get('sub')) == str(subject)]:
+                del self._entries[digest]
+        if self.revocations is not None:
+            self.revocations.revoke_subject(str(subject), cutoff)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self._entries),
+            'max_entries': self.max_entries,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else None,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+            'revoked_tokens': len(self._revoked_tokens),
+            'revoked_subjects': len(self._revoked_subjects),
+            'rejected': self.rejected,
+            'shared_revocations': self.revocations is not None,
+            'store_checks': self.store_checks,
+            'store_errors': self.store_errors,
+        }
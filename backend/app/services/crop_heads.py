@@ -0,0 +1,99 @@
+import logging
+import os
+import tempfile
+import zlib
+from typing import Dict, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+def softmax(logits: np.ndarray) -> np.ndarray:
+    shifted = np.exp(logits - logits.max(axis=1, keepdims=True))
+    return shifted / shifted.sum(axis=1, keepdims=True)
+
+
+class CropHeads:
+    """
+    Lightweight per-crop classification heads over the shared backbone features.
+
+    Each head is a single dense softmax layer (``feature_dim x num_classes``
+    weights plus biases, a few hundred floats), applied in NumPy after the
+    backbone has run once per image. Adding a crop therefore costs kilobytes
+    instead of a whole model, and one image can be scored for several crops.
+    """
+
+    def __init__(self, weights: Dict[str, np.ndarray], biases: Dict[str, np.ndarray]):
+        self.weights = weights
+        self.biases = biases
+
+    @classmethod
+    def initialize(cls, disease_classes: Dict[str, List[str]], feature_dim: int, seed: int = 0) -> "CropHeads":
+        """Glorot-uniform heads for every crop; the seed keeps all workers identical"""
+        weights, biases = {}, {}
+        for crop, classes in disease_classes.items():
+            rng = np.random.default_rng([seed, zlib.crc32(crop.encode())])
+            limit = np.sqrt(6.0 / (feature_dim + len(classes)))
+            weights[crop] = rng.uniform(-limit, limit, (feature_dim, len(classes))).astype(np.float32)
+            biases[crop] = np.zeros(len(classes), dtype=np.float32)
+        return cls(weights, biases)
+
+    @classmethod
+    def load(cls, path: str) -> "CropHeads":
+        """Load heads saved with :meth:`save`"""
+        weights, biases = {}, {}
+        with np.load(path) as archive:
+            for key in archive.files:
+                kind, crop = key.split('/', 1)
+                (weights if kind == 'weights' else biases)[crop] = archive[key]
+        return cls(weights, biases)
+
+    @classmethod
+    def load_or_initialize(cls, path: str, disease_classes: Dict[str, List[str]], feature_dim: int) -> "CropHeads":
+        """Load trained heads, initializing (and caching) any crop without one"""
+        heads = cls.load(path) if os.path.exists(path) else cls({}, {})
+
+        missing = {crop: classes for crop, classes in disease_classes.items() if crop not in heads.weights}
+        if missing:
+            logger.info(f"Initializing classification heads for {', '.join(sorted(missing))}")
+            initialized = cls.initialize(missing, feature_dim)
+            heads.weights.update(initialized.weights)
+            heads.biases.update(initialized.biases)
+            try:
+                heads.save(path)
+            except Exception as e:
+                logger.warning(f"Could not cache crop heads at {path}: {str(e)}")
+        return heads
+
+    def save(self, path: str):
+        """Write to a temporary file and replace path with it, so readers never see a partial archive"""
+        directory = os.path.dirname(path) or '.'
+        os.makedirs(directory, exist_ok=True)
+        arrays = {f'weights/{crop}': w for crop, w in self.weights.items()}
+        arrays.update({f'biases/{crop}': b for crop, b in self.biases.items()})
+        fd, staging = tempfile.mkstemp(prefix=f'.{os.path.basename(path)}-', dir=directory)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                np.savez(f, **arrays)
+            os.replace(staging, path)
+        except BaseException:
+            os.remove(staging)
+            raise
+
+    @property
+    def crops(self) -> List[str]:
+        return list(self.weights)
+
+    def predict(self, features: np.ndarray, crop_type: str) -> np.ndarray:
+        """Class probabilities (N, num_classes) for one crop"""
+        return softmax(features @ self.weights[crop_type] + self.biases[crop_type])
+
+    def predict_all(self, features: np.ndarray, crop_types: Optional[List[str]] = None) -> Dict[str, np.ndarray]:
+        """Class probabilities for several crops from the same features"""
+        return {crop: self.predict(features, crop) for crop in crop_types or self.crops}
+
+    def nbytes(self, crop_type: Optional[str] = None) -> int:
+        """Memory used by one head, or by all of them"""
+        crops = [crop_type] if crop_type else self.crops
+        return sum(self.weights[c].nbytes + self.biases[c].nbytes for c in crops)
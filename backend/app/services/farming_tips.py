@@ -0,0 +1,138 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TIPS_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data', 'farming_tips.json')
+
+# Index key for "no filter" and for crops/seasons no tip names explicitly
+ANY = '*'
+OTHER = '?'
+
+
+class TipsEntry:
+    """One precomputed farming-tips response"""
+
+    __slots__ = ('tips', 'body', 'etag')
+
+    def __init__(self, tips: List[Dict[str, Any]], timestamp: str):
+        self.tips = tips
+        self.body = json.dumps({'success': True, 'tips': tips, 'timestamp': timestamp}).encode()
+        self.etag = '"' + hashlib.sha256(self.body).hexdigest()[:32] + '"'
+
+
+class FarmingTipsIndex:
+    """
+    Farming tips loaded once from a JSON data file into an inverted index.
+
+    Every (crop, season) combination, including "no filter" and "a crop or
+    season with no specific tips", maps to a ready-made response whose tips
+    include the ``'all'`` entries, so a lookup is a dict get plus a
+    normalization. The file is re-checked at most every ``check_interval``
+    seconds and reloaded when its mtime changes; a file that fails to load
+    leaves the previous index in place.
+    """
+
+    def __init__(self, path: str = DEFAULT_TIPS_PATH, check_interval: float = 2.0):
+        self.path = path
+        self.check_interval = check_interval
+        self.loaded_at: Optional[str] = None
+        self.reloads = 0
+
+        self._entries: Dict[Tuple[str, str], TipsEntry] = {}
+        self._mtime = None
+        self._next_check = 0.0
+        self._lock = threading.Lock()
+        self.reload()
+
+    @staticmethod
+    def _build(data: Dict[str, Any], timestamp: str) -> Dict[Tuple[str, str], TipsEntry]:
+        tips = data['tips']
+        crops = {c for tip in tips for c in tip['applicable_crops']} - {'all'}
+        seasons = (set(data.get('seasons', [])) | {s for tip in tips for s in tip.get('applicable_seasons', ['all'])}) - {'all'}
+
+        def matches(values: List[str], key: str) -> bool:
+            return key == ANY or 'all' in values or key in values
+
+        entries = {}
+        for crop in crops | {ANY, OTHER}:
+            for season in seasons | {ANY, OTHER}:
+                selected = [
+                    tip for tip in tips
+                    if matches(tip['applicable_crops'], crop) and matches(tip.get('applicable_seasons', ['all']), season)
+                ]
+                entries[(crop, season)] = TipsEntry(selected, timestamp)
+        return entries
+
+    def reload(self) -> bool:
+        """Rebuild the index from the data file; returns False if it could not be loaded"""
+        with self._lock:
+            try:
+                mtime = os.stat(self.path).st_mtime_ns
+                with open(self.path) as f:
+                    data = json.load(f)
+                loaded_at = datetime.utcnow().isoformat()
+                entries = self._build(data, loaded_at)
+            except Exception as e:
+                logger.error(f"Could not load farming tips from {self.path}: {str(e)}")
+                return False
+
+            # Swapped in one assignment, so readers never see a half-built index
+            self._entries = entries
+            self._mtime = mtime
+            self.loaded_at = loaded_at
+            self.reloads += 1
+            logger.info(f"Loaded {len(data['tips'])} farming tips into {len(entries)} precomputed responses")
+            return True
+
+    def _maybe_reload(self):
+        now = time.monotonic()
+        if now < self._next_check:
+            return
+        self._next_check = now + self.check_interval
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except OSError:
+            return
+        if mtime != self._mtime:
+            # Remember the attempt so a broken file is retried on its next change, not every check
+            self._mtime = mtime
+            self.reload()
+
+    def lookup(self, crop_type: Optional[str] = None, season: Optional[str] = None) -> TipsEntry:
+        """The precomputed response for a crop/season filter"""
+        self._maybe_reload()
+        crop = crop_type.strip().lower() if crop_type else ANY
+        season = season.strip().lower() if season else ANY
+        entries = self._entries
+
+        entry = entries.get((crop, season))
+        if entry is None:
+            crop = crop if (crop, ANY) in entries else OTHER
+            season = season if (ANY, season) in entries else OTHER
+            entry = entries[(crop, season)]
+        return entry
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'path': self.path,
+            'responses': len(self._entries),
+            'loaded_at': self.loaded_at,
+            'reloads': self.reloads,
+        }
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Whether an If-None-Match header covers the current ETag (weak comparison)"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    candidates = (tag.strip() for tag in if_none_match.split(','))
+    return any((tag[2:] if tag.startswith('W/') else tag) == etag for tag in candidates)
@@ -0,0 +1,45 @@
+from collections import Counter
+from typing import Any, Dict
+
+
+class FieldSurveySummary:
+    """Field-level aggregate of a batch of disease detections"""
+
+    def __init__(self, crop_type: str, total: int):
+        self.crop_type = crop_type
+        self.total = total
+        self.diseases = Counter()
+        self.severities = Counter()
+        self.errors = Counter()
+        self.confidence_sum = 0.0
+
+    def add_result(self, result: Dict[str, Any]):
+        self.diseases[result['disease']] += 1
+        self.severities[result['severity']] += 1
+        self.confidence_sum += result['confidence']
+
+    def add_error(self, status_code: int):
+        self.errors[status_code] += 1
+
+    @property
+    def succeeded(self) -> int:
+        return sum(self.diseases.values())
+
+    def to_dict(self) -> Dict[str, Any]:
+        succeeded = self.succeeded
+        prevalence = {
+            disease: {'count': count, 'fraction': round(count / succeeded, 4)}
+            for disease, count in self.diseases.most_common()
+        }
+        healthy = self.diseases.get('Healthy', 0)
+        return {
+            'crop_type': self.crop_type,
+            'total_images': self.total,
+            'analyzed': succeeded,
+            'failed': sum(self.errors.values()),
+            'prevalence': prevalence,
+            'infected_fraction': round((succeeded - healthy) / succeeded, 4) if succeeded else None,
+            'severity_counts': dict(self.severities),
+            'mean_confidence': round(self.confidence_sum / succeeded, 2) if succeeded else None,
+            'errors': {str(code): count for code, count in self.errors.items()},
+        }
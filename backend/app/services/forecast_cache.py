@@ -0,0 +1,258 @@
+import asyncio
+import logging
+import os
+import re
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Tuple
+
+logger = logging.getLogger(__name__)
+
+GEOHASH_ALPHABET = '0123456789bcdefghjkmnpqrstuvwxyz'
+
+# Trailing country name dropped from place-name keys ("Nakuru, Kenya" is "Nakuru")
+DEFAULT_COUNTRY = os.getenv('WEATHER_DEFAULT_COUNTRY', 'kenya').casefold()
+
+COORDINATES = re.compile(r'^\s*(-?\d+(?:\.\d+)?)\s*,\s*(-?\d+(?:\.\d+)?)\s*$')
+
+
+def geohash_encode(latitude: float, longitude: float, precision: int) -> str:
+    """Standard base-32 geohash of a point"""
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars, bits, value, even = [], 0, 0, True
+    while len(chars) < precision:
+        interval, coordinate = (lon_range, longitude) if even else (lat_range, latitude)
+        middle = (interval[0] + interval[1]) / 2
+        value <<= 1
+        if coordinate >= middle:
+            value |= 1
+            interval[0] = middle
+        else:
+            interval[1] = middle
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(GEOHASH_ALPHABET[value])
+            bits, value = 0, 0
+    return ''.join(chars)
+
+
+def geohash_center(geohash: str) -> Tuple[float, float]:
+    """Center point (latitude, longitude) of a geohash cell"""
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    even = True
+    for char in geohash:
+        value = GEOHASH_ALPHABET.index(char)
+        for shift in range(4, -1, -1):
+            interval = lon_range if even else lat_range
+            middle = (interval[0] + interval[1]) / 2
+            if value >> shift & 1:
+                interval[0] = middle
+            else:
+                interval[1] = middle
+            even = not even
+    return (lat_range[0] + lat_range[1]) / 2, (lon_range[0] + lon_range[1]) / 2
+
+
+def normalize_location(location: str, geohash_precision: int = 0) -> Tuple[str, str]:
+    """
+    The cache key for a location and the location to ask the provider for.
+
+    Place names are case-folded with whitespace and punctuation collapsed
+    and a trailing default country dropped ("  Nakuru,  Kenya" and "nakuru"
+    share a key). ``lat,lon`` coordinates are bucketed into geohash cells of
+    ``geohash_precision`` characters (5 is roughly 5 km) and fetched for the
+    cell center, so nearby farms share one forecast; with precision 0 they
+    are rounded to two decimals instead.
+    """
+    match = COORDINATES.match(location)
+    if match:
+        latitude, longitude = float(match.group(1)), float(match.group(2))
+        if geohash_precision:
+            cell = geohash_encode(latitude, longitude, geohash_precision)
+            center = geohash_center(cell)
+            return f'geo:{cell}', f'{center[0]:.4f},{center[1]:.4f}'
+        return f'geo:{latitude:.2f},{longitude:.2f}', f'{latitude:.2f},{longitude:.2f}'
+
+    words = re.sub(r'[^\w\s-]', ' ', location.casefold()).split()
+    if len(words) > 1 and words[-1] == DEFAULT_COUNTRY:
+        words.pop()
+    name = ' '.join(words)
+    return f'name:{name}', location.strip()
+
+
+class _Entry:
+    __slots__ = ('value', 'fetched_at', 'fresh_until', 'stale_until')
+
+    def __init__(self, value: Any, fetched_at: float, fresh_until: float, stale_until: float):
+        self.value = value
+        self.fetched_at = fetched_at
+        self.fresh_until = fresh_until
+        self.stale_until = stale_until
+
+
+class ForecastCache:
+    """
+    In-memory forecast cache in front of the weather provider.
+
+    - Entries stay fresh until the provider's next update: expiry is aligned
+      to ``update_interval`` boundaries (plus ``publish_delay`` for the new
+      data to appear), so a forecast is never cached past a provider refresh.
+    - Concurrent misses for one key share a single upstream call
+      (single-flight); a caller that disconnects doesn't cancel it for the rest.
+    - For ``stale_seconds`` after expiry the old forecast is served while one
+      background task refreshes it, and hits in the last ``refresh_ahead``
+      fraction of an entry's life refresh it early, so hot locations never
+      block on the provider.
+    - If the provider fails, a forecast up to ``stale_if_error_seconds`` old
+      is served instead of an error.
+
+    Each worker process keeps its own cache; with N workers a location costs
+    at most N upstream calls per provider update.
+    """
+
+    def __init__(
+        self,
+        fetch: Callable[[str], Awaitable[Any]],
+        update_interval: float = 600,
+        publish_delay: float = 60,
+        stale_seconds: float = 1800,
+        stale_if_error_seconds: float = 6 * 3600,
+        refresh_ahead: float = 0.1,
+        max_entries: int = 5000,
+        geohash_precision: int = 5,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.fetch = fetch
+        self.update_interval = update_interval
+        self.publish_delay = publish_delay
+        self.stale_seconds = stale_seconds
+        self.stale_if_error_seconds = stale_if_error_seconds
+        self.refresh_ahead = refresh_ahead
+        self.max_entries = max_entries
+        self.geohash_precision = geohash_precision
+        self.clock = clock
+
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._in_flight: Dict[str, asyncio.Task] = {}
+
+        # Counters
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.upstream_calls = 0
+        self.background_refreshes = 0
+        self.upstream_errors = 0
+        self.served_on_error = 0
+        self.evictions = 0
+
+    @classmethod
+    def from_env(cls, fetch: Callable[[str], Awaitable[Any]]) -> "ForecastCache":
+        return cls(
+            fetch,
+            update_interval=float(os.getenv('WEATHER_UPDATE_INTERVAL_SECONDS', '600')),
+            publish_delay=float(os.getenv('WEATHER_PUBLISH_DELAY_SECONDS', '60')),
+            stale_seconds=float(os.getenv('WEATHER_STALE_SECONDS', '1800')),
+            stale_if_error_seconds=float(os.getenv('WEATHER_STALE_IF_ERROR_SECONDS', str(6 * 3600))),
+            max_entries=int(os.getenv('WEATHER_CACHE_MAX_ENTRIES', '5000')),
+            geohash_precision=int(os.getenv('WEATHER_GEOHASH_PRECISION', '5')),
+        )
+
+    def _fresh_until(self, now: float) -> float:
+        """The next provider update after now, plus the time it takes to publish"""
+        if self.update_interval <= 0:
+            return now
+        next_update = (now - self.publish_delay) // self.update_interval * self.update_interval + self.update_interval
+        return next_update + self.publish_delay
+
+    def _store(self, key: str, value: Any) -> _Entry:
+        now = self.clock()
+        fresh_until = self._fresh_until(now)
+        entry = _Entry(value, now, fresh_until, fresh_until + self.stale_seconds)
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+        return entry
+
+    def _start_fetch(self, key: str, query: str) -> asyncio.Task:
+        """The in-flight upstream call for key, starting one if there is none"""
+        task = self._in_flight.get(key)
+        if task is not None:
+            self.coalesced += 1
+            return task
+
+        async def fetch_and_store():
+            self.upstream_calls += 1
+            try:
+                return self._store(key, await self.fetch(query)).value
+            except Exception:
+                self.upstream_errors += 1
+                raise
+            finally:
+                self._in_flight.pop(key, None)
+
+        task = self._in_flight[key] = asyncio.get_running_loop().create_task(fetch_and_store())
+        return task
+
+    def _refresh_in_background(self, key: str, query: str):
+        if key in self._in_flight:
+            return
+        self.background_refreshes += 1
+        task = self._start_fetch(key, query)
+        # Retrieve the exception so a failed refresh isn't reported as never awaited
+        task.add_done_callback(lambda t: t.cancelled() or t.exception())
+
+    async def get(self, location: str) -> Any:
+        """The forecast for a location, from cache where possible"""
+        key, query = normalize_location(location, self.geohash_precision)
+        now = self.clock()
+        entry = self._entries.get(key)
+
+        if entry is not None:
+            self._entries.move_to_end(key)
+            if now < entry.fresh_until:
+                self.hits += 1
+                lifetime = entry.fresh_until - entry.fetched_at
+                if now > entry.fresh_until - lifetime * self.refresh_ahead:
+                    self._refresh_in_background(key, query)
+                return entry.value
+            if now < entry.stale_until:
+                self.stale_hits += 1
+                self._refresh_in_background(key, query)
+                return entry.value
+
+        self.misses += 1
+        try:
+            return await asyncio.shield(self._start_fetch(key, query))
+        except Exception:
+            if entry is not None and now - entry.fetched_at < self.stale_if_error_seconds:
+                self.served_on_error += 1
+                logger.warning(f"Weather provider failed for {key}, serving a forecast from {now - entry.fetched_at:.0f}s ago")
+                return entry.value
+            raise
+
+    async def close(self):
+        """Cancel background refreshes"""
+        for task in list(self._in_flight.values()):
+            task.cancel()
+        self._in_flight.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.stale_hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'max_entries': self.max_entries,
+            'hits': self.hits,
+            'stale_hits': self.stale_hits,
+            'misses': self.misses,
+            'hit_rate': round((self.hits + self.stale_hits) / lookups, 4) if lookups else None,
+            'coalesced': self.coalesced,
+            'upstream_calls': self.upstream_calls,
+            'background_refreshes': self.background_refreshes,
+            'upstream_errors': self.upstream_errors,
+            'served_on_error': self.served_on_error,
+            'evictions': self.evictions,
+        }
@@ -0,0 +1,163 @@
+import io
+import logging
+import time
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+# Model input size (width, height)
+MODEL_INPUT_SIZE = (224, 224)
+
+# Scale factor used to normalize uint8 pixels into [0, 1]
+PIXEL_SCALE = np.float32(1.0 / 255.0)
+
+# EXIF orientation tag and the transpose that undoes each orientation
+EXIF_ORIENTATION = 0x0112
+ORIENTATION_TRANSPOSE = {
+    2: Image.Transpose.FLIP_LEFT_RIGHT,
+    3: Image.Transpose.ROTATE_180,
+    4: Image.Transpose.FLIP_TOP_BOTTOM,
+    5: Image.Transpose.TRANSPOSE,
+    6: Image.Transpose.ROTATE_270,
+    7: Image.Transpose.TRANSVERSE,
+    8: Image.Transpose.ROTATE_90,
+}
+
+
+class BufferReader(io.RawIOBase):
+    """A read-only, seekable file over a buffer, so PIL and upload readers copy out only what they ask for"""
+
+    def __init__(self, data):
+        super().__init__()
+        self._view = memoryview(data).cast('B')
+        self._position = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def readinto(self, b) -> int:
+        count = max(0, min(len(b), len(self._view) - self._position))
+        b[:count] = self._view[self._position:self._position + count]
+        self._position += count
+        return count
+
+    def read(self, size: Optional[int] = -1) -> bytes:
+        end = len(self._view) if size is None or size < 0 else min(len(self._view), self._position + size)
+        data = self._view[self._position:end].tobytes()
+        self._position = max(self._position, end)
+        return data
+
+    def readall(self) -> bytes:
+        return self.read()
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        base = {io.SEEK_SET: 0, io.SEEK_CUR: self._position, io.SEEK_END: len(self._view)}[whence]
+        self._position = max(0, base + offset)
+        return self._position
+
+    def tell(self) -> int:
+        return self._position
+
+
+def decode_image(image_data, size: Tuple[int, int] = MODEL_INPUT_SIZE) -> Tuple[Image.Image, int]:
+    """
+    Decode an uploaded image at (close to) the requested size.
+
+    JPEGs are decoded with DCT scaling (``Image.draft``), so a 12 MP photo is
+    decoded directly at 1/2, 1/4 or 1/8 resolution instead of in full.
+    Returns the image and its EXIF orientation.
+    """
+    image = Image.open(BufferReader(image_data))
+    orientation = image.getexif().get(EXIF_ORIENTATION, 1)
+
+    if image.format == 'JPEG':
+        # Only picks a scale that stays at or above the requested size
+        image.draft('RGB', size)
+
+    # Convert to RGB if necessary
+    if image.mode != 'RGB':
+        image = image.convert('RGB')
+
+    return image, orientation
+
+
+def resize_image(image: Image.Image, orientation: int = 1, size: Tuple[int, int] = MODEL_INPUT_SIZE) -> Image.Image:
+    """Resize to the model input size, then apply the EXIF orientation on the small image"""
+    # reducing_gap shrinks large non-JPEG inputs with a fast box reduce first
+    resized = image.resize(size, Image.Resampling.BILINEAR, reducing_gap=2.0)
+
+    if orientation in ORIENTATION_TRANSPOSE:
+        resized = resized.transpose(ORIENTATION_TRANSPOSE[orientation])
+    return resized
+
+
+def compute_dhash(image: Image.Image) -> int:
+    """
+    64-bit difference hash: compares neighbouring pixels of a 9x8 grayscale
+    thumbnail, so it survives recompression, rescaling and small crops.
+    """
+    thumbnail = np.asarray(image.convert('L').resize((9, 8), Image.Resampling.BOX), dtype=np.int16)
+    bits = (thumbnail[:, 1:] > thumbnail[:, :-1]).flatten()
+    return int.from_bytes(np.packbits(bits).tobytes(), 'big')
+
+
+def preprocess_image(image_data, size: Tuple[int, int] = MODEL_INPUT_SIZE) -> Tuple[np.ndarray, int, Dict[str, float]]:
+    """
+    Decode and resize an image into a uint8 (H, W, 3) array.
+
+    Normalization to float32 is deferred to :func:`normalize_into`, which writes
+    straight into a batch slot. Returns the array, its perceptual hash and
+    per-stage timings.
+    """
+    timings = {}
+
+    started = time.perf_counter()
+    image, orientation = decode_image(image_data, size)
+    image.load()
+    timings['decode'] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    image = resize_image(image, orientation, size)
+    pixels = np.asarray(image, dtype=np.uint8)
+    timings['resize'] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    phash = compute_dhash(image)
+    timings['hash'] = time.perf_counter() - started
+
+    return pixels, phash, timings
+
+
+def normalize_into(pixels: np.ndarray, out: np.ndarray) -> np.ndarray:
+    """Normalize uint8 pixels into a preallocated float32 buffer without temporaries"""
+    np.multiply(pixels, PIXEL_SCALE, out=out, dtype=np.float32)
+    return out
+
+
+class TensorBuffer:
+    """
+    Preallocated float32 (N, H, W, 3) input buffer whose slots are reused
+    across batches instead of allocating a new tensor per request.
+    """
+
+    def __init__(self, capacity: int, size: Tuple[int, int] = MODEL_INPUT_SIZE):
+        self.capacity = capacity
+        self.buffer = np.empty((capacity, size[1], size[0], 3), dtype=np.float32)
+
+    def fill(self, index: int, pixels: np.ndarray) -> np.ndarray:
+        """Normalize pixels into slot index"""
+        if pixels.dtype == np.uint8:
+            return normalize_into(pixels, self.buffer[index])
+        self.buffer[index] = pixels
+        return self.buffer[index]
+
+    def view(self, count: int) -> np.ndarray:
+        """Return the first count slots as a batch"""
+        return self.buffer[:count]
+
@@ -0,0 +1,146 @@
+import logging
+import os
+from abc import ABC, abstractmethod
+from typing import Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+BACKENDS = ('keras', 'onnx', 'tflite')
+
+
+class InferenceBackend(ABC):
+    """Runs an (N, 224, 224, 3) float32 batch through the disease backbone, returning (N, features)"""
+
+    name = 'base'
+
+    @property
+    @abstractmethod
+    def output_size(self) -> int:
+        ...
+
+    @abstractmethod
+    def predict(self, batch: np.ndarray) -> np.ndarray:
+        ...
+
+
+class KerasBackend(InferenceBackend):
+    """Calls the Keras model directly, skipping ``Model.predict``'s per-call setup"""
+
+    name = 'keras'
+
+    def __init__(self, model):
+        self.model = model
+
+    @property
+    def output_size(self) -> int:
+        return self.model.output_shape[-1]
+
+    def predict(self, batch: np.ndarray) -> np.ndarray:
+        return self.model(batch, training=False).numpy()
+
+
+class OnnxRuntimeBackend(InferenceBackend):
+    """ONNX Runtime on the CPU execution provider"""
+
+    name = 'onnx'
+
+    def __init__(self, model_path: str, num_threads: Optional[int] = None):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+
+        self.session = ort.InferenceSession(model_path, options, providers=['CPUExecutionProvider'])
+        self.input_name = self.session.get_inputs()[0].name
+        self._output_size = self.session.get_outputs()[0].shape[-1]
+
+    @property
+    def output_size(self) -> int:
+        return self._output_size
+
+    def predict(self, batch: np.ndarray) -> np.ndarray:
+        return self.session.run(None, {self.input_name: batch})[0]
+
+
+class TFLiteBackend(InferenceBackend):
+    """
+    TensorFlow Lite interpreter; float models run on the XNNPACK delegate.
+
+    Uses ``tflite_runtime`` when installed, otherwise ``tf.lite``. Models with
+    integer inputs/outputs are (de)quantized at the boundary. The interpreter
+    memory-maps the model file, so worker processes serving the same file
+    share its pages. The interpreter is not thread-safe, so it must only be
+    driven from the single inference thread.
+    """
+
+    name = 'tflite'
+
+    def __init__(self, model_path: str, num_threads: Optional[int] = None):
+        try:
+            from tflite_runtime.interpreter import Interpreter
+        except ImportError:
+            import tensorflow as tf
+            Interpreter = tf.lite.Interpreter
+
+        self.interpreter = Interpreter(model_path=model_path, num_threads=num_threads)
+        self.interpreter.allocate_tensors()
+        self.input_detail = self.interpreter.get_input_details()[0]
+        self.output_detail = self.interpreter.get_output_details()[0]
+        self._batch_size = int(self.input_detail['shape'][0])
+
+    @property
+    def output_size(self) -> int:
+        return int(self.output_detail['shape'][-1])
+
+    def _resize(self, batch_size: int):
+        """Resize the input tensor when the batch size changes"""
+        self.interpreter.resize_tensor_input(self.input_detail['index'], [batch_size, 224, 224, 3])
+        self.interpreter.allocate_tensors()
+        self.input_detail = self.interpreter.get_input_details()[0]
+        self.output_detail = self.interpreter.get_output_details()[0]
+        self._batch_size = batch_size
+
+    @staticmethod
+    def _quantize(batch: np.ndarray, detail) -> np.ndarray:
+        scale, zero_point = detail['quantization']
+        info = np.iinfo(detail['dtype'])
+        return np.clip(np.round(batch / scale + zero_point), info.min, info.max).astype(detail['dtype'])
+
+    def predict(self, batch: np.ndarray) -> np.ndarray:
+        if batch.shape[0] != self._batch_size:
+            self._resize(batch.shape[0])
+
+        if self.input_detail['dtype'] != np.float32:
+            batch = self._quantize(batch, self.input_detail)
+        self.interpreter.set_tensor(self.input_detail['index'], batch)
+        self.interpreter.invoke()
+        output = self.interpreter.get_tensor(self.output_detail['index'])
+
+        if self.output_detail['dtype'] != np.float32:
+            scale, zero_point = self.output_detail['quantization']
+            return (output.astype(np.float32) - zero_point) * scale
+        return output.copy()
+
+
+def model_path(model_dir: str, version: str, backend: str, precision: str = 'float') -> str:
+    """Where an exported model for a backend lives in the model cache"""
+    extension = {'keras': 'keras', 'onnx': 'onnx', 'tflite': 'tflite'}[backend]
+    if precision != 'float':
+        extension = f'{precision}.{extension}'
+    return os.path.join(model_dir, f'disease_backbone_{version}.{extension}')
+
+
+def create_backend(backend: str, model_file: str, num_threads: Optional[int] = None) -> InferenceBackend:
+    """Open an exported model file with the requested backend"""
+    if backend == 'onnx':
+        return OnnxRuntimeBackend(model_file, num_threads)
+    if backend == 'tflite':
+        return TFLiteBackend(model_file, num_threads)
+    if backend == 'keras':
+        import tensorflow as tf
+        return KerasBackend(tf.keras.models.load_model(model_file, compile=False))
+    raise ValueError(f"Unknown inference backend '{backend}', expected one of {BACKENDS}")
@@ -0,0 +1,180 @@
+import asyncio
+import logging
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.core.metrics import observe_stage
+
+logger = logging.getLogger(__name__)
+
+
+class InferenceBatcher:
+    """
+    Collect concurrent inference requests into a single batched model call.
+
+    Requests are queued until either ``max_batch_size`` items are waiting or the
+    oldest item has waited ``max_wait_ms``. The batch is assembled into one
+    ``(N, ...)`` tensor by ``prepare_fn`` (stacked into float32 by default),
+    passed to ``predict_fn`` and every caller receives its own row of the output.
+    Batches run one at a time, so ``prepare_fn`` may reuse a preallocated buffer.
+    """
+
+    def __init__(
+        self,
+        predict_fn: Callable[[np.ndarray], np.ndarray],
+        max_batch_size: int = 32,
+        max_wait_ms: float = 10.0,
+        executor: Optional[Any] = None,
+        name: str = "inference",
+        prepare_fn: Optional[Callable[[List[np.ndarray]], np.ndarray]] = None,
+    ):
+        self.predict_fn = predict_fn
+        self.prepare_fn = prepare_fn or self._stack
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self.executor = executor
+        self.name = name
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+
+        # Batch metrics
+        self.batches_run = 0
+        self.items_processed = 0
+        self.last_batch_size = 0
+        self.batch_size_histogram: Dict[int, int] = {}
+        self.queue_wait_total = 0.0
+        self.queue_wait_max = 0.0
+        self.inference_time_total = 0.0
+
+    def _ensure_started(self):
+        """Start the batching loop on the running event loop if needed"""
+        if self._worker is None or self._worker.done():
+            self._queue = asyncio.Queue()
+            self._worker = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        """Stop the batching loop and fail any requests still waiting"""
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+
+        if self._queue is not None:
+            while not self._queue.empty():
+                self._fail([self._queue.get_nowait()])
+            self._queue = None
+
+    def _fail(self, batch: List[Tuple[np.ndarray, asyncio.Future, float]]):
+        for _, future, _ in batch:
+            if not future.done():
+                future.set_exception(RuntimeError(f"{self.name} batcher stopped"))
+
+    async def submit(self, item: np.ndarray) -> np.ndarray:
+        """Queue a single input and wait for its row of predictions"""
+        self._ensure_started()
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((item, future, time.perf_counter()))
+        return await future
+
+    async def _run(self):
+        """Main batching loop"""
+        while True:
+            batch = [await self._queue.get()]
+            deadline = batch[0][2] + self.max_wait
+
+            try:
+                # Keep collecting until the batch is full or the oldest item times out
+                while len(batch) < self.max_batch_size:
+                    timeout = deadline - time.perf_counter()
+                    if timeout <= 0:
+                        break
+                    try:
+                        batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                    except asyncio.TimeoutError:
+                        break
+
+                # Pick up anything that arrived while we were waiting
+                while len(batch) < self.max_batch_size and not self._queue.empty():
+                    batch.append(self._queue.get_nowait())
+
+                await self._process(batch)
+            except asyncio.CancelledError:
+                # Stopped with a batch already taken off the queue; don't leave its callers waiting
+                self._fail(batch)
+                raise
+
+    async def _process(self, batch: List[Tuple[np.ndarray, asyncio.Future, float]]):
+        """Run one batched prediction and resolve the waiting futures"""
+        # Callers that went away (e.g. client disconnects) don't need a slot
+        batch = [entry for entry in batch if not entry[1].done()]
+        if not batch:
+            return
+
+        started = time.perf_counter()
+        waits = [started - enqueued for _, _, enqueued in batch]
+
+        try:
+            outputs = await asyncio.get_running_loop().run_in_executor(
+                self.executor, self._run_batch, [item for item, _, _ in batch]
+            )
+        except Exception as e:
+            logger.error(f"Error running {self.name} batch of {len(batch)}: {str(e)}")
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for row, (_, future, _) in zip(outputs, batch):
+            if not future.done():
+                future.set_result(row)
+
+        self._record_batch(len(batch), waits, time.perf_counter() - started)
+
+    @staticmethod
+    def _stack(items: List[np.ndarray]) -> np.ndarray:
+        """Default batch assembly: stack items into a float32 tensor"""
+        return np.stack(items).astype(np.float32, copy=False)
+
+    def _run_batch(self, items: List[np.ndarray]) -> np.ndarray:
+        """Assemble and predict one batch (runs on the executor)"""
+        return self.predict_fn(self.prepare_fn(items))
+
+    def _record_batch(self, size: int, waits: List[float], inference_time: float):
+        """Update batch size and queue wait metrics"""
+        self.batches_run += 1
+        self.items_processed += size
+        self.last_batch_size = size
+        self.batch_size_histogram[size] = self.batch_size_histogram.get(size, 0) + 1
+        self.queue_wait_total += sum(waits)
+        self.queue_wait_max = max(self.queue_wait_max, max(waits))
+        self.inference_time_total += inference_time
+        for wait in waits:
+            observe_stage(f'{self.name}_queue_wait', wait)
+        observe_stage(f'{self.name}_batch', inference_time)
+
+        logger.debug(
+            f"{self.name} batch: size={size}, max_wait={max(waits) * 1000:.2f}ms, "
+            f"inference={inference_time * 1000:.2f}ms"
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        """Return batch size and queue wait metrics"""
+        return {
+            'max_batch_size': self.max_batch_size,
+            'max_wait_ms': self.max_wait * 1000,
+            'pending': self._queue.qsize() if self._queue is not None else 0,
+            'batches': self.batches_run,
+            'items': self.items_processed,
+            'last_batch_size': self.last_batch_size,
+            'avg_batch_size': round(self.items_processed / self.batches_run, 2) if self.batches_run else 0.0,
+            'batch_size_histogram': dict(sorted(self.batch_size_histogram.items())),
+            'avg_queue_wait_ms': round(self.queue_wait_total / self.items_processed * 1000, 3) if self.items_processed else 0.0,
+            'max_queue_wait_ms': round(self.queue_wait_max * 1000, 3),
+            'avg_inference_ms': round(self.inference_time_total / self.batches_run * 1000, 3) if self.batches_run else 0.0,
+        }
@@ -0,0 +1,448 @@
+import asyncio
+import ipaddress
+import itertools
+import json
+import logging
+import os
+import socket
+import time
+import uuid
+from abc import ABC, abstractmethod
+from datetime import datetime
+from types import SimpleNamespace
+from typing import Any, Awaitable, Callable, Dict, Optional
+from urllib.parse import urlparse
+
+from app.services.worker_pool import PoolSaturatedError
+
+logger = logging.getLogger(__name__)
+
+# Priority lanes, highest first; each is its own Celery queue
+PRIORITIES = ('high', 'default', 'low')
+QUEUE_PREFIX = os.getenv('JOB_QUEUE_PREFIX', 'ai')
+
+# Job records and uploaded payloads expire after this long
+JOB_TTL_SECONDS = int(os.getenv('JOB_TTL_SECONDS', '86400'))
+
+# Tries at a job while the worker pool is saturated, with exponential backoff in between
+SATURATED_ATTEMPTS = int(os.getenv('JOB_SATURATED_ATTEMPTS', '5'))
+
+# Comma-separated callback hosts; when set, only these are called back (and
+# may be internal), otherwise any host resolving only to public addresses
+CALLBACK_ALLOWED_HOSTS = {
+    host.strip().lower() for host in os.getenv('JOB_CALLBACK_ALLOWED_HOSTS', '').split(',') if host.strip()
+}
+
+
+class InvalidJobError(ValueError):
+    """Raised for an unknown task, priority lane or callback URL"""
+
+
+# Task name -> (handler, default priority)
+TASKS: Dict[str, Any] = {}
+
+
+def job_task(name: str, priority: str = 'default'):
+    """Register a coroutine ``handler(services, payload, blob, user_id)`` as a job task"""
+    def register(handler: Callable[..., Awaitable[Any]]):
+        TASKS[name] = (handler, priority)
+        return handler
+    return register
+
+
+@job_task('disease_detection')
+async def _disease_detection(services, payload: Dict[str, Any], blob: bytes, user_id: Optional[str]):
+    ai_service = await services.ai()
+    return await ai_service.detect_disease_from_bytes(blob, payload['crop_type'], payload.get('compare_crops'), user_id)
+
+
+@job_task('loan_assessment')
+async def _loan_assessment(services, payload: Dict[str, Any], blob: Optional[bytes], user_id: Optional[str]):
+    ai_service = await services.ai()
+    return await ai_service.assess_loan(SimpleNamespace(**payload), user_id)
+
+
+@job_task('voice_command', priority='high')
+async def _voice_command(services, payload: Dict[str, Any], blob: bytes, user_id: Optional[str]):
+    from starlette.datastructures import UploadFile
+
+    from app.services.image_preprocessing import BufferReader
+
+    audio_file = UploadFile(BufferReader(blob), size=len(blob), filename=payload.get('filename'))
+    return await services.voice().process_voice(audio_file, payload['language'])
+
+
+class JobServices:
+    """
+    The services job handlers run against.
+
+    The API process passes its own instances for the local queue; Celery
+    workers build theirs on first use and load models once per process.
+    """
+
+    def __init__(self, ai_service=None, voice_service=None):
+        self._ai_service = ai_service
+        self._voice_service = voice_service
+        self._ai_started = ai_service is not None
+
+    async def ai(self):
+        if self._ai_service is None:
+            from app.services.ai_service import AIService
+
+            self._ai_service = AIService()
+            # Workers have no request deadline, so wait for the model instead of failing
+            self._ai_service.model_wait_seconds = float(os.getenv('JOB_MODEL_WAIT_SECONDS', '300'))
+        if not self._ai_started:
+            self._ai_started = True
+            await self._ai_service.initialize_models()
+        return self._ai_service
+
+    def voice(self):
+        if self._voice_service is None:
+            from app.services.voice_service import VoiceService
+
+            self._voice_service = VoiceService()
+        return self._voice_service
+
+
+class MemoryJobStore:
+    """In-process job store; the stand-in for Redis in local mode and tests"""
+
+    def __init__(self, ttl_seconds: int = JOB_TTL_SECONDS):
+        self.ttl = ttl_seconds
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+        self._blobs: Dict[str, Any] = {}
+        self._expires: Dict[str, float] = {}
+
+    def _purge(self):
+        now = time.monotonic()
+        for job_id in [j for j, expires_at in self._expires.items() if expires_at <= now]:
+            self._jobs.pop(job_id, None)
+            self._blobs.pop(job_id, None)
+            del self._expires[job_id]
+
+    async def create(self, job: Dict[str, Any], blob=None):
+        self._purge()
+        self._jobs[job['job_id']] = dict(job)
+        self._expires[job['job_id']] = time.monotonic() + self.ttl
+        if blob is not None:
+            self._blobs[job['job_id']] = blob
+
+    async def update(self, job_id: str, **fields):
+        if job_id in self._jobs:
+            self._jobs[job_id].update(fields)
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        job = self._jobs.get(job_id)
+        return dict(job) if job is not None else None
+
+    async def get_blob(self, job_id: str):
+        return self._blobs.get(job_id)
+
+    async def delete_blob(self, job_id: str):
+        self._blobs.pop(job_id, None)
+
+    async def close(self):
+        pass
+
+
+class RedisJobStore:
+    """
+    Job records shared by the API and Celery workers through Redis.
+
+    Each job is a hash with one JSON-encoded value per field, so a status
+    update, a result and a callback can each set their own fields without
+    overwriting the others'.
+    """
+
+    # Sets fields only while the job exists, so a late update can't bring back a partial, expired job
+    UPDATE_SCRIPT = """
+    if redis.call('EXISTS', KEYS[1]) == 1 then
+        redis.call('HSET', KEYS[1], unpack(ARGV))
+        return 1
+    end
+    return 0
+    """
+
+    def __init__(self, redis_url: str, ttl_seconds: int = JOB_TTL_SECONDS, namespace: str = 'agriwise:jobs'):
+        import redis.asyncio as aioredis
+
+        self.ttl = ttl_seconds
+        self.namespace = namespace
+        self._redis = aioredis.from_url(redis_url)
+        self._update = self._redis.register_script(self.UPDATE_SCRIPT)
+
+    @staticmethod
+    def _encode(fields: Dict[str, Any]) -> Dict[str, str]:
+        return {name: json.dumps(value) for name, value in fields.items()}
+
+    async def create(self, job: Dict[str, Any], blob=None):
+        key = f'{self.namespace}:{job["job_id"]}'
+        async with self._redis.pipeline(transaction=True) as pipe:
+            pipe.hset(key, mapping=self._encode(job))
+            pipe.expire(key, self.ttl)
+            if blob is not None:
+                pipe.set(f'{key}:blob', bytes(blob), ex=self.ttl)
+            await pipe.execute()
+
+    async def update(self, job_id: str, **fields):
+        if fields:
+            args = [item for pair in self._encode(fields).items() for item in pair]
+            await self._update(keys=[f'{self.namespace}:{job_id}'], args=args)
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        raw = await self._redis.hgetall(f'{self.namespace}:{job_id}')
+        return {name.decode(): json.loads(value) for name, value in raw.items()} if raw else None
+
+    async def get_blob(self, job_id: str):
+        return await self._redis.get(f'{self.namespace}:{job_id}:blob')
+
+    async def delete_blob(self, job_id: str):
+        await self._redis.delete(f'{self.namespace}:{job_id}:blob')
+
+    async def close(self):
+        await self._redis.close()
+
+
+def _is_public_address(address: str) -> bool:
+    ip = ipaddress.ip_address(address.split('%')[0])
+    if ip.version == 6 and ip.ipv4_mapped:
+        ip = ip.ipv4_mapped
+    return ip.is_global and not (
+        ip.is_private or ip.is_loopback or ip.is_link_local or ip.is_reserved or ip.is_multicast
+        or ip.is_unspecified
+    )
+
+
+async def check_callback_url(callback_url: str):
+    """
+    Raise InvalidJobError unless the callback URL is safe for the server to call.
+
+    The URL must be http(s). With JOB_CALLBACK_ALLOWED_HOSTS set its host must
+    be listed; otherwise every address the host resolves to must be public,
+    so callbacks can't reach loopback, private networks, link-local cloud
+    metadata endpoints or reserved ranges.
+    """
+    parsed = urlparse(callback_url)
+    try:
+        port = parsed.port or (443 if parsed.scheme == 'https' else 80)
+    except ValueError:
+        raise InvalidJobError("callback_url has an invalid port")
+    if parsed.scheme not in ('http', 'https') or not parsed.hostname:
+        raise InvalidJobError("callback_url must be an http(s) URL")
+
+    host = parsed.hostname.lower()
+    if CALLBACK_ALLOWED_HOSTS:
+        if host not in CALLBACK_ALLOWED_HOSTS:
+            raise InvalidJobError("callback_url host is not allowed")
+        return
+
+    try:
+        addresses = await asyncio.get_running_loop().getaddrinfo(host, port, type=socket.SOCK_STREAM)
+    except (socket.gaierror, UnicodeError):
+        raise InvalidJobError("callback_url host does not resolve")
+    if not addresses or not all(_is_public_address(info[4][0]) for info in addresses):
+        raise InvalidJobError("callback_url must resolve to a public address")
+
+
+def public_job(job: Dict[str, Any]) -> Dict[str, Any]:
+    """A job record as returned to clients, without its input payload"""
+    return {key: value for key, value in job.items() if key != 'payload'}
+
+
+async def send_callback(job: Dict[str, Any], attempts: int = 3):
+    """POST the finished job to its callback URL, retrying with backoff and never following redirects"""
+    import httpx
+
+    try:
+        # Again at send time: the host may resolve differently than when the job was queued
+        await check_callback_url(job['callback_url'])
+    except InvalidJobError as e:
+        logger.error(f"Not calling back for job {job['job_id']}: {str(e)}")
+        return
+
+    async with httpx.AsyncClient(timeout=10.0, follow_redirects=False) as client:
+        for attempt in range(attempts):
+            try:
+                response = await client.post(job['callback_url'], json=public_job(job))
+                if response.status_code < 500:
+                    return
+                logger.warning(f"Callback for job {job['job_id']} returned {response.status_code}")
+            except httpx.HTTPError as e:
+                logger.warning(f"Callback for job {job['job_id']} failed: {str(e)}")
+            await asyncio.sleep(2 ** attempt)
+    logger.error(f"Giving up on callback for job {job['job_id']}")
+
+
+async def run_job(store, services: JobServices, job_id: str) -> Optional[str]:
+    """Run a queued job and record its outcome; shared by local and Celery workers"""
+    job = await store.get(job_id)
+    if job is None:
+        logger.warning(f"Job {job_id} expired before it ran")
+        return None
+
+    await store.update(job_id, status='running', started_at=datetime.utcnow().isoformat())
+    # Kept until the job finishes so a redelivered job still has its input
+    blob = await store.get_blob(job_id)
+    handler, _ = TASKS[job['task']]
+    try:
+        for attempt in range(SATURATED_ATTEMPTS):
+            try:
+                result = await handler(services, job['payload'], blob, job.get('user_id'))
+                break
+            except PoolSaturatedError as e:
+                if attempt == SATURATED_ATTEMPTS - 1:
+                    raise
+                # Requests hold the pool; back off instead of failing the job
+                await asyncio.sleep(e.retry_after * 2 ** attempt / 4)
+        fields = {'status': 'succeeded', 'result': json.loads(json.dumps(result, default=str))}
+    except Exception as e:
+        logger.error(f"Job {job_id} ({job['task']}) failed: {str(e)}")
+        fields = {'status': 'failed', 'error': f"Error processing {job['task'].replace('_', ' ')}"}
+
+    fields['finished_at'] = datetime.utcnow().isoformat()
+    await store.update(job_id, **fields)
+    await store.delete_blob(job_id)
+    job.update(fields)
+
+    if job.get('callback_url'):
+        await send_callback(job)
+    return fields['status']
+
+
+class _BaseJobQueue(ABC):
+    backend = 'base'
+
+    def __init__(self, store):
+        self.store = store
+        self.enqueued = 0
+
+    def _new_job(self, task: str, payload: Dict[str, Any], user_id: str,
+                 priority: Optional[str], callback_url: Optional[str]) -> Dict[str, Any]:
+        if task not in TASKS:
+            raise InvalidJobError(f"Unknown job task '{task}'")
+        priority = priority or TASKS[task][1]
+        if priority not in PRIORITIES:
+            raise InvalidJobError(f"priority must be one of {', '.join(PRIORITIES)}")
+
+        return {
+            'job_id': uuid.uuid4().hex,
+            'task': task,
+            'status': 'queued',
+            'priority': priority,
+            'user_id': user_id,
+            'callback_url': callback_url,
+            'created_at': datetime.utcnow().isoformat(),
+            'started_at': None,
+            'finished_at': None,
+            'result': None,
+            'error': None,
+            'payload': payload,
+        }
+
+    async def enqueue(self, task: str, payload: Dict[str, Any], user_id: str, blob=None,
+                      priority: Optional[str] = None, callback_url: Optional[str] = None) -> Dict[str, Any]:
+        """Store a job and hand it to the workers; raises InvalidJobError for bad options"""
+        job = self._new_job(task, payload, user_id, priority, callback_url)
+        if callback_url:
+            await check_callback_url(callback_url)
+        await self.store.create(job, blob)
+        await self._dispatch(job)
+        self.enqueued += 1
+        logger.info(f"Queued job {job['job_id']} ({task}, {job['priority']} priority)")
+        return public_job(job)
+
+    @abstractmethod
+    async def _dispatch(self, job: Dict[str, Any]):
+        ...
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        job = await self.store.get(job_id)
+        return public_job(job) if job is not None else None
+
+    async def close(self):
+        await self.store.close()
+
+    def stats(self) -> Dict[str, Any]:
+        return {'backend': self.backend, 'enqueued': self.enqueued}
+
+
+class LocalJobQueue(_BaseJobQueue):
+    """
+    Runs jobs in the API process on a few asyncio workers, high priority first.
+
+    Needs no broker, so it is the default for development and tests; jobs are
+    lost if the process restarts.
+    """
+
+    backend = 'local'
+
+    def __init__(self, services: JobServices, store=None, concurrency: int = 2):
+        super().__init__(store or MemoryJobStore())
+        self.services = services
+        self.concurrency = concurrency
+        self._queue: Optional[asyncio.PriorityQueue] = None
+        self._workers = []
+        self._sequence = itertools.count()
+
+    def _ensure_started(self):
+        if self._queue is None:
+            self._queue = asyncio.PriorityQueue()
+            self._workers = [asyncio.create_task(self._work()) for _ in range(self.concurrency)]
+
+    async def _dispatch(self, job: Dict[str, Any]):
+        self._ensure_started()
+        # The sequence keeps FIFO order within a lane
+        self._queue.put_nowait((PRIORITIES.index(job['priority']), next(self._sequence), job['job_id']))
+
+    async def _work(self):
+        while True:
+            _, _, job_id = await self._queue.get()
+            try:
+                await run_job(self.store, self.services, job_id)
+            except Exception as e:
+                logger.error(f"Local job worker error: {str(e)}")
+            finally:
+                self._queue.task_done()
+
+    async def join(self):
+        """Wait until every queued job has finished"""
+        if self._queue is not None:
+            await self._queue.join()
+
+    async def close(self):
+        for worker in self._workers:
+            worker.cancel()
+        await super().close()
+
+    def stats(self) -> Dict[str, Any]:
+        stats = super().stats()
+        stats.update({'queued': self._queue.qsize() if self._queue else 0, 'concurrency': self.concurrency})
+        return stats
+
+
+class CeleryJobQueue(_BaseJobQueue):
+    """Sends jobs to Celery workers (app.core.celery) through per-priority queues"""
+
+    backend = 'celery'
+
+    def __init__(self, store: RedisJobStore):
+        super().__init__(store)
+        from app.core.celery import celery_app
+
+        self.celery_app = celery_app
+
+    async def _dispatch(self, job: Dict[str, Any]):
+        # send_task does blocking broker I/O
+        await asyncio.to_thread(
+            self.celery_app.send_task, 'agriwise.run_job',
+            args=[job['job_id']], queue=f"{QUEUE_PREFIX}.{job['priority']}"
+        )
+
+
+def create_job_queue(services: JobServices) -> _BaseJobQueue:
+    """Job queue selected by JOB_QUEUE_BACKEND ('local' or 'celery')"""
+    backend = os.getenv('JOB_QUEUE_BACKEND', 'local')
+    if backend == 'celery':
+        return CeleryJobQueue(RedisJobStore(os.getenv('REDIS_URL', 'redis://localhost:6379')))
+    return LocalJobQueue(services, concurrency=int(os.getenv('JOB_LOCAL_CONCURRENCY', '2')))
@@ -0,0 +1,375 @@
+import asyncio
+import io
+import logging
+import os
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+PRICE_COLUMNS = ('crop', 'market', 'date', 'price')
+UNIT_COLUMN = 'unit'
+
+# Windows (days) of the rolling averages served with every price
+ROLLING_WINDOWS = (7, 30)
+
+EPOCH = np.datetime64('1970-01-01', 'D')
+
+
+def _key(value: Optional[str]) -> Optional[str]:
+    return value.strip().casefold() if value else None
+
+
+def _date(day: int) -> str:
+    return str(EPOCH + np.timedelta64(int(day), 'D'))
+
+
+class PriceSeries:
+    """
+    Daily prices of one crop at one market: sorted day numbers, prices and
+    their running sum in growable NumPy buffers, so appends are amortized
+    O(1) and any windowed average is two binary searches.
+    """
+
+    __slots__ = ('crop', 'market', 'unit', '_days', '_prices', '_cumsum', 'size')
+
+    def __init__(self, crop: str, market: str, unit: str, capacity: int = 64):
+        self.crop = crop
+        self.market = market
+        self.unit = unit
+        self._days = np.empty(capacity, dtype=np.int32)
+        self._prices = np.empty(capacity, dtype=np.float64)
+        # _cumsum[i] is the sum of prices[:i]
+        self._cumsum = np.zeros(capacity + 1, dtype=np.float64)
+        self.size = 0
+
+    @property
+    def days(self) -> np.ndarray:
+        return self._days[:self.size]
+
+    @property
+    def prices(self) -> np.ndarray:
+        return self._prices[:self.size]
+
+    @property
+    def last_day(self) -> int:
+        return int(self._days[self.size - 1]) if self.size else -1
+
+    def _reserve(self, size: int):
+        if size <= len(self._days):
+            return
+        capacity = max(size, len(self._days) * 2)
+        for name in ('_days', '_prices'):
+            grown = np.empty(capacity, dtype=getattr(self, name).dtype)
+            grown[:self.size] = getattr(self, name)[:self.size]
+            setattr(self, name, grown)
+        cumsum = np.zeros(capacity + 1, dtype=np.float64)
+        cumsum[:self.size + 1] = self._cumsum[:self.size + 1]
+        self._cumsum = cumsum
+
+    def add(self, days: np.ndarray, prices: np.ndarray) -> int:
+        """
+        Add observations (days sorted ascending, unique); returns how many
+        were new. Days after the last one are appended in place; earlier
+        ones (late reports, corrections) are merged and overwrite any
+        existing price for that day.
+        """
+        tail = days > self.last_day
+        late_days, late_prices = days[~tail], prices[~tail]
+        added = int(tail.sum())
+        if len(late_days):
+            added += len(late_days) - int(np.isin(late_days, self.days).sum())
+            self._merge(late_days, late_prices)
+        if tail.any():
+            start, end = self.size, self.size + int(tail.sum())
+            self._reserve(end)
+            self._days[start:end] = days[tail]
+            self._prices[start:end] = prices[tail]
+            self._cumsum[start + 1:end + 1] = self._cumsum[start] + np.cumsum(prices[tail])
+            self.size = end
+        return added
+
+    def _merge(self, days: np.ndarray, prices: np.ndarray):
+        merged_days = np.concatenate([self.days, days])
+        merged_prices = np.concatenate([self.prices, prices])
+        # Stable sort keeps the incoming price last for a duplicated day; keep the last of each run
+        order = np.argsort(merged_days, kind='stable')
+        merged_days, merged_prices = merged_days[order], merged_prices[order]
+        keep = np.append(merged_days[1:] != merged_days[:-1], True)
+        merged_days, merged_prices = merged_days[keep], merged_prices[keep]
+
+        self.size = 0
+        self._reserve(len(merged_days))
+        self._days[:len(merged_days)] = merged_days
+        self._prices[:len(merged_prices)] = merged_prices
+        self._cumsum[1:len(merged_prices) + 1] = np.cumsum(merged_prices)
+        self.size = len(merged_days)
+
+    def mean(self, start_day: int, end_day: int) -> Optional[float]:
+        """Mean price of observations with start_day < day <= end_day"""
+        lo = int(np.searchsorted(self.days, start_day, side='right'))
+        hi = int(np.searchsorted(self.days, end_day, side='right'))
+        if hi == lo:
+            return None
+        return float((self._cumsum[hi] - self._cumsum[lo]) / (hi - lo))
+
+    def summary(self, as_of: int) -> Dict[str, Any]:
+        """Latest price, change from the previous observation and rolling averages"""
+        price = float(self._prices[self.size - 1])
+        previous = float(self._prices[self.size - 2]) if self.size > 1 else None
+        summary = {
+            'crop': self.crop,
+            'market': self.market,
+            'unit': self.unit,
+            'price': round(price, 2),
+            'date': _date(self.last_day),
+            'change': round((price - previous) / previous * 100, 2) if previous else None,
+        }
+        for window in ROLLING_WINDOWS:
+            mean = self.mean(as_of - window, as_of)
+            summary[f'avg_{window}d'] = round(mean, 2) if mean is not None else None
+        return summary
+
+
+class MarketPriceStore:
+    """
+    In-memory market price history indexed by crop and market.
+
+    Observations live in one PriceSeries per (crop, market). After every
+    append the per-series summaries (latest price, change, 7/30-day
+    averages as of the newest date in the store) are recomputed for the
+    series that changed, and ready-made result lists are indexed by crop,
+    by market and by both, so a filtered query is a dict lookup no matter
+    how many years of history are loaded. Readers always see a complete
+    index: it is rebuilt aside and swapped in.
+    """
+
+    def __init__(self):
+        self._series: Dict[Tuple[str, str], PriceSeries] = {}
+        self._summaries: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        self._index: Dict[Tuple[Optional[str], Optional[str]], List[Dict[str, Any]]] = {(None, None): []}
+        self._lock = threading.Lock()
+        self.as_of = -1
+        self.observations = 0
+        self.appends = 0
+        self.rejected = 0
+
+    def append(self, frame) -> int:
+        """Add a DataFrame of crop, market, date, price (and optional unit) rows; returns rows added"""
+        missing = [c for c in PRICE_COLUMNS if c not in frame.columns]
+        if missing:
+            raise ValueError(f"Missing columns: {', '.join(missing)}")
+        if frame.empty:
+            return 0
+
+        import pandas as pd
+
+        # Rows with a missing field, a non-numeric price or an unparseable date are dropped and counted
+        dates = pd.to_datetime(frame['date'], errors='coerce')
+        numbers = pd.to_numeric(frame['price'], errors='coerce')
+        valid = (frame['crop'].notna() & frame['market'].notna() & dates.notna() & numbers.notna()).to_numpy()
+        if not valid.all():
+            rejected = int(len(valid) - valid.sum())
+            with self._lock:
+                self.rejected += rejected
+            logger.warning(f"Skipped {rejected} market price rows with a missing or malformed field")
+            frame, dates, numbers = frame[valid], dates[valid], numbers[valid]
+        if frame.empty:
+            return 0
+        days = dates.to_numpy().astype('datetime64[D]').astype(np.int64).astype(np.int32)
+        units = frame[UNIT_COLUMN] if UNIT_COLUMN in frame.columns else None
+        prices = numbers.to_numpy(dtype=np.float64)
+
+        # Names are normalized once per distinct value, not per row
+        crop_rows, crop_names = pd.factorize(frame['crop'].astype(str))
+        market_rows, market_names = pd.factorize(frame['market'].astype(str))
+        crop_ids, crop_keys = pd.factorize(np.array([_key(name) for name in crop_names], dtype=object))
+        market_ids, market_keys = pd.factorize(np.array([_key(name) for name in market_names], dtype=object))
+        codes = crop_ids[crop_rows].astype(np.int64) * len(market_keys) + market_ids[market_rows]
+
+        # Sort by series, day and row; the last report wins for a duplicated (crop, market, day)
+        order = np.lexsort((np.arange(len(days)), days, codes))
+        codes, days, prices = codes[order], days[order], prices[order]
+        last = np.append((codes[1:] != codes[:-1]) | (days[1:] != days[:-1]), True)
+        order, codes, days, prices = order[last], codes[last], days[last], prices[last]
+        bounds = np.flatnonzero(codes[1:] != codes[:-1]) + 1
+
+        with self._lock:
+            added = 0
+            touched = []
+            for start, end in zip(np.r_[0, bounds].tolist(), np.r_[bounds, len(codes)].tolist()):
+                crop_id, market_id = divmod(int(codes[start]), len(market_keys))
+                key = (crop_keys[crop_id], market_keys[market_id])
+                series = self._series.get(key)
+                if series is None:
+                    row = order[start]
+                    unit = str(units.iloc[row]) if units is not None else 'KES/kg'
+                    crop, market = crop_names[crop_rows[row]].strip(), market_names[market_rows[row]].strip()
+                    series = self._series[key] = PriceSeries(crop, market, unit)
+                added += series.add(days[start:end], prices[start:end])
+                touched.append(key)
+
+            self.observations += added
+            self.appends += 1
+            as_of = max(self.as_of, int(days.max()))
+            # A newer date moves every rolling window; otherwise only touched series change
+            keys = self._series if as_of != self.as_of else touched
+            self.as_of = as_of
+            for key in keys:
+                self._summaries[key] = self._series[key].summary(as_of)
+            self._rebuild_index()
+        return added
+
+    def _rebuild_index(self):
+        summaries = sorted(self._summaries.items(), key=lambda item: item[0])
+        index: Dict[Tuple[Optional[str], Optional[str]], List[Dict[str, Any]]] = {(None, None): []}
+        for (crop, market), summary in summaries:
+            for key in ((None, None), (crop, None), (None, market), (crop, market)):
+                index.setdefault(key, []).append(summary)
+        self._index = index
+
+    def query(self, crop: Optional[str] = None, market: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Latest prices with rolling averages, optionally filtered by crop and/or market"""
+        return self._index.get((_key(crop), _key(market)), [])
+
+    def latest(self, crop: str, market: str) -> Optional[Dict[str, Any]]:
+        return self._summaries.get((_key(crop), _key(market)))
+
+    def rolling_average(self, crop: str, market: str, days: int, as_of: Optional[str] = None) -> Optional[float]:
+        """Mean price over the ``days`` days up to as_of (default: the newest date in the store)"""
+        series = self._series.get((_key(crop), _key(market)))
+        if series is None:
+            return None
+        end = int((np.datetime64(as_of, 'D') - EPOCH).astype(np.int64)) if as_of else self.as_of
+        return series.mean(end - days, end)
+
+    def history(self, crop: str, market: str, days: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Daily prices of one series, the last ``days`` days up to the newest date when given"""
+        series = self._series.get((_key(crop), _key(market)))
+        if series is None:
+            return []
+        start = int(np.searchsorted(series.days, self.as_of - days, side='right')) if days else 0
+        return [
+            {'date': _date(day), 'price': round(price, 2)}
+            for day, price in zip(series.days[start:].tolist(), series.prices[start:].tolist())
+        ]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'series': len(self._series),
+            'crops': len({crop for crop, _ in self._series}),
+            'markets': len({market for _, market in self._series}),
+            'observations': self.observations,
+            'as_of': _date(self.as_of) if self.as_of >= 0 else None,
+            'appends': self.appends,
+            'rejected': self.rejected,
+        }
+
+
+class CsvPriceSource:
+    """
+    Reads a growing CSV of crop, market, date, price[, unit] rows.
+
+    Only the bytes appended since the last read are parsed; a file that
+    shrank (rotated or rewritten) is read again from the start.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._offset = 0
+        self._header = b''
+
+    def read_new(self) -> Optional[Tuple[Any, int]]:
+        """
+        Rows appended since the last committed read, and the offset to pass
+        to :meth:`commit` once they are stored; None when there are none.
+        The offset only moves on commit, so a read or append that fails is
+        retried next time; malformed rows are skipped by the store instead.
+        """
+        import pandas as pd
+
+        size = os.path.getsize(self.path)
+        offset = self._offset
+        if size < offset:
+            logger.info(f"{self.path} shrank, re-reading it from the start")
+            offset = 0
+        if size == offset:
+            return None
+
+        with open(self.path, 'rb') as f:
+            if offset == 0:
+                self._header = f.readline()
+                offset = f.tell()
+            f.seek(offset)
+            data = f.read(size - offset)
+
+        # Leave a partially written last line for the next read
+        end = data.rfind(b'\n') + 1
+        if not end:
+            return None
+        frame = pd.read_csv(io.BytesIO(self._header + data[:end]), skipinitialspace=True, on_bad_lines='warn')
+        return frame, offset + end
+
+    def commit(self, offset: int):
+        """Mark everything before offset as stored"""
+        self._offset = offset
+
+
+class MarketDataEngine:
+    """Keeps a MarketPriceStore up to date from a price file in the background"""
+
+    def __init__(self, source: CsvPriceSource, refresh_seconds: float = 300):
+        self.source = source
+        self.refresh_seconds = refresh_seconds
+        self.store = MarketPriceStore()
+        self.last_error: Optional[str] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @classmethod
+    def from_env(cls) -> Optional["MarketDataEngine"]:
+        """An engine for MARKET_PRICES_PATH, or None when no price file is configured"""
+        path = os.getenv('MARKET_PRICES_PATH', '/app/data/market_prices.csv')
+        if not path or not os.path.exists(path):
+            return None
+        return cls(CsvPriceSource(path), float(os.getenv('MARKET_PRICES_REFRESH_SECONDS', '300')))
+
+    async def refresh(self) -> int:
+        """Append whatever the source has added since the last refresh"""
+        def load() -> int:
+            new_rows = self.source.read_new()
+            if new_rows is None:
+                return 0
+            frame, offset = new_rows
+            added = self.store.append(frame)
+            self.source.commit(offset)
+            return added
+
+        try:
+            added = await asyncio.to_thread(load)
+            self.last_error = None
+        except Exception as e:
+            self.last_error = str(e)
+            logger.error(f"Error refreshing market prices: {str(e)}")
+            return 0
+        if added:
+            logger.info(f"Market prices: {added} new observations, {self.store.observations} total")
+        return added
+
+    async def start(self):
+        await self.refresh()
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.refresh_seconds)
+            await self.refresh()
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self.store.stats(), 'source': self.source.path, 'last_error': self.last_error}
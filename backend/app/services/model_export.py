@@ -0,0 +1,132 @@
+"""
+Export the disease detection model for the ONNX Runtime and TFLite backends.
+
+Usage (from backend/):
+    python -m app.services.model_export --formats onnx tflite
+    python -m app.services.model_export --formats onnx --model-dir ./models --images ./samples
+    python -m app.services.model_export --formats tflite --int8 --calibration-images ./calibration
+
+Models are written to the model cache (MODEL_CACHE_DIR) under the names
+AIService looks for. After each export the backend is checked against the
+Keras model: every crop head must predict the same disease from both
+models' features, and the features must agree within --atol, or the
+command exits non-zero. --int8 also writes a post-training int8 TFLite
+model (DISEASE_MODEL_PRECISION=int8); see benchmarks/quantization_report.py
+for its accuracy regression report.
+"""
+import argparse
+import logging
+import os
+import sys
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+from app.services.inference_backends import InferenceBackend, KerasBackend, create_backend, model_path
+
+logger = logging.getLogger(__name__)
+
+
+def export_onnx(model, path: str):
+    """Convert a Keras model to ONNX with a dynamic batch dimension"""
+    import tensorflow as tf
+    import tf2onnx
+
+    signature = (tf.TensorSpec((None, 224, 224, 3), tf.float32, name='image'),)
+    tf2onnx.convert.from_keras(model, input_signature=signature, opset=13, output_path=path)
+
+
+def export_tflite(model, path: str):
+    """Convert a Keras model to a float32 TFLite flatbuffer"""
+    import tensorflow as tf
+
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    with open(path, 'wb') as f:
+        f.write(converter.convert())
+
+
+EXPORTERS = {
+    'onnx': export_onnx,
+    'tflite': export_tflite,
+}
+
+
+def check_parity(reference: InferenceBackend, candidate: InferenceBackend, batch: np.ndarray, heads,
+                 atol: float = 1e-4) -> Dict[str, Any]:
+    """Compare candidate features against the reference backend, and the diseases every crop head predicts from them"""
+    from app.services.quantization import compare_features
+
+    report = compare_features(reference.predict(batch), candidate.predict(batch), heads)
+    report['backend'] = candidate.name
+    report['passed'] = report['max_abs_diff'] <= atol and report['top1_agreement'] == 1.0
+    return report
+
+
+def parity_batch(images: Optional[str] = None, count: int = 16) -> np.ndarray:
+    """Real images from a directory if given (found and preprocessed like the calibration set), otherwise random pixels"""
+    if images:
+        from app.services.quantization import find_images, load_batch
+
+        return load_batch(find_images(images)[:count])
+
+    rng = np.random.default_rng(0)
+    return rng.random((count, 224, 224, 3), dtype=np.float32)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--formats', nargs='*', choices=sorted(EXPORTERS), default=sorted(EXPORTERS))
+    parser.add_argument('--model-dir', default=os.getenv('MODEL_CACHE_DIR', '/app/models'))
+    parser.add_argument('--version', default=os.getenv('DISEASE_MODEL_VERSION', '1.0.0'))
+    parser.add_argument('--images', help='Directory of sample images for the parity check')
+    parser.add_argument('--atol', type=float, default=1e-4)
+    parser.add_argument('--int8', action='store_true', help='Also export a post-training int8 TFLite model')
+    parser.add_argument('--calibration-images', help='Representative images for int8 calibration')
+    parser.add_argument('--calibration-limit', type=int, default=200)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+
+    from app.services.ai_service import AIService
+
+    service = AIService()
+    service.model_cache_dir = args.model_dir
+    service.model_version = args.version
+    reference = KerasBackend(service._load_keras_disease_model())
+    heads = service._load_crop_heads(reference.output_size)
+    batch = parity_batch(args.images)
+
+    failed = False
+    for backend in args.formats:
+        path = model_path(args.model_dir, args.version, backend)
+        EXPORTERS[backend](reference.model, path)
+        logger.info(f"Exported {backend} model to {path}")
+
+        report = check_parity(reference, create_backend(backend, path), batch, heads, args.atol)
+        logger.info(
+            f"{backend} parity: top1_agreement={report['top1_agreement']:.1%}, "
+            f"feature max_abs_diff={report['max_abs_diff']:.2e} -> {'OK' if report['passed'] else 'FAILED'}"
+        )
+        failed = failed or not report['passed']
+
+    if args.int8:
+        from app.services.quantization import compare_features, find_images, quantize_int8
+
+        path = model_path(args.model_dir, args.version, 'tflite', precision='int8')
+        calibration = find_images(args.calibration_images) if args.calibration_images else []
+        quantize_int8(reference.model, path, calibration, args.calibration_limit)
+
+        # Quantized models are expected to drift, so report instead of failing on atol
+        report = compare_features(reference.predict(batch), create_backend('tflite', path).predict(batch), heads)
+        for crop, crop_report in report['crops'].items():
+            logger.info(f"int8 vs float, {crop}: top1_agreement={crop_report['top1_agreement']:.1%}, "
+                        f"mean_abs_diff={crop_report['mean_abs_diff']:.2e} in probability")
+        logger.info(
+            f"int8 vs float features: mean_abs_diff={report['mean_abs_diff']:.2e}, max_abs_diff={report['max_abs_diff']:.2e}"
+        )
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
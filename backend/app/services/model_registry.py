@@ -0,0 +1,139 @@
+import asyncio
+import logging
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, Optional
+
+from app.core.metrics import MODEL_LOAD_SECONDS, MODEL_READY
+
+logger = logging.getLogger(__name__)
+
+
+class ModelNotReadyError(Exception):
+    """Raised when a model is still loading (or failed to load)"""
+
+    def __init__(self, name: str, retry_after: int = 5):
+        super().__init__(f"Model '{name}' is not ready")
+        self.name = name
+        self.retry_after = retry_after
+
+
+class ModelRegistry:
+    """
+    Loads models lazily or in parallel background threads and tracks
+    per-model readiness, so requests that don't need a model (or whose model
+    is already loaded) are served while the rest are still loading.
+    """
+
+    def __init__(self, max_workers: int = 4, retry_after: int = 5):
+        self.retry_after = retry_after
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="model-loader")
+        self._lock = threading.Lock()
+        self._loaders: Dict[str, Callable[[], Any]] = {}
+        self._futures: Dict[str, Future] = {}
+        self._models: Dict[str, Any] = {}
+        self._load_times: Dict[str, float] = {}
+        self._errors: Dict[str, str] = {}
+        self._started_at: Optional[float] = None
+
+    def register(self, name: str, loader: Callable[[], Any]):
+        """Register a blocking loader that returns the model"""
+        self._loaders[name] = loader
+
+    def start_loading(self, names: Optional[Iterable[str]] = None):
+        """Start loading models in the background without waiting for them"""
+        for name in names or list(self._loaders):
+            self._submit(name)
+
+    def _submit(self, name: str) -> Future:
+        with self._lock:
+            future = self._futures.get(name)
+            if future is None or name in self._errors:
+                self._errors.pop(name, None)
+                if self._started_at is None:
+                    self._started_at = time.perf_counter()
+                future = self._futures[name] = self._executor.submit(self._load, name)
+            return future
+
+    def _load(self, name: str) -> Any:
+        """Run a loader on a background thread and record how long it took"""
+        logger.info(f"Loading model '{name}'...")
+        started = time.perf_counter()
+        try:
+            model = self._loaders[name]()
+        except Exception as e:
+            self._errors[name] = str(e)
+            logger.error(f"Error loading model '{name}': {str(e)}")
+            raise
+
+        self._load_times[name] = time.perf_counter() - started
+        self._models[name] = model
+        MODEL_LOAD_SECONDS.set(self._load_times[name], name)
+        MODEL_READY.set(1, name)
+        logger.info(f"Model '{name}' loaded in {self._load_times[name]:.2f}s")
+
+        if self.all_ready():
+            self._log_startup_report()
+        return model
+
+    def is_ready(self, name: str) -> bool:
+        return name in self._models
+
+    def all_ready(self) -> bool:
+        return all(name in self._models for name in self._loaders)
+
+    def peek(self, name: str) -> Optional[Any]:
+        """Return the model if it is loaded, without triggering a load"""
+        return self._models.get(name)
+
+    async def get(self, name: str, timeout: Optional[float] = 0) -> Any:
+        """
+        Return a loaded model, starting a lazy load if needed.
+
+        Waits up to ``timeout`` seconds for a model that is still loading, then
+        raises :class:`ModelNotReadyError`; 0 doesn't wait and None waits for
+        as long as the load takes.
+        """
+        model = self._models.get(name)
+        if model is not None:
+            return model
+
+        future = self._submit(name)
+        if timeout is not None and timeout <= 0:
+            if future.done() and not future.cancelled() and future.exception() is None:
+                return future.result()
+            raise ModelNotReadyError(name, self.retry_after)
+        try:
+            return await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(future)), timeout)
+        except asyncio.TimeoutError:
+            raise ModelNotReadyError(name, self.retry_after)
+        except Exception:
+            raise ModelNotReadyError(name, self.retry_after)
+
+    def status(self) -> Dict[str, Dict[str, Any]]:
+        """Per-model readiness for /health"""
+        status = {}
+        for name in self._loaders:
+            if name in self._models:
+                state = 'ready'
+            elif name in self._errors:
+                state = 'failed'
+            elif name in self._futures:
+                state = 'loading'
+            else:
+                state = 'not_loaded'
+            status[name] = {
+                'status': state,
+                'load_time_s': round(self._load_times[name], 3) if name in self._load_times else None,
+                'error': self._errors.get(name),
+            }
+        return status
+
+    def _log_startup_report(self):
+        total = time.perf_counter() - self._started_at if self._started_at else 0.0
+        report = ", ".join(f"{name}={seconds:.2f}s" for name, seconds in self._load_times.items())
+        logger.info(f"All models ready in {total:.2f}s ({report})")
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,188 @@
+import logging
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+HASH_BITS = 64
+
+
+# Bit counts for every byte value, for popcount on numpy < 2.0
+POPCOUNT_TABLE = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+
+def popcount64(values: np.ndarray) -> np.ndarray:
+    """Count set bits in each element of a uint64 array"""
+    if hasattr(np, 'bitwise_count'):
+        return np.bitwise_count(values)
+    return POPCOUNT_TABLE[values.view(np.uint8)].reshape(-1, 8).sum(axis=1)
+
+
+class _Bucket:
+    """Growable pair of arrays holding the hashes and slots that share one chunk value"""
+
+    __slots__ = ('hashes', 'slots', 'count')
+
+    def __init__(self):
+        self.hashes = np.empty(4, dtype=np.uint64)
+        self.slots = np.empty(4, dtype=np.int64)
+        self.count = 0
+
+    def append(self, phash: int, slot: int):
+        if self.count == len(self.hashes):
+            self.hashes = np.resize(self.hashes, self.count * 2)
+            self.slots = np.resize(self.slots, self.count * 2)
+        self.hashes[self.count] = phash
+        self.slots[self.count] = slot
+        self.count += 1
+
+    def remove(self, slot: int):
+        # Swap the last entry into the removed position
+        position = int(np.flatnonzero(self.slots[:self.count] == slot)[0])
+        self.count -= 1
+        self.hashes[position] = self.hashes[self.count]
+        self.slots[position] = self.slots[self.count]
+
+
+class HammingIndex:
+    """
+    Bounded multi-index hash table for 64-bit perceptual hashes.
+
+    The hash is split into ``max_distance + 1`` disjoint chunks, each with its
+    own exact-match table. By the pigeonhole principle any hash within
+    ``max_distance`` bits of a query agrees with it exactly on at least one
+    chunk, so a lookup only has to verify the few candidates sharing a chunk
+    instead of scanning every entry; candidates are checked with vectorized
+    popcounts. Entries live in a fixed-size ring; when it is full the oldest
+    entry is overwritten.
+    """
+
+    def __init__(self, capacity: int = 50000, max_distance: int = 4):
+        self.capacity = capacity
+        self.max_distance = max_distance
+
+        # Split the 64 bits into max_distance + 1 chunks of (nearly) equal width
+        chunks = max_distance + 1
+        widths = [HASH_BITS // chunks + (1 if i < HASH_BITS % chunks else 0) for i in range(chunks)]
+        self._chunk_specs: List[Tuple[int, int]] = []
+        offset = 0
+        for width in widths:
+            self._chunk_specs.append((offset, (1 << width) - 1))
+            offset += width
+
+        self._tables: List[Dict[int, _Bucket]] = [{} for _ in self._chunk_specs]
+        self._hashes: List[Optional[int]] = [None] * capacity
+        self._values: List[Any] = [None] * capacity
+        self._next = 0
+        self.size = 0
+
+    def _chunks(self, phash: int) -> List[int]:
+        return [(phash >> offset) & mask for offset, mask in self._chunk_specs]
+
+    def add(self, phash: int, value: Any):
+        """Insert a hash, evicting the oldest entry when the index is full"""
+        slot = self._next
+        if self._hashes[slot] is not None:
+            self._remove(slot)
+        else:
+            self.size += 1
+
+        self._hashes[slot] = phash
+        self._values[slot] = value
+        for table, key in zip(self._tables, self._chunks(phash)):
+            bucket = table.get(key)
+            if bucket is None:
+                bucket = table[key] = _Bucket()
+            bucket.append(phash, slot)
+
+        self._next = (slot + 1) % self.capacity
+
+    def _remove(self, slot: int):
+        for table, key in zip(self._tables, self._chunks(self._hashes[slot])):
+            bucket = table[key]
+            bucket.remove(slot)
+            if not bucket.count:
+                del table[key]
+        self._hashes[slot] = None
+        self._values[slot] = None
+
+    def search(self, phash: int, max_distance: Optional[int] = None) -> Optional[Tuple[int, Any]]:
+        """Return (distance, value) of the closest entry within max_distance, if any"""
+        radius = self.max_distance if max_distance is None else min(max_distance, self.max_distance)
+        best_distance = radius + 1
+        best_slot = None
+        query = np.uint64(phash)
+
+        for table, key in zip(self._tables, self._chunks(phash)):
+            bucket = table.get(key)
+            if bucket is None:
+                continue
+            distances = popcount64(bucket.hashes[:bucket.count] ^ query)
+            position = int(distances.argmin())
+            if distances[position] < best_distance:
+                best_distance = int(distances[position])
+                best_slot = int(bucket.slots[position])
+                if best_distance == 0:
+                    break
+
+        if best_slot is None:
+            return None
+        return best_distance, self._values[best_slot]
+
+    def __len__(self) -> int:
+        return self.size
+
+
+class NearDuplicateIndex:
+    """Per-crop perceptual hash indexes over recent detection results"""
+
+    def __init__(self, capacity_per_crop: int = 50000, max_distance: int = 4):
+        self.capacity_per_crop = capacity_per_crop
+        self.max_distance = max_distance
+        self._indexes: Dict[str, HammingIndex] = {}
+
+        # Counters
+        self.lookups = 0
+        self.hits = 0
+        self.distance_total = 0
+        self.lookup_time_total = 0.0
+
+    def _index(self, crop_type: str) -> HammingIndex:
+        index = self._indexes.get(crop_type)
+        if index is None:
+            index = self._indexes[crop_type] = HammingIndex(self.capacity_per_crop, self.max_distance)
+        return index
+
+    def lookup(self, crop_type: str, phash: int) -> Optional[Any]:
+        """Return the value stored for a near-duplicate image, if one is indexed"""
+        started = time.perf_counter()
+        match = self._index(crop_type).search(phash)
+        self.lookup_time_total += time.perf_counter() - started
+        self.lookups += 1
+
+        if match is None:
+            return None
+
+        distance, value = match
+        self.hits += 1
+        self.distance_total += distance
+        return value
+
+    def add(self, crop_type: str, phash: int, value: Any):
+        """Index the value for an image hash"""
+        self._index(crop_type).add(phash, value)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return index size, hit rate and lookup latency"""
+        return {
+            'max_distance': self.max_distance,
+            'capacity_per_crop': self.capacity_per_crop,
+            'entries': {crop: len(index) for crop, index in self._indexes.items()},
+            'lookups': self.lookups,
+            'hits': self.hits,
+            'hit_rate': round(self.hits / self.lookups, 4) if self.lookups else 0.0,
+            'avg_hit_distance': round(self.distance_total / self.hits, 2) if self.hits else 0.0,
+            'avg_lookup_us': round(self.lookup_time_total / self.lookups * 1e6, 2) if self.lookups else 0.0,
+        }
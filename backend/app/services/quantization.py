@@ -0,0 +1,97 @@
+import logging
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+import numpy as np
+
+from app.services.image_preprocessing import TensorBuffer, preprocess_image
+
+logger = logging.getLogger(__name__)
+
+IMAGE_SUFFIXES = {'.jpg', '.jpeg', '.png', '.webp'}
+
+
+def find_images(directory: str) -> List[Path]:
+    """All images below a directory, in a stable order"""
+    return sorted(p for p in Path(directory).rglob('*') if p.suffix.lower() in IMAGE_SUFFIXES)
+
+
+def load_batch(paths: List[Path]) -> np.ndarray:
+    """Preprocess images exactly as the serving path does"""
+    buffer = TensorBuffer(len(paths))
+    for index, path in enumerate(paths):
+        buffer.fill(index, preprocess_image(path.read_bytes())[0])
+    return buffer.view(len(paths))
+
+
+def representative_dataset(paths: List[Path], limit: int = 200) -> Iterator[List[np.ndarray]]:
+    """Yield calibration samples one at a time for the TFLite converter"""
+    if not paths:
+        logger.warning("No calibration images found, calibrating on random pixels; int8 accuracy will suffer")
+        rng = np.random.default_rng(0)
+        for _ in range(limit // 2):
+            yield [rng.random((1, 224, 224, 3), dtype=np.float32)]
+        return
+
+    for path in paths[:limit]:
+        yield [load_batch([path])]
+
+
+def quantize_int8(model, path: str, calibration_paths: List[Path], limit: int = 200):
+    """
+    Post-training int8 quantization of a Keras model to TFLite.
+
+    Weights and activations are int8, with ranges calibrated on the
+    representative images. Input and output stay float32 so the model is a
+    drop-in replacement behind the same InferenceBackend interface.
+    """
+    import tensorflow as tf
+
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    converter.representative_dataset = lambda: representative_dataset(calibration_paths, limit)
+    converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+
+    with open(path, 'wb') as f:
+        f.write(converter.convert())
+    logger.info(f"Wrote int8 model calibrated on {min(len(calibration_paths), limit)} images to {path}")
+
+
+def compare_predictions(float_output: np.ndarray, int8_output: np.ndarray, labels: Optional[np.ndarray] = None) -> Dict[str, float]:
+    """Accuracy-regression metrics of the int8 model against the float model"""
+    float_top1 = np.argmax(float_output, axis=1)
+    int8_top1 = np.argmax(int8_output, axis=1)
+    diff = np.abs(float_output - int8_output)
+
+    report = {
+        'samples': int(len(float_output)),
+        'top1_agreement': float(np.mean(float_top1 == int8_top1)),
+        'mean_abs_diff': float(diff.mean()),
+        'max_abs_diff': float(diff.max()),
+    }
+    if labels is not None:
+        report['float_accuracy'] = float(np.mean(float_top1 == labels))
+        report['int8_accuracy'] = float(np.mean(int8_top1 == labels))
+        report['accuracy_drop'] = report['float_accuracy'] - report['int8_accuracy']
+    return report
+
+
+def compare_features(reference: np.ndarray, candidate: np.ndarray, heads) -> Dict[str, Any]:
+    """
+    Compare two backbones by what every crop head predicts from their features.
+
+    ``top1_agreement`` is that of the worst crop; ``max_abs_diff`` and
+    ``mean_abs_diff`` are on the raw features.
+    """
+    crops = {
+        crop: compare_predictions(heads.predict(reference, crop), heads.predict(candidate, crop))
+        for crop in heads.crops
+    }
+    diff = np.abs(reference - candidate)
+    return {
+        'samples': int(len(reference)),
+        'top1_agreement': min(report['top1_agreement'] for report in crops.values()),
+        'mean_abs_diff': float(diff.mean()),
+        'max_abs_diff': float(diff.max()),
+        'crops': crops,
+    }
@@ -0,0 +1,141 @@
+import hashlib
+import json
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class DetectionResultCache:
+    """
+    Content-addressed cache for disease detection results.
+
+    Keys are a SHA-256 of the raw upload bytes plus the crop type and model
+    version, so a hit never needs the image to be decoded. Entries live in an
+    in-memory LRU tier (bounded by entry count and TTL) and, when a Redis URL
+    is configured, in a shared Redis tier used by every worker.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 2048,
+        ttl_seconds: float = 3600,
+        redis_url: Optional[str] = None,
+        redis_ttl_seconds: Optional[float] = None,
+        namespace: str = "agriwise:detection",
+        redis_retry_seconds: float = 30,
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl_seconds
+        self.redis_ttl = redis_ttl_seconds or ttl_seconds * 24
+        self.namespace = namespace
+        self.redis_retry_seconds = redis_retry_seconds
+
+        # key -> (expires_at, result)
+        self._entries: OrderedDict = OrderedDict()
+        self._redis = None
+        self._redis_disabled_until = 0.0
+        if redis_url:
+            try:
+                import redis.asyncio as aioredis
+                self._redis = aioredis.from_url(redis_url, socket_timeout=0.05)
+            except Exception as e:
+                logger.warning(f"Detection cache Redis tier disabled: {str(e)}")
+
+        # Counters
+        self.memory_hits = 0
+        self.redis_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.redis_errors = 0
+
+    @staticmethod
+    def make_key(image_data, crop_type: str, model_version: str) -> str:
+        """Build the cache key for an upload"""
+        digest = hashlib.sha256(image_data).hexdigest()
+        return f"{digest}:{crop_type}:{model_version}"
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Look up a result in memory, then in Redis"""
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires_at, value = entry
+            if expires_at > time.monotonic():
+                self._entries.move_to_end(key)
+                self.memory_hits += 1
+                return dict(value)
+            del self._entries[key]
+            self.expirations += 1
+
+        if self._redis_available():
+            try:
+                raw = await self._redis.get(f"{self.namespace}:{key}")
+            except Exception as e:
+                self._redis_failed(e)
+                raw = None
+            if raw is not None:
+                value = json.loads(raw)
+                self._store(key, value)
+                self.redis_hits += 1
+                return dict(value)
+
+        self.misses += 1
+        return None
+
+    async def set(self, key: str, value: Dict[str, Any]):
+        """Store a result in every tier"""
+        self._store(key, value)
+
+        if self._redis_available():
+            try:
+                await self._redis.set(
+                    f"{self.namespace}:{key}", json.dumps(value), ex=int(self.redis_ttl)
+                )
+            except Exception as e:
+                self._redis_failed(e)
+
+    def _store(self, key: str, value: Dict[str, Any]):
+        """Insert into the memory tier, evicting the least recently used entries"""
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def _redis_available(self) -> bool:
+        return self._redis is not None and time.monotonic() >= self._redis_disabled_until
+
+    def _redis_failed(self, error: Exception):
+        """Back off from Redis for a while so an outage doesn't slow every request"""
+        self.redis_errors += 1
+        self._redis_disabled_until = time.monotonic() + self.redis_retry_seconds
+        logger.warning(f"Detection cache Redis error, retrying in {self.redis_retry_seconds}s: {str(error)}")
+
+    def clear(self):
+        """Drop all in-memory entries"""
+        self._entries.clear()
+
+    async def close(self):
+        """Close the Redis connection"""
+        if self._redis is not None:
+            await self._redis.close()
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss/eviction counters"""
+        lookups = self.memory_hits + self.redis_hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'max_entries': self.max_entries,
+            'ttl_seconds': self.ttl,
+            'redis_enabled': self._redis is not None,
+            'memory_hits': self.memory_hits,
+            'redis_hits': self.redis_hits,
+            'misses': self.misses,
+            'hit_rate': round((self.memory_hits + self.redis_hits) / lookups, 4) if lookups else 0.0,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+            'redis_errors': self.redis_errors,
+        }
@@ -0,0 +1,94 @@
+"""
+Model weights stored as plain ``.npy`` files in the model cache and opened
+as copy-on-write memory maps.
+
+Every worker process that maps the same file shares its pages through the
+OS page cache, so N workers hold one copy of the weights instead of N; a
+page only becomes private to a worker if that worker writes to it. The
+first worker to load a model exports its weights; the others (and later
+restarts) map the exported files directly.
+"""
+import json
+import logging
+import os
+import shutil
+import tempfile
+from typing import Callable, Dict
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+MANIFEST = 'manifest.json'
+
+
+def export_arrays(directory: str, arrays: Dict[str, np.ndarray]):
+    """
+    Write arrays as ``.npy`` files under directory.
+
+    Files are written to a staging directory that is renamed into place, so
+    readers see either every array or none; when several workers export at
+    once, the first rename wins and the rest are discarded.
+    """
+    parent = os.path.dirname(os.path.abspath(directory))
+    os.makedirs(parent, exist_ok=True)
+    staging = tempfile.mkdtemp(prefix=f'.{os.path.basename(directory)}-', dir=parent)
+    try:
+        manifest = {}
+        for index, (name, array) in enumerate(arrays.items()):
+            # Names can contain dots and slashes, so files are numbered and named in the manifest
+            filename = f'{index:05d}.npy'
+            np.save(os.path.join(staging, filename), np.ascontiguousarray(array))
+            manifest[name] = filename
+        with open(os.path.join(staging, MANIFEST), 'w') as f:
+            json.dump(manifest, f)
+        os.rename(staging, directory)
+    except OSError:
+        shutil.rmtree(staging, ignore_errors=True)
+        if not os.path.exists(os.path.join(directory, MANIFEST)):
+            raise
+
+
+def map_arrays(directory: str) -> Dict[str, np.ndarray]:
+    """Open arrays written by :func:`export_arrays` as copy-on-write memory maps"""
+    with open(os.path.join(directory, MANIFEST)) as f:
+        manifest = json.load(f)
+    arrays = {}
+    for name, filename in manifest.items():
+        path = os.path.join(directory, filename)
+        try:
+            arrays[name] = np.load(path, mmap_mode='c')
+        except ValueError:
+            # Empty arrays can't be mapped
+            arrays[name] = np.load(path)
+    return arrays
+
+
+def shared_arrays(directory: str, build: Callable[[], Dict[str, np.ndarray]]) -> Dict[str, np.ndarray]:
+    """Mapped arrays from directory, exporting ``build()`` there first if they don't exist yet"""
+    if not os.path.exists(os.path.join(directory, MANIFEST)):
+        arrays = build()
+        try:
+            export_arrays(directory, arrays)
+            logger.info(f"Exported {sum(a.nbytes for a in arrays.values()) / 1e6:.1f} MB of shared weights to {directory}")
+        except OSError as e:
+            logger.warning(f"Could not export shared weights to {directory}, keeping a private copy: {str(e)}")
+            return arrays
+    return map_arrays(directory)
+
+
+def share_torch_module(module, directory: str):
+    """
+    Replace a PyTorch module's parameters and buffers with tensors backed by
+    memory maps under directory.
+
+    Meant for inference: any weight the module updates in place stops being
+    shared. Non-persistent buffers are left as they are.
+    """
+    import torch
+
+    state = module.state_dict()
+    mapped = shared_arrays(directory, lambda: {name: tensor.detach().cpu().numpy() for name, tensor in state.items()})
+    tensors = {name: torch.from_numpy(array) for name, array in mapped.items()}
+    module.load_state_dict(tensors, assign=True)
+    return module
@@ -0,0 +1,89 @@
+import hashlib
+from typing import Any, Dict, List, Union
+
+import numpy as np
+
+from app.services.inference_backends import InferenceBackend
+from app.services.voice_streaming import Recognizer
+
+# Pixels are mean-pooled over POOL x POOL blocks before the projection
+POOL = 8
+
+
+class StubBackend(InferenceBackend):
+    """
+    Disease backbone with fixed random weights, used when STUB_MODELS=true.
+
+    Mean-pools the batch and projects it to ``output_size`` features, so the
+    serving path (batching, heads, caching) runs unchanged on a CPU-only box
+    without TensorFlow or trained weights. Predictions are deterministic per
+    image but meaningless.
+    """
+
+    name = 'stub'
+
+    def __init__(self, output_size: int = 64, input_size: int = 224, seed: int = 0):
+        cells = (input_size // POOL) ** 2 * 3
+        rng = np.random.default_rng(seed)
+        self.weights = rng.standard_normal((cells, output_size)).astype(np.float32) / np.sqrt(cells)
+        self.bias = rng.standard_normal(output_size).astype(np.float32)
+        self._output_size = output_size
+
+    @property
+    def output_size(self) -> int:
+        return self._output_size
+
+    def predict(self, batch: np.ndarray) -> np.ndarray:
+        n, height, width, channels = batch.shape
+        pooled = batch.reshape(n, height // POOL, POOL, width // POOL, POOL, channels).mean(axis=(2, 4))
+        return np.maximum(pooled.reshape(n, -1) @ self.weights + self.bias, 0)
+
+
+class StubTextPipeline:
+    """Stand-in for a Hugging Face text pipeline: a label derived from a hash of the text"""
+
+    LABELS = {
+        'sentiment-analysis': ('negative', 'neutral', 'positive'),
+        'text-classification': ('LABEL_0', 'LABEL_1'),
+    }
+
+    def __init__(self, task: str):
+        self.task = task
+        self.labels = self.LABELS.get(task, ('LABEL_0', 'LABEL_1'))
+
+    def __call__(self, inputs: Union[str, List[str]], **kwargs) -> List[Dict[str, Any]]:
+        texts = [inputs] if isinstance(inputs, str) else list(inputs)
+        results = []
+        for text in texts:
+            digest = hashlib.blake2b(text.encode(), digest_size=4).digest()
+            value = int.from_bytes(digest, 'little')
+            results.append({
+                'label': self.labels[value % len(self.labels)],
+                'score': 0.5 + (value % 500) / 1000,
+            })
+        return results
+
+
+class StubStreamRecognizer(Recognizer):
+    """
+    Stand-in for an incremental speech recognizer: reveals a fixed sentence
+    for the language one word per ``seconds_per_word`` of audio, whatever
+    was said.
+    """
+
+    SCRIPTS = {
+        'swahili': 'nataka kujua bei ya mahindi sokoni leo',
+        'english': 'what is the price of maize at the market today',
+    }
+
+    def __init__(self, language: str, sample_rate: int, seconds_per_word: float = 0.25):
+        self.words = self.SCRIPTS.get(language, self.SCRIPTS['english']).split()
+        self.bytes_per_word = int(sample_rate * 2 * seconds_per_word)
+        self.received = 0
+
+    def accept(self, pcm: bytes) -> str:
+        self.received += len(pcm)
+        return ' '.join(self.words[:self.received // self.bytes_per_word])
+
+    def finish(self) -> str:
+        return ' '.join(self.words)
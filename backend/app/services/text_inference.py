@@ -0,0 +1,167 @@
+import logging
+import os
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+def configure_torch_threads(intra_op: Optional[int] = None, inter_op: Optional[int] = None):
+    """
+    Cap PyTorch's CPU thread pools.
+
+    By default every process uses one intra-op thread per core, which
+    oversubscribes the CPU as soon as several workers (or the TensorFlow
+    backbone) run at once. The inter-op pool can only be sized before its
+    first use, so that setting is skipped if it's too late.
+    """
+    import torch
+
+    if intra_op:
+        torch.set_num_threads(intra_op)
+    if inter_op:
+        try:
+            torch.set_num_interop_threads(inter_op)
+        except RuntimeError as e:
+            logger.warning(f"Could not set PyTorch inter-op threads: {str(e)}")
+
+
+def length_buckets(lengths: Sequence[int], max_batch_size: int, max_tokens: Optional[int] = None) -> List[np.ndarray]:
+    """
+    Indices of sequences grouped into batches of similar length.
+
+    Sequences are sorted by length and cut into consecutive batches of at
+    most ``max_batch_size`` sequences, and at most ``max_tokens`` tokens once
+    padded to the longest one, so long texts run in smaller batches and short
+    texts aren't padded to the length of long ones.
+    """
+    order = np.argsort(np.asarray(lengths), kind='stable')
+    buckets, start = [], 0
+    for end in range(1, len(order) + 1):
+        size = end - start
+        longest = lengths[order[end - 1]]
+        if size > max_batch_size or (max_tokens and size > 1 and size * longest > max_tokens):
+            buckets.append(order[start:end - 1])
+            start = end - 1
+    if start < len(order):
+        buckets.append(order[start:])
+    return buckets
+
+
+class TextClassifier:
+    """
+    Batched inference for a Hugging Face text-classification pipeline.
+
+    Texts are tokenized once, truncated to ``max_length`` tokens, grouped
+    into length buckets (see :func:`length_buckets`) and each bucket is
+    padded only to its own longest sequence before one forward pass of the
+    pipeline's model. Scores match the pipeline's defaults (softmax, or
+    sigmoid for single-label and multi-label heads).
+
+    Pipelines without a tokenizer and model (the STUB_MODELS stand-in) are
+    called directly on each bucket. Not thread-safe; run it on one thread.
+    """
+
+    def __init__(self, pipeline, max_length: int = 128, max_batch_size: int = 32, max_tokens: int = 4096):
+        self.pipeline = pipeline
+        self.tokenizer = getattr(pipeline, 'tokenizer', None)
+        self.model = getattr(pipeline, 'model', None)
+        self.max_length = max_length
+        if self.tokenizer is not None:
+            self.max_length = min(max_length, self.tokenizer.model_max_length)
+        self.max_batch_size = max_batch_size
+        self.max_tokens = max_tokens
+
+        # Counters
+        self.texts = 0
+        self.batches = 0
+        self.tokens = 0
+        self.padded_tokens = 0
+        # Texts that reached max_length tokens, so were (most likely) cut
+        self.truncated = 0
+
+    @classmethod
+    def from_env(cls, pipeline) -> "TextClassifier":
+        return cls(
+            pipeline,
+            max_length=int(os.getenv('NLP_MAX_LENGTH', '128')),
+            max_batch_size=int(os.getenv('NLP_BATCH_MAX_SIZE', '32')),
+            max_tokens=int(os.getenv('NLP_BATCH_MAX_TOKENS', '4096')),
+        )
+
+    def classify(self, texts: List[str]) -> List[Dict[str, Any]]:
+        """Label and score for every text, in input order"""
+        if not texts:
+            return []
+        if self.tokenizer is None or self.model is None:
+            return self._classify_with_pipeline(texts)
+
+        encodings = self.tokenizer(list(texts), truncation=True, max_length=self.max_length)
+        lengths = [len(ids) for ids in encodings['input_ids']]
+        results: List[Optional[Dict[str, Any]]] = [None] * len(texts)
+        for bucket in length_buckets(lengths, self.max_batch_size, self.max_tokens):
+            labels, scores = self._forward(encodings, bucket, lengths)
+            for index, label, score in zip(bucket.tolist(), labels, scores):
+                results[index] = {'label': label, 'score': score}
+            self._record_batch([lengths[i] for i in bucket])
+
+        self.truncated += sum(length >= self.max_length for length in lengths)
+        return results
+
+    def _forward(self, encodings, bucket: np.ndarray, lengths: List[int]):
+        """Pad one bucket to its longest sequence and run the model"""
+        import torch
+
+        longest = max(lengths[i] for i in bucket)
+        left = self.tokenizer.padding_side == 'left'
+        inputs = {}
+        for key, values in encodings.items():
+            pad = (self.tokenizer.pad_token_id or 0) if key == 'input_ids' else 0
+            array = np.full((len(bucket), longest), pad, dtype=np.int64)
+            for row, index in enumerate(bucket):
+                sequence = values[index]
+                if left:
+                    array[row, longest - len(sequence):] = sequence
+                else:
+                    array[row, :len(sequence)] = sequence
+            inputs[key] = torch.from_numpy(array)
+
+        with torch.inference_mode():
+            logits = self.model(**inputs).logits.float()
+
+        config = self.model.config
+        if config.num_labels == 1 or config.problem_type == 'multi_label_classification':
+            probabilities = torch.sigmoid(logits)
+        else:
+            probabilities = torch.softmax(logits, dim=-1)
+        scores, label_ids = probabilities.max(dim=-1)
+        return [config.id2label[i] for i in label_ids.tolist()], scores.tolist()
+
+    def _classify_with_pipeline(self, texts: List[str]) -> List[Dict[str, Any]]:
+        lengths = [len(text.split()) for text in texts]
+        results: List[Optional[Dict[str, Any]]] = [None] * len(texts)
+        for bucket in length_buckets(lengths, self.max_batch_size, self.max_tokens):
+            outputs = self.pipeline([texts[i] for i in bucket], truncation=True, max_length=self.max_length)
+            for index, output in zip(bucket.tolist(), outputs):
+                results[index] = output
+            self._record_batch([min(lengths[i], self.max_length) for i in bucket])
+        return results
+
+    def _record_batch(self, lengths: List[int]):
+        self.texts += len(lengths)
+        self.batches += 1
+        self.tokens += sum(lengths)
+        self.padded_tokens += len(lengths) * max(lengths)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'max_length': self.max_length,
+            'max_batch_size': self.max_batch_size,
+            'texts': self.texts,
+            'batches': self.batches,
+            'avg_batch_size': round(self.texts / self.batches, 2) if self.batches else 0.0,
+            'truncated': self.truncated,
+            # Share of the computed tokens that were real text rather than padding
+            'padding_efficiency': round(self.tokens / self.padded_tokens, 4) if self.padded_tokens else None,
+        }
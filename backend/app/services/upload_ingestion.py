@@ -0,0 +1,378 @@
+import json
+import logging
+import os
+import zipfile
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple, Union
+
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import UploadFile
+
+from app.services.image_preprocessing import BufferReader
+
+logger = logging.getLogger(__name__)
+
+# Upload limits
+MAX_IMAGE_BYTES = int(os.getenv('MAX_IMAGE_UPLOAD_BYTES', str(10 * 1024 * 1024)))
+MAX_AUDIO_BYTES = int(os.getenv('MAX_AUDIO_UPLOAD_BYTES', str(10 * 1024 * 1024)))
+MAX_IMAGE_PIXELS = int(os.getenv('MAX_IMAGE_PIXELS', str(40_000_000)))
+MAX_BATCH_IMAGES = int(os.getenv('MAX_BATCH_IMAGES', '100'))
+MAX_BATCH_BYTES = int(os.getenv('MAX_BATCH_UPLOAD_BYTES', str(256 * 1024 * 1024)))
+
+ZIP_MAGIC = b'PK\x03\x04'
+
+# How much of the file to read while looking for the format and dimensions
+HEADER_BYTES = 64 * 1024
+MAX_HEADER_BYTES = 1024 * 1024
+CHUNK_BYTES = 1024 * 1024
+
+
+class UploadRejected(Exception):
+    """Raised when an upload is too large or not an accepted format"""
+
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+class IngestedUpload:
+    """Upload bytes held in a single buffer, exposed as a zero-copy memoryview"""
+
+    def __init__(self, buffer: bytearray, size: int, kind: str, format: str,
+                 width: Optional[int] = None, height: Optional[int] = None):
+        self.buffer = buffer
+        self.size = size
+        self.kind = kind
+        self.format = format
+        self.width = width
+        self.height = height
+
+    @property
+    def view(self) -> memoryview:
+        return memoryview(self.buffer)[:self.size]
+
+    def as_upload_file(self, filename: Optional[str] = None) -> UploadFile:
+        """The validated bytes as an UploadFile, for services that read one, without copying them"""
+        return UploadFile(BufferReader(self.view), size=self.size, filename=filename)
+
+
+def _jpeg_dimensions(data: bytes) -> Optional[Tuple[int, int]]:
+    """Find the frame header (SOFn) marker and read width/height from it"""
+    i = 2
+    while i + 9 < len(data):
+        if data[i] != 0xFF:
+            i += 1
+            continue
+        marker = data[i + 1]
+        if marker == 0xFF:
+            i += 1
+            continue
+        if marker in (0xD8, 0x01) or 0xD0 <= marker <= 0xD7:
+            i += 2
+            continue
+        if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+            height = int.from_bytes(data[i + 5:i + 7], 'big')
+            width = int.from_bytes(data[i + 7:i + 9], 'big')
+            return width, height
+        i += 2 + int.from_bytes(data[i + 2:i + 4], 'big')
+    return None
+
+
+def _webp_dimensions(data: bytes) -> Optional[Tuple[int, int]]:
+    chunk = data[12:16]
+    if chunk == b'VP8 ' and len(data) >= 30:
+        return int.from_bytes(data[26:28], 'little') & 0x3FFF, int.from_bytes(data[28:30], 'little') & 0x3FFF
+    if chunk == b'VP8L' and len(data) >= 25:
+        b0, b1, b2, b3 = data[21:25]
+        return 1 + (((b1 & 0x3F) << 8) | b0), 1 + (((b3 & 0x0F) << 10) | (b2 << 2) | ((b1 & 0xC0) >> 6))
+    if chunk == b'VP8X' and len(data) >= 30:
+        return 1 + int.from_bytes(data[24:27], 'little'), 1 + int.from_bytes(data[27:30], 'little')
+    return None
+
+
+def sniff_image(header: bytes) -> Tuple[Optional[str], Optional[Tuple[int, int]]]:
+    """Identify an image from its magic bytes and read its dimensions from the header"""
+    if header.startswith(b'\xff\xd8\xff'):
+        return 'jpeg', _jpeg_dimensions(header)
+    if header.startswith(b'\x89PNG\r\n\x1a\n'):
+        if len(header) >= 24:
+            return 'png', (int.from_bytes(header[16:20], 'big'), int.from_bytes(header[20:24], 'big'))
+        return 'png', None
+    if header[:4] == b'RIFF' and header[8:12] == b'WEBP':
+        return 'webp', _webp_dimensions(header)
+    return None, None
+
+
+def sniff_audio(header: bytes) -> Optional[str]:
+    """Identify an audio container from its magic bytes"""
+    if header[:4] == b'RIFF' and header[8:12] == b'WAVE':
+        return 'wav'
+    if header.startswith(b'OggS'):
+        return 'ogg'
+    if header.startswith(b'fLaC'):
+        return 'flac'
+    if header.startswith(b'ID3') or (len(header) > 1 and header[0] == 0xFF and header[1] & 0xE0 == 0xE0):
+        return 'mp3'
+    if header[4:8] == b'ftyp':
+        return 'mp4'
+    if header.startswith(b'\x1a\x45\xdf\xa3'):
+        return 'webm'
+    if header.startswith(b'#!AMR'):
+        return 'amr'
+    return None
+
+
+def _check_image_header(header: bytes, complete: bool, max_pixels: int) -> Tuple[Optional[str], Optional[Tuple[int, int]]]:
+    """Validate format and pixel count; returns (None, None) while more header is needed"""
+    image_format, dimensions = sniff_image(header)
+    if image_format is None:
+        if len(header) >= 12 or complete:
+            raise UploadRejected(415, "Unsupported image format, use JPEG, PNG or WebP")
+        return None, None
+
+    if dimensions is None and not complete and len(header) < MAX_HEADER_BYTES:
+        return None, None
+
+    if dimensions is not None:
+        width, height = dimensions
+        if width == 0 or height == 0:
+            raise UploadRejected(400, "Invalid image dimensions")
+        if width * height > max_pixels:
+            raise UploadRejected(413, f"Image is too large ({width}x{height})")
+    return image_format, dimensions
+
+
+def _grow(buffer: bytearray, size: int, capacity: int) -> bytearray:
+    """Allocate a larger buffer and copy only the bytes read so far"""
+    grown = bytearray(capacity)
+    grown[:size] = memoryview(buffer)[:size]
+    return grown
+
+
+async def ingest_upload(
+    upload,
+    kind: str = 'image',
+    max_bytes: Optional[int] = None,
+    max_pixels: int = MAX_IMAGE_PIXELS,
+) -> IngestedUpload:
+    """
+    Read an UploadFile chunk by chunk into a single buffer, rejecting it as soon
+    as it is known to be too large or of the wrong type.
+
+    The declared size is checked before anything is read, the format (and for
+    images the dimensions) are sniffed from the first bytes, and the byte cap
+    is enforced while reading. Only a header-sized buffer exists until the file
+    passes those checks; it is then sized to the declared length and filled in
+    place, so decoders get a memoryview instead of another copy of the file.
+    """
+    max_bytes = max_bytes or (MAX_IMAGE_BYTES if kind == 'image' else MAX_AUDIO_BYTES)
+    declared = getattr(upload, 'size', None)
+    if declared is not None and declared > max_bytes:
+        raise UploadRejected(413, f"File exceeds the {max_bytes // (1024 * 1024)} MB limit")
+
+    # Only the header window is allocated until the format and dimensions check out
+    buffer = bytearray(min(declared, HEADER_BYTES) if declared else HEADER_BYTES)
+    size = 0
+    file_format = None
+    dimensions = None
+    validated = False
+
+    while True:
+        if size == len(buffer):
+            # Probe for EOF before growing, so an exactly-declared file is never copied
+            extra = await run_in_threadpool(upload.file.read, 1)
+            if not extra:
+                break
+            buffer = _grow(buffer, size, len(buffer) * 2)
+            buffer[size] = extra[0]
+            size += 1
+
+        chunk_end = min(len(buffer), size + (HEADER_BYTES if not validated else CHUNK_BYTES))
+        read = await run_in_threadpool(upload.file.readinto, memoryview(buffer)[size:chunk_end])
+        if not read:
+            break
+        size += read
+        if size > max_bytes:
+            raise UploadRejected(413, f"File exceeds the {max_bytes // (1024 * 1024)} MB limit")
+
+        if not validated:
+            header = bytes(memoryview(buffer)[:min(size, MAX_HEADER_BYTES)])
+            if kind == 'image':
+                file_format, dimensions = _check_image_header(header, False, max_pixels)
+                validated = file_format is not None
+            else:
+                file_format = sniff_audio(header)
+                if file_format is None and size >= 12:
+                    raise UploadRejected(415, "Unsupported audio format")
+                validated = file_format is not None
+
+            if validated and declared and len(buffer) < declared:
+                buffer = _grow(buffer, size, declared)
+
+    if size == 0:
+        raise UploadRejected(400, "Empty upload")
+    if not validated:
+        header = bytes(memoryview(buffer)[:min(size, MAX_HEADER_BYTES)])
+        if kind == 'image':
+            file_format, dimensions = _check_image_header(header, True, max_pixels)
+        else:
+            file_format = sniff_audio(header)
+            if file_format is None:
+                raise UploadRejected(415, "Unsupported audio format")
+
+    width, height = dimensions if dimensions else (None, None)
+    return IngestedUpload(buffer, size, kind, file_format, width, height)
+
+
+def inspect_image(data: bytes, max_bytes: int = MAX_IMAGE_BYTES, max_pixels: int = MAX_IMAGE_PIXELS) -> IngestedUpload:
+    """Apply the upload checks to image bytes that are already in memory"""
+    if not data:
+        raise UploadRejected(400, "Empty upload")
+    if len(data) > max_bytes:
+        raise UploadRejected(413, f"File exceeds the {max_bytes // (1024 * 1024)} MB limit")
+    image_format, dimensions = _check_image_header(bytes(data[:MAX_HEADER_BYTES]), True, max_pixels)
+    width, height = dimensions if dimensions else (None, None)
+    return IngestedUpload(data, len(data), 'image', image_format, width, height)
+
+
+def _read_archive(upload, max_images: int, max_total_bytes: int) -> List[Tuple[str, Union[IngestedUpload, UploadRejected]]]:
+    """Extract and check the images in a zip, reading members straight from the spooled upload"""
+    entries = []
+    total = 0
+    try:
+        with zipfile.ZipFile(upload.file) as archive:
+            for info in archive.infolist():
+                name = info.filename
+                if info.is_dir() or name.startswith('__MACOSX/') or os.path.basename(name).startswith('.'):
+                    continue
+                if len(entries) >= max_images:
+                    raise UploadRejected(413, f"A batch can contain at most {max_images} images")
+                if info.file_size > MAX_IMAGE_BYTES:
+                    entries.append((name, UploadRejected(413, f"File exceeds the {MAX_IMAGE_BYTES // (1024 * 1024)} MB limit")))
+                    continue
+                # file_size is what ZipExtFile will produce at most, so this bounds decompression
+                total += info.file_size
+                if total > max_total_bytes:
+                    raise UploadRejected(413, f"Batch exceeds the {max_total_bytes // (1024 * 1024)} MB limit")
+                try:
+                    entries.append((name, inspect_image(archive.read(info))))
+                except UploadRejected as e:
+                    entries.append((name, e))
+    except zipfile.BadZipFile:
+        raise UploadRejected(400, f"{upload.filename or 'Archive'} is not a valid zip file")
+    return entries
+
+
+async def ingest_batch(
+    uploads,
+    max_images: int = MAX_BATCH_IMAGES,
+    max_total_bytes: int = MAX_BATCH_BYTES,
+) -> List[Tuple[str, Union[IngestedUpload, UploadRejected]]]:
+    """
+    Ingest the files of a batch request, expanding zip archives.
+
+    Returns one ``(filename, upload or rejection)`` entry per image so a bad
+    photo fails on its own; limits that apply to the whole request (image
+    count, total size, unreadable archive) raise UploadRejected.
+    """
+    entries = []
+    total = 0
+    for upload in uploads:
+        magic = await run_in_threadpool(upload.file.read, len(ZIP_MAGIC))
+        await run_in_threadpool(upload.file.seek, 0)
+
+        if magic == ZIP_MAGIC:
+            remaining = max_images - len(entries)
+            archive_entries = await run_in_threadpool(_read_archive, upload, remaining, max_total_bytes - total)
+            total += sum(item.size for _, item in archive_entries if isinstance(item, IngestedUpload))
+            entries.extend(archive_entries)
+            continue
+
+        if len(entries) >= max_images:
+            raise UploadRejected(413, f"A batch can contain at most {max_images} images")
+        name = upload.filename or f'image-{len(entries) + 1}'
+        try:
+            ingested = await ingest_upload(upload, kind='image')
+        except UploadRejected as e:
+            entries.append((name, e))
+            continue
+        total += ingested.size
+        if total > max_total_bytes:
+            raise UploadRejected(413, f"Batch exceeds the {max_total_bytes // (1024 * 1024)} MB limit")
+        entries.append((name, ingested))
+
+    if not entries:
+        raise UploadRejected(400, "No images in the batch")
+    return entries
+
+
+class RequestSizeLimitMiddleware:
+    """
+    ASGI middleware that rejects oversized request bodies with 413 before the
+    multipart parser spools them, using Content-Length when present and
+    counting streamed bytes otherwise.
+    """
+
+    def __init__(self, app, limits: Dict[str, int]):
+        self.app = app
+        self.limits = limits
+
+    async def __call__(self, scope, receive, send):
+        limit = self.limits.get(scope.get('path')) if scope['type'] == 'http' else None
+        if limit is None:
+            await self.app(scope, receive, send)
+            return
+
+        for name, value in scope.get('headers', []):
+            if name == b'content-length' and value.isdigit() and int(value) > limit:
+                await self._reject(send, limit)
+                return
+
+        received = 0
+        too_large = False
+        rejected = False
+
+        async def limited_receive():
+            nonlocal received, too_large
+            message = await receive()
+            if message['type'] == 'http.request':
+                received += len(message.get('body', b''))
+                if received > limit:
+                    too_large = True
+                    raise _BodyTooLarge()
+            return message
+
+        async def checked_send(message):
+            # The body parser may turn the abort into its own 400; answer 413 instead
+            nonlocal rejected
+            if too_large:
+                if not rejected:
+                    rejected = True
+                    await self._reject(send, limit)
+                return
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, checked_send)
+        except _BodyTooLarge:
+            if not rejected:
+                await self._reject(send, limit)
+
+    @staticmethod
+    async def _reject(send, limit: int):
+        body = json.dumps({
+            'success': False,
+            'error': f"Request body exceeds the {limit // (1024 * 1024)} MB limit",
+            'timestamp': datetime.utcnow().isoformat()
+        }).encode()
+        await send({
+            'type': 'http.response.start',
+            'status': 413,
+            'headers': [(b'content-type', b'application/json'), (b'content-length', str(len(body)).encode())],
+        })
+        await send({'type': 'http.response.body', 'body': body})
+
+
+class _BodyTooLarge(Exception):
+    pass
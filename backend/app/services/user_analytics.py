@@ -0,0 +1,416 @@
+"""
+Incrementally maintained per-user analytics.
+
+Every completed disease detection and loan assessment is appended to an
+event log and folded into the user's aggregate: a flat map of counters
+(totals, per-disease/crop/severity counts, per-day buckets). Reading
+analytics is one fetch of that map, independent of how long the user's
+history is. Crop names outside the known crops are recorded as ``other``,
+so the number of fields per user stays bounded, and event files older than
+ANALYTICS_EVENT_RETENTION_DAYS are deleted.
+
+Aggregates are only shared between worker processes through Redis
+(REDIS_URL); without it each worker counts only its own requests.
+
+Rebuild aggregates from the event log (from backend/), e.g. after changing
+the aggregate fields or losing the Redis data:
+    python -m app.services.user_analytics --events /app/analytics/events
+    python -m app.services.user_analytics --events ./events --user 42
+
+Once event files have been pruned a rebuild would lose their events from
+the lifetime totals, so it is refused unless --allow-truncated is given.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DAY_SECONDS = 86400
+
+# Daily buckets older than this are dropped from aggregates
+WINDOW_DAYS = int(os.getenv('ANALYTICS_WINDOW_DAYS', '56'))
+
+# Aggregate field for crops outside the known list
+OTHER_CROP = 'other'
+
+# Written to the event log directory with the oldest date still kept, once files have been pruned
+PRUNED_MARKER = '.pruned-before'
+
+
+def _day(timestamp: float) -> int:
+    return int(timestamp // DAY_SECONDS)
+
+
+def event_increments(event: Dict[str, Any]) -> Dict[str, float]:
+    """
+    The counter updates for one event.
+
+    Field names are kept short since they are stored once per user:
+    ``n`` detections, ``h`` healthy results, ``d:<disease>``, ``c:<crop>``,
+    ``s:<severity>``, ``cf`` summed confidence, ``t:<day>:n``/``t:<day>:i``
+    detections and infected detections per day, ``l``/``le``/``lr`` loan
+    assessments, eligible ones and summed risk score.
+    """
+    day = _day(event['ts'])
+    if event['type'] == 'disease_detection':
+        healthy = event['disease'] == 'Healthy'
+        increments = {
+            'n': 1,
+            'h': int(healthy),
+            f"d:{event['disease']}": 1,
+            f"c:{event['crop_type']}": 1,
+            f"s:{event['severity']}": 1,
+            'cf': event['confidence'],
+            f't:{day}:n': 1,
+        }
+        if not healthy:
+            increments[f't:{day}:i'] = 1
+        return increments
+
+    if event['type'] == 'loan_assessment':
+        return {
+            'l': 1,
+            'le': int(event['eligible']),
+            'lr': event['risk_score'],
+            f't:{day}:l': 1,
+        }
+
+    raise ValueError(f"Unknown analytics event type '{event['type']}'")
+
+
+def _expired_buckets(fields: Dict[str, float], today: int) -> List[str]:
+    return [name for name in fields if name.startswith('t:') and int(name.split(':')[1]) <= today - WINDOW_DAYS]
+
+
+def _trend(recent: float, previous: float, tolerance: float = 0.05) -> str:
+    if recent - previous > tolerance:
+        return 'increasing'
+    if previous - recent > tolerance:
+        return 'decreasing'
+    return 'stable'
+
+
+def summarize(fields: Dict[str, float], now: Optional[float] = None) -> Dict[str, Any]:
+    """Turn a user's counters into the analytics response"""
+    today = _day(now if now is not None else time.time())
+    detections = int(fields.get('n', 0))
+
+    def prefixed(prefix: str) -> Dict[str, int]:
+        counts = {name[len(prefix):]: int(value) for name, value in fields.items() if name.startswith(prefix) and value}
+        return dict(sorted(counts.items(), key=lambda item: (-item[1], item[0])))
+
+    def window(kind: str, start: int, days: int) -> int:
+        return int(sum(fields.get(f't:{day}:{kind}', 0) for day in range(start - days + 1, start + 1)))
+
+    disease_frequency = prefixed('d:')
+    recent_n, recent_i = window('n', today, 7), window('i', today, 7)
+    previous_n, previous_i = window('n', today - 7, 7), window('i', today - 7, 7)
+    recent_rate = recent_i / recent_n if recent_n else None
+    previous_rate = previous_i / previous_n if previous_n else None
+
+    loans = int(fields.get('l', 0))
+    return {
+        'total_detections': detections,
+        'diseases_found': [disease for disease in disease_frequency if disease != 'Healthy'],
+        'disease_frequency': disease_frequency,
+        'crops': prefixed('c:'),
+        'severity_counts': prefixed('s:'),
+        'healthy_fraction': round(fields.get('h', 0) / detections, 4) if detections else None,
+        'mean_confidence': round(fields.get('cf', 0) / detections, 2) if detections else None,
+        'loan_assessments': {
+            'total': loans,
+            'eligible': int(fields.get('le', 0)),
+            'mean_risk_score': round(fields.get('lr', 0) / loans, 3) if loans else None,
+        },
+        'trends': {
+            'detections_last_7_days': recent_n,
+            'detections_previous_7_days': previous_n,
+            'infected_fraction_last_7_days': round(recent_rate, 4) if recent_rate is not None else None,
+            'infected_fraction_previous_7_days': round(previous_rate, 4) if previous_rate is not None else None,
+            'disease_incidence': (
+                _trend(recent_rate, previous_rate) if recent_rate is not None and previous_rate is not None
+                else 'insufficient_data'
+            ),
+            'weekly_detections': [window('n', today - 7 * week, 7) for week in reversed(range(WINDOW_DAYS // 7))],
+        },
+    }
+
+
+class MemoryAggregateStore:
+    """Per-user counters in process memory"""
+
+    def __init__(self):
+        self._users: Dict[str, Counter] = {}
+
+    async def increment(self, user_id: str, increments: Dict[str, float], today: int):
+        fields = self._users.setdefault(user_id, Counter())
+        fields.update(increments)
+        for name in _expired_buckets(fields, today):
+            del fields[name]
+
+    async def get(self, user_id: str) -> Dict[str, float]:
+        return dict(self._users.get(user_id, {}))
+
+    async def delete(self, user_id: Optional[str] = None):
+        if user_id is None:
+            self._users.clear()
+        else:
+            self._users.pop(user_id, None)
+
+    async def close(self):
+        pass
+
+
+class RedisAggregateStore:
+    """
+    Per-user counters in a Redis hash, updated with HINCRBY(FLOAT) so
+    concurrent API and worker processes never overwrite each other.
+    """
+
+    def __init__(self, redis_url: str, namespace: str = 'agriwise:analytics'):
+        import redis.asyncio as aioredis
+
+        self.namespace = namespace
+        self._redis = aioredis.from_url(redis_url, decode_responses=True)
+
+    def _key(self, user_id: str) -> str:
+        return f'{self.namespace}:{user_id}'
+
+    async def increment(self, user_id: str, increments: Dict[str, float], today: int):
+        key = self._key(user_id)
+        async with self._redis.pipeline(transaction=True) as pipe:
+            for name, value in increments.items():
+                if isinstance(value, float):
+                    pipe.hincrbyfloat(key, name, value)
+                else:
+                    pipe.hincrby(key, name, value)
+            # The bucket that just left the window; older ones are pruned on read
+            pipe.hdel(key, f't:{today - WINDOW_DAYS}:n', f't:{today - WINDOW_DAYS}:i', f't:{today - WINDOW_DAYS}:l')
+            await pipe.execute()
+
+    async def get(self, user_id: str) -> Dict[str, float]:
+        fields = {name: float(value) for name, value in (await self._redis.hgetall(self._key(user_id))).items()}
+        expired = _expired_buckets(fields, _day(time.time()))
+        if expired:
+            await self._redis.hdel(self._key(user_id), *expired)
+            for name in expired:
+                del fields[name]
+        return fields
+
+    async def delete(self, user_id: Optional[str] = None):
+        if user_id is not None:
+            await self._redis.delete(self._key(user_id))
+            return
+        async for key in self._redis.scan_iter(f'{self.namespace}:*'):
+            await self._redis.delete(key)
+
+    async def close(self):
+        await self._redis.close()
+
+
+class EventLog:
+    """
+    Append-only NDJSON event files, one per UTC day.
+
+    Files older than ``retention_days`` are deleted when a new day's file is
+    started (0 keeps them forever). The date they were pruned up to is kept
+    in a marker file, since a rebuild can then only replay that period.
+    """
+
+    def __init__(self, directory: str, retention_days: int = 0):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.retention_days = retention_days
+        self._current: Optional[Path] = None
+
+    def _path(self, timestamp: float) -> Path:
+        return self.directory / f"{datetime.fromtimestamp(timestamp, timezone.utc).date().isoformat()}.ndjson"
+
+    def append(self, event: Dict[str, Any]):
+        path = self._path(event['ts'])
+        if path != self._current:
+            self._current = path
+            self.prune(event['ts'])
+        # A single small O_APPEND write, so lines from several processes don't interleave
+        with open(path, 'a') as f:
+            f.write(json.dumps(event, separators=(',', ':')) + '\n')
+
+    def prune(self, now: Optional[float] = None) -> int:
+        """Delete day files older than the retention period; returns how many were deleted"""
+        if not self.retention_days:
+            return 0
+        # ISO dates sort like the days they name
+        cutoff = self._path((now if now is not None else time.time()) - self.retention_days * DAY_SECONDS)
+        expired = [path for path in self.directory.glob('*.ndjson') if path.name < cutoff.name]
+        if not expired:
+            return 0
+        # Marked before deleting, so a rebuild never misses that files are gone
+        if (self.pruned_before() or '') < cutoff.stem:
+            (self.directory / PRUNED_MARKER).write_text(cutoff.stem)
+        deleted = 0
+        for path in expired:
+            try:
+                path.unlink()
+                deleted += 1
+            except FileNotFoundError:
+                # Another process pruned it first
+                pass
+        if deleted:
+            logger.info(f"Deleted {deleted} analytics event files older than {self.retention_days} days")
+        return deleted
+
+    def pruned_before(self) -> Optional[str]:
+        """The (ISO) date before which event files have been deleted, or None if none have"""
+        try:
+            return (self.directory / PRUNED_MARKER).read_text().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def replay(self) -> Iterator[Dict[str, Any]]:
+        """Events in file (day) order, skipping unreadable lines"""
+        for path in sorted(self.directory.glob('*.ndjson')):
+            with open(path) as f:
+                for line_number, line in enumerate(f, 1):
+                    try:
+                        yield json.loads(line)
+                    except json.JSONDecodeError:
+                        logger.warning(f"Skipping malformed event {path.name}:{line_number}")
+
+
+class UserAnalytics:
+    """Records analytics events and serves per-user aggregates"""
+
+    def __init__(self, store=None, event_log: Optional[EventLog] = None, crops: Optional[Iterable[str]] = None):
+        self.store = store or MemoryAggregateStore()
+        self.event_log = event_log
+        # Crops with their own aggregate field; None keeps every name
+        self.crops = frozenset(crops) if crops is not None else None
+        self.recorded = 0
+        self.errors = 0
+
+    @classmethod
+    def from_env(cls, crops: Optional[Iterable[str]] = None) -> "UserAnalytics":
+        store = None
+        if os.getenv('ANALYTICS_REDIS', 'true').lower() == 'true' and os.getenv('REDIS_URL'):
+            try:
+                store = RedisAggregateStore(os.getenv('REDIS_URL'))
+            except Exception as e:
+                logger.warning(f"Analytics Redis store disabled: {str(e)}")
+        if store is None and int(os.getenv('WEB_CONCURRENCY', '1')) > 1:
+            logger.warning(
+                "User analytics are kept in process memory, so each of the WEB_CONCURRENCY workers reports "
+                "different numbers; set REDIS_URL to share them"
+            )
+
+        event_log = None
+        directory = os.getenv('ANALYTICS_EVENT_LOG_DIR', '/app/analytics/events')
+        if directory:
+            try:
+                event_log = EventLog(directory, int(os.getenv('ANALYTICS_EVENT_RETENTION_DAYS', '365')))
+            except OSError as e:
+                logger.warning(f"Analytics event log disabled, cannot write {directory}: {str(e)}")
+        return cls(store, event_log, crops)
+
+    async def apply(self, event: Dict[str, Any]):
+        """Fold one event into its user's aggregate"""
+        await self.store.increment(event['user_id'], event_increments(event), _day(time.time()))
+
+    async def record(self, event_type: str, user_id: str, result: Dict[str, Any], timestamp: Optional[float] = None):
+        """Log and apply a completed event; failures are logged, never raised"""
+        event = {'type': event_type, 'user_id': user_id, 'ts': timestamp or time.time()}
+        if event_type == 'disease_detection':
+            event.update({key: result[key] for key in ('crop_type', 'disease', 'severity', 'confidence')})
+            # The crop comes from the request, so unknown names share one field (and log value)
+            if self.crops is not None and event['crop_type'] not in self.crops:
+                event['crop_type'] = OTHER_CROP
+        else:
+            event.update({key: result[key] for key in ('eligible', 'risk_score')})
+
+        try:
+            if self.event_log is not None:
+                await asyncio.to_thread(self.event_log.append, event)
+            await self.apply(event)
+            self.recorded += 1
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"Could not record {event_type} analytics for user {user_id}: {str(e)}")
+
+    async def get(self, user_id: str) -> Dict[str, Any]:
+        return summarize(await self.store.get(user_id))
+
+    async def rebuild(self, user_id: Optional[str] = None, allow_truncated: bool = False) -> int:
+        """
+        Reset aggregates and re-apply the event log; returns the number of events applied.
+
+        Refused once event files have been pruned, since their events would
+        drop out of the totals, unless ``allow_truncated``. Events recorded
+        after the reset are applied live and skipped by the replay; one still
+        in flight at that moment may be counted twice, so rebuild while the
+        API is drained when exact totals matter.
+        """
+        if self.event_log is None:
+            raise RuntimeError("No event log configured")
+        pruned_before = self.event_log.pruned_before()
+        if pruned_before and not allow_truncated:
+            raise RuntimeError(
+                f"Events before {pruned_before} have been pruned, a rebuild would drop them from the totals"
+            )
+        await self.store.delete(user_id)
+        fence = time.time()
+        applied = 0
+        oldest = _day(fence) - WINDOW_DAYS
+        for event in self.event_log.replay():
+            if user_id is not None and event.get('user_id') != user_id:
+                continue
+            if event.get('ts', 0) >= fence:
+                continue
+            increments = event_increments(event)
+            # Old days only contribute to the totals
+            increments = {k: v for k, v in increments.items() if not k.startswith('t:') or int(k.split(':')[1]) > oldest}
+            await self.store.increment(event['user_id'], increments, oldest + WINDOW_DAYS)
+            applied += 1
+        return applied
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'store': type(self.store).__name__,
+            'event_log': str(self.event_log.directory) if self.event_log else None,
+            'event_retention_days': self.event_log.retention_days if self.event_log else None,
+            'recorded': self.recorded,
+            'errors': self.errors,
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--events', default=os.getenv('ANALYTICS_EVENT_LOG_DIR', '/app/analytics/events'))
+    parser.add_argument('--user', help='Rebuild a single user')
+    parser.add_argument('--allow-truncated', action='store_true',
+                        help='Rebuild even though pruned events will be missing from the totals')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+
+    async def run():
+        analytics = UserAnalytics.from_env()
+        analytics.event_log = EventLog(args.events)
+        if isinstance(analytics.store, MemoryAggregateStore):
+            logger.warning("No Redis configured (REDIS_URL), the rebuilt aggregates will not be kept")
+        started = time.perf_counter()
+        applied = await analytics.rebuild(args.user, args.allow_truncated)
+        logger.info(f"Replayed {applied} events into {type(analytics.store).__name__} in {time.perf_counter() - started:.1f}s")
+        await analytics.store.close()
+
+    asyncio.run(run())
+
+
+if __name__ == '__main__':
+    main()
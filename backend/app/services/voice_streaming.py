@@ -0,0 +1,562 @@
+"""
+Streaming voice commands over WebSocket.
+
+The client sends mono audio as binary messages while the farmer speaks,
+either raw 16-bit little-endian PCM or 8-bit G.711 mu-law (half the
+bandwidth: 64 kbit/s at 8 kHz, which fits 2G/3G uplinks), and
+``{"type": "end"}`` when done. Each chunk runs
+through an energy voice-activity detector; speech is fed to an incremental
+recognizer, and the server answers with JSON events as they happen:
+
+- ``ready``: the stream is open;
+- ``speech_start`` / ``final``: an utterance began / ended, with its
+  transcript and intent;
+- ``partial``: the transcript so far, whenever it changes;
+- ``intent``: the action, sent early, as soon as the partial transcript is
+  confident enough;
+- ``error``: the stream is being closed, with the reason;
+- ``done``: a summary after ``end``.
+
+So the farmer hears back while still talking instead of after the upload
+and one-shot processing of a whole recording. Memory per connection is
+bounded: chunks are processed before the next one is read, chunk size,
+utterance length and stream length are capped, and at most
+VOICE_STREAM_MAX_CONCURRENT streams run at once per worker.
+"""
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.core.metrics import observe_stage
+
+logger = logging.getLogger(__name__)
+
+# WebSocket close codes
+POLICY_VIOLATION = 1008
+MESSAGE_TOO_BIG = 1009
+INTERNAL_ERROR = 1011
+TRY_AGAIN_LATER = 1013
+
+
+class VoiceStreamError(Exception):
+    """Ends a stream with a WebSocket close code and a reason for the client"""
+
+    def __init__(self, code: int, detail: str):
+        super().__init__(detail)
+        self.code = code
+        self.detail = detail
+
+
+ENCODINGS = ('pcm16', 'mulaw')
+
+# Subprotocol a client offers with its token, as ['bearer', <token>]
+AUTH_SUBPROTOCOL = 'bearer'
+
+
+def handshake_token(headers) -> Tuple[Optional[str], Optional[str]]:
+    """
+    Access token sent with the WebSocket handshake, and the subprotocol to accept.
+
+    Native clients send ``Authorization: Bearer <token>``; browsers can't
+    set headers on WebSockets, so they offer the subprotocols
+    ``['bearer', <token>]`` instead. Neither ends up in access logs, unlike
+    a token in the query string.
+    """
+    authorization = headers.get('authorization', '')
+    if authorization.lower().startswith('bearer '):
+        return authorization[7:].strip(), None
+    protocols = [p.strip() for p in headers.get('sec-websocket-protocol', '').split(',') if p.strip()]
+    if len(protocols) == 2 and protocols[0].lower() == AUTH_SUBPROTOCOL:
+        return protocols[1], AUTH_SUBPROTOCOL
+    return None, None
+
+
+async def receive_auth_token(websocket, timeout: float = 5.0) -> Optional[str]:
+    """Token from the first message, ``{"type": "auth", "token": ...}``, on an accepted WebSocket"""
+    try:
+        message = await asyncio.wait_for(websocket.receive(), timeout)
+        payload = json.loads(message.get('text') or '')
+    except (asyncio.TimeoutError, ValueError):
+        return None
+    if not isinstance(payload, dict) or payload.get('type') != 'auth' or not isinstance(payload.get('token'), str):
+        return None
+    return payload['token']
+
+
+def _mulaw_table() -> np.ndarray:
+    """G.711 mu-law byte -> 16-bit linear sample"""
+    codes = ~np.arange(256, dtype=np.uint8)
+    exponent = (codes >> 4) & 0x07
+    magnitude = (((codes & 0x0F).astype(np.int32) << 3) + 0x84) << exponent
+    return np.where(codes & 0x80, 0x84 - magnitude, magnitude - 0x84).astype('<i2')
+
+
+MULAW_TO_PCM16 = _mulaw_table()
+
+
+def frame_energies(pcm: bytes, frame_samples: int) -> np.ndarray:
+    """Energy in dBFS of each complete frame of 16-bit PCM"""
+    samples = np.frombuffer(pcm, dtype='<i2')
+    frames = samples[:len(samples) - len(samples) % frame_samples].reshape(-1, frame_samples)
+    power = np.mean(np.square(frames, dtype=np.float64), axis=1) / 32768.0 ** 2
+    return 10 * np.log10(power + 1e-10)
+
+
+class EnergyVAD:
+    """
+    Voice activity detection from frame energy against an adaptive noise floor.
+
+    A frame is speech when it is ``threshold_db`` above the noise floor (and
+    above ``min_energy_db``). Speech starts after ``start_frames`` speech
+    frames in a row and ends after ``end_frames`` non-speech frames, so
+    short clicks don't open an utterance and short pauses don't close one.
+    The noise floor follows non-speech frames, quickly downwards and slowly
+    upwards.
+    """
+
+    def __init__(self, threshold_db: float = 12.0, min_energy_db: float = -50.0, start_frames: int = 3, end_frames: int = 20):
+        self.threshold_db = threshold_db
+        self.min_energy_db = min_energy_db
+        self.start_frames = start_frames
+        self.end_frames = end_frames
+        self.noise_db = min_energy_db
+        self.active = False
+        self._run = 0
+
+    def update(self, energy_db: float) -> Optional[str]:
+        """Feed one frame's energy; returns 'start' or 'end' on a transition"""
+        speech = energy_db > max(self.noise_db + self.threshold_db, self.min_energy_db)
+        if not speech:
+            rate = 0.5 if energy_db < self.noise_db else 0.02
+            self.noise_db += rate * (energy_db - self.noise_db)
+
+        if not self.active:
+            self._run = self._run + 1 if speech else 0
+            if self._run >= self.start_frames:
+                self.active, self._run = True, 0
+                return 'start'
+        else:
+            self._run = 0 if speech else self._run + 1
+            if self._run >= self.end_frames:
+                self.active, self._run = False, 0
+                return 'end'
+        return None
+
+    def reset(self):
+        """Back to silence, keeping the noise floor"""
+        self.active, self._run = False, 0
+
+
+# Words (lowercase, English plurals folded) that point to each action
+INTENT_KEYWORDS = {
+    'disease_detection': {
+        'disease', 'sick', 'spot', 'pest', 'blight', 'rust', 'leaf', 'leaves', 'photo', 'insect',
+        'ugonjwa', 'magonjwa', 'wadudu', 'majani', 'picha', 'mgonjwa',
+    },
+    'market_prices': {
+        'price', 'market', 'sell', 'buy', 'cost', 'buyer',
+        'bei', 'soko', 'sokoni', 'kuuza', 'kununua', 'gharama',
+    },
+    'weather_forecast': {
+        'weather', 'rain', 'forecast', 'temperature', 'sunny', 'drought',
+        'hewa', 'mvua', 'utabiri', 'jua', 'ukame',
+    },
+    'loan_assessment': {
+        'loan', 'credit', 'borrow', 'lender',
+        'mkopo', 'mikopo', 'kukopa', 'pesa', 'fedha',
+    },
+    'farming_tips': {
+        'advice', 'tip', 'plant', 'planting', 'fertilizer', 'seed', 'manure',
+        'ushauri', 'kupanda', 'mbolea', 'mbegu', 'samadi',
+    },
+}
+
+
+class IntentMatcher:
+    """
+    Keyword intent over a (partial) transcript.
+
+    Confidence grows with the number of keyword hits for the best action
+    (1 - 0.4 ** hits: 0.6, 0.84, 0.94, ...) and is halved when another
+    action has as many hits.
+    """
+
+    def __init__(self, keywords: Optional[Dict[str, set]] = None):
+        # Keywords are folded like the transcript, so plural keywords can still match
+        self.keywords = {
+            action: {self._fold(word) for word in words} for action, words in (keywords or INTENT_KEYWORDS).items()
+        }
+
+    @staticmethod
+    def _fold(word: str) -> str:
+        word = word.strip('.,?!').lower()
+        return word[:-1] if word.endswith('s') and len(word) > 3 else word
+
+    def match(self, text: str) -> Optional[Dict[str, Any]]:
+        words = [self._fold(word) for word in text.split()]
+        hits = {action: sum(word in keywords for word in words) for action, keywords in self.keywords.items()}
+        ranked = sorted(hits.items(), key=lambda item: -item[1])
+        (action, best), (_, second) = ranked[0], ranked[1]
+        if not best:
+            return None
+        confidence = 1 - 0.4 ** best
+        if second == best:
+            confidence /= 2
+        return {'action': action, 'confidence': round(confidence, 3)}
+
+
+class Recognizer(ABC):
+    """
+    Incremental speech recognizer for one utterance.
+
+    ``accept`` takes the next PCM audio and returns the transcript so far;
+    ``finish`` returns the final transcript. Called from one thread at a time.
+    """
+
+    @abstractmethod
+    def accept(self, pcm: bytes) -> str:
+        ...
+
+    @abstractmethod
+    def finish(self) -> str:
+        ...
+
+
+class VoskRecognizer(Recognizer):
+    """Kaldi streaming recognition through Vosk (optional dependency, one model per language)"""
+
+    _models: Dict[str, Any] = {}
+    _lock = threading.Lock()
+
+    def __init__(self, model, sample_rate: int):
+        from vosk import KaldiRecognizer
+
+        self._recognizer = KaldiRecognizer(model, sample_rate)
+        self._segments: List[str] = []
+
+    @classmethod
+    def load_model(cls, model_dir: str, language: str):
+        """The Vosk model for a language from model_dir/<language>, loaded once per process"""
+        with cls._lock:
+            model = cls._models.get(language)
+            if model is None:
+                from vosk import Model
+
+                path = os.path.join(model_dir, language)
+                if not os.path.isdir(path):
+                    raise FileNotFoundError(f"No Vosk model for '{language}' at {path}")
+                model = cls._models[language] = Model(path)
+            return model
+
+    def accept(self, pcm: bytes) -> str:
+        partial = ''
+        if self._recognizer.AcceptWaveform(pcm):
+            # Kaldi found its own endpoint inside our utterance; keep the segment
+            text = json.loads(self._recognizer.Result()).get('text', '')
+            if text:
+                self._segments.append(text)
+        else:
+            partial = json.loads(self._recognizer.PartialResult()).get('partial', '')
+        return ' '.join(self._segments + ([partial] if partial else []))
+
+    def finish(self) -> str:
+        text = json.loads(self._recognizer.FinalResult()).get('text', '')
+        return ' '.join(self._segments + ([text] if text else []))
+
+
+class VoiceStreamSession:
+    """
+    VAD, recognition and intent state of one stream. Not thread-safe: feed
+    it chunks one at a time (each call may run on a worker thread).
+    """
+
+    def __init__(
+        self,
+        recognizer_factory: Callable[[], Recognizer],
+        sample_rate: int = 16000,
+        encoding: str = 'pcm16',
+        frame_ms: int = 30,
+        vad: Optional[EnergyVAD] = None,
+        intents: Optional[IntentMatcher] = None,
+        intent_confidence: float = 0.8,
+        preroll_ms: int = 300,
+        max_utterance_seconds: float = 15.0,
+        max_stream_seconds: float = 120.0,
+    ):
+        self.recognizer_factory = recognizer_factory
+        self.sample_rate = sample_rate
+        self.encoding = encoding
+        self.frame_ms = frame_ms
+        self.frame_samples = sample_rate * frame_ms // 1000
+        self.frame_bytes = self.frame_samples * 2
+        self.vad = vad or EnergyVAD()
+        self.intents = intents or IntentMatcher()
+        self.intent_confidence = intent_confidence
+        self.max_utterance_ms = max_utterance_seconds * 1000
+        self.max_stream_ms = max_stream_seconds * 1000
+
+        # Audio kept before speech is detected, so the first syllable isn't cut off
+        self._preroll: deque = deque(maxlen=max(1, preroll_ms // frame_ms) + self.vad.start_frames)
+        # Bytes of an incomplete frame carried over to the next chunk (< one frame)
+        self._remainder = b''
+        self._recognizer: Optional[Recognizer] = None
+        self._utterance_ms = 0
+        self._partial = ''
+        self._intent_sent = False
+
+        self.audio_ms = 0
+        self.utterances = 0
+        self.early_intents = 0
+        self.transcripts: List[str] = []
+
+    def feed(self, chunk: bytes) -> List[Dict[str, Any]]:
+        """Process the next chunk of audio, returning the events it produced"""
+        if self.encoding == 'mulaw':
+            chunk = MULAW_TO_PCM16[np.frombuffer(chunk, dtype=np.uint8)].tobytes()
+        data = self._remainder + chunk
+        usable = len(data) - len(data) % self.frame_bytes
+        self._remainder = data[usable:]
+
+        events: List[Dict[str, Any]] = []
+        speech = bytearray()
+        for index, energy in enumerate(frame_energies(data[:usable], self.frame_samples)):
+            frame = data[index * self.frame_bytes:(index + 1) * self.frame_bytes]
+            self.audio_ms += self.frame_ms
+            if self.audio_ms > self.max_stream_ms:
+                raise VoiceStreamError(MESSAGE_TOO_BIG, f"Streams are limited to {self.max_stream_ms / 1000:.0f}s of audio")
+
+            transition = self.vad.update(float(energy))
+            if self._recognizer is None:
+                self._preroll.append(frame)
+                if transition == 'start':
+                    self._start_utterance()
+                    speech.extend(b''.join(self._preroll))
+                    self._preroll.clear()
+                    events.append({'type': 'speech_start', 'at_ms': self.audio_ms})
+                continue
+
+            speech.extend(frame)
+            self._utterance_ms += self.frame_ms
+            if transition == 'end' or self._utterance_ms >= self.max_utterance_ms:
+                events.extend(self._recognize(bytes(speech)))
+                speech.clear()
+                events.append(self._end_utterance())
+
+        if self._recognizer is not None and speech:
+            events.extend(self._recognize(bytes(speech)))
+        return events
+
+    def finish(self) -> List[Dict[str, Any]]:
+        """End of stream: close any open utterance"""
+        if self._recognizer is None:
+            return []
+        return [self._end_utterance()]
+
+    def _start_utterance(self):
+        self._recognizer = self.recognizer_factory()
+        self._utterance_ms = 0
+        self._partial = ''
+        self._intent_sent = False
+
+    def _recognize(self, pcm: bytes) -> List[Dict[str, Any]]:
+        text = self._recognizer.accept(pcm)
+        if not text or text == self._partial:
+            return []
+        self._partial = text
+        events = [{'type': 'partial', 'text': text, 'at_ms': self.audio_ms}]
+
+        if not self._intent_sent:
+            intent = self.intents.match(text)
+            if intent and intent['confidence'] >= self.intent_confidence:
+                self._intent_sent = True
+                self.early_intents += 1
+                events.append({'type': 'intent', 'early': True, 'text': text, 'at_ms': self.audio_ms, **intent})
+        return events
+
+    def _end_utterance(self) -> Dict[str, Any]:
+        text = self._recognizer.finish()
+        self._recognizer = None
+        self.utterances += 1
+        self.transcripts.append(text)
+        if self.vad.active:
+            # Cut at the utterance limit: if the farmer keeps talking, the
+            # rest opens a new utterance after start_frames more speech frames
+            self.vad.reset()
+        return {'type': 'final', 'text': text, 'intent': self.intents.match(text), 'at_ms': self.audio_ms}
+
+
+class VoiceStreamManager:
+    """
+    Opens streaming sessions, caps how many run at once, and drives the
+    WebSocket protocol described in the module docstring.
+    """
+
+    def __init__(
+        self,
+        recognizer_factory: Callable[[str, int], Callable[[], Recognizer]],
+        max_streams: int = 50,
+        max_chunk_bytes: int = 64 * 1024,
+        idle_timeout: float = 10.0,
+        session_options: Optional[Dict[str, Any]] = None,
+    ):
+        self.recognizer_factory = recognizer_factory
+        self.max_streams = max_streams
+        self.max_chunk_bytes = max_chunk_bytes
+        self.idle_timeout = idle_timeout
+        self.session_options = session_options or {}
+
+        # Counters
+        self.active = 0
+        self.peak = 0
+        self.rejected = 0
+        self.completed = 0
+        self.failed = 0
+        self.utterances = 0
+        self.early_intents = 0
+
+    @classmethod
+    def from_env(cls) -> "VoiceStreamManager":
+        if os.getenv('STUB_MODELS', 'false').lower() == 'true':
+            from app.services.stub_models import StubStreamRecognizer
+
+            def recognizer_factory(language: str, sample_rate: int):
+                return lambda: StubStreamRecognizer(language, sample_rate)
+        else:
+            model_dir = os.getenv('VOSK_MODEL_DIR', os.path.join(os.getenv('MODEL_CACHE_DIR', '/app/models'), 'vosk'))
+
+            def recognizer_factory(language: str, sample_rate: int):
+                model = VoskRecognizer.load_model(model_dir, language)
+                return lambda: VoskRecognizer(model, sample_rate)
+
+        return cls(
+            recognizer_factory,
+            max_streams=int(os.getenv('VOICE_STREAM_MAX_CONCURRENT', '50')),
+            max_chunk_bytes=int(os.getenv('VOICE_STREAM_MAX_CHUNK_BYTES', str(64 * 1024))),
+            idle_timeout=float(os.getenv('VOICE_STREAM_IDLE_SECONDS', '10')),
+            session_options={
+                'intent_confidence': float(os.getenv('VOICE_INTENT_MIN_CONFIDENCE', '0.8')),
+                'max_utterance_seconds': float(os.getenv('VOICE_STREAM_MAX_UTTERANCE_SECONDS', '15')),
+                'max_stream_seconds': float(os.getenv('VOICE_STREAM_MAX_SECONDS', '120')),
+            },
+        )
+
+    def try_acquire(self) -> bool:
+        """Take a stream slot; False when max_streams are already running"""
+        if self.active >= self.max_streams:
+            self.rejected += 1
+            return False
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        return True
+
+    def release(self):
+        self.active -= 1
+
+    async def open_session(self, language: str, sample_rate: int, encoding: str = 'pcm16') -> VoiceStreamSession:
+        if not 8000 <= sample_rate <= 48000:
+            raise VoiceStreamError(POLICY_VIOLATION, "sample_rate must be between 8000 and 48000")
+        if encoding not in ENCODINGS:
+            raise VoiceStreamError(POLICY_VIOLATION, f"encoding must be one of {', '.join(ENCODINGS)}")
+        try:
+            # Loading a recognizer model can take seconds the first time
+            factory = await asyncio.to_thread(self.recognizer_factory, language, sample_rate)
+        except Exception as e:
+            logger.error(f"Speech recognition unavailable for {language}: {str(e)}")
+            raise VoiceStreamError(INTERNAL_ERROR, f"Speech recognition is not available for {language}")
+        return VoiceStreamSession(factory, sample_rate, encoding, **self.session_options)
+
+    async def serve(self, websocket, language: str, sample_rate: int, encoding: str = 'pcm16'):
+        """
+        Run one accepted WebSocket stream to completion. The caller has
+        already taken a slot with :meth:`try_acquire`; it is released here.
+        """
+        from starlette.websockets import WebSocketDisconnect
+
+        started = time.perf_counter()
+        session = None
+        try:
+            session = await self.open_session(language, sample_rate, encoding)
+            await websocket.send_json({'type': 'ready', 'language': language, 'sample_rate': sample_rate, 'encoding': encoding})
+
+            while True:
+                try:
+                    message = await asyncio.wait_for(websocket.receive(), self.idle_timeout)
+                except asyncio.TimeoutError:
+                    raise VoiceStreamError(POLICY_VIOLATION, f"No audio for {self.idle_timeout:.0f}s")
+                if message['type'] == 'websocket.disconnect':
+                    return
+
+                if message.get('bytes') is not None:
+                    if len(message['bytes']) > self.max_chunk_bytes:
+                        raise VoiceStreamError(MESSAGE_TOO_BIG, f"Audio chunks are limited to {self.max_chunk_bytes} bytes")
+                    chunk_started = time.perf_counter()
+                    events = await asyncio.to_thread(session.feed, message['bytes'])
+                    observe_stage('voice_stream_chunk', time.perf_counter() - chunk_started)
+                    for event in events:
+                        await websocket.send_json(event)
+                    continue
+
+                if self._is_end(message.get('text')):
+                    for event in await asyncio.to_thread(session.finish):
+                        await websocket.send_json(event)
+                    await websocket.send_json({
+                        'type': 'done',
+                        'transcripts': session.transcripts,
+                        'audio_ms': session.audio_ms,
+                        'elapsed_seconds': round(time.perf_counter() - started, 3),
+                    })
+                    await websocket.close()
+                    self.completed += 1
+                    return
+
+        except VoiceStreamError as e:
+            self.failed += 1
+            await self._close_with_error(websocket, e.code, e.detail)
+        except WebSocketDisconnect:
+            pass
+        except Exception as e:
+            self.failed += 1
+            logger.error(f"Error in voice stream: {str(e)}")
+            await self._close_with_error(websocket, INTERNAL_ERROR, "Error processing voice stream")
+        finally:
+            if session is not None:
+                self.utterances += session.utterances
+                self.early_intents += session.early_intents
+            self.release()
+
+    @staticmethod
+    def _is_end(text: Optional[str]) -> bool:
+        if not text:
+            return False
+        try:
+            return json.loads(text).get('type') == 'end'
+        except (ValueError, AttributeError):
+            raise VoiceStreamError(POLICY_VIOLATION, 'Text messages must be JSON, e.g. {"type": "end"}')
+
+    @staticmethod
+    async def _close_with_error(websocket, code: int, detail: str):
+        try:
+            await websocket.send_json({'type': 'error', 'code': code, 'detail': detail})
+            await websocket.close(code=code, reason=detail[:120])
+        except Exception:
+            pass
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'active': self.active,
+            'max_streams': self.max_streams,
+            'peak': self.peak,
+            'rejected': self.rejected,
+            'completed': self.completed,
+            'failed': self.failed,
+            'utterances': self.utterances,
+            'early_intents': self.early_intents,
+        }
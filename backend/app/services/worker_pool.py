@@ -0,0 +1,141 @@
+import asyncio
+import logging
+import os
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from app.core.metrics import observe_stage
+
+logger = logging.getLogger(__name__)
+
+
+class PoolSaturatedError(Exception):
+    """Raised when the worker pool queue is full and a request can't be admitted"""
+
+    def __init__(self, retry_after: int):
+        super().__init__("Worker pool is saturated")
+        self.retry_after = retry_after
+
+
+def _timed_call(fn: Callable, args: Tuple) -> Tuple[Any, float]:
+    """Run fn in the worker and return its result with the time spent running it"""
+    started = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - started
+
+
+class CPUWorkerPool:
+    """
+    Bounded execution layer for CPU-bound work such as image decoding and
+    model inference, so it never runs on the event loop.
+
+    At most ``max_pending`` requests are admitted at once; further requests are
+    rejected with :class:`PoolSaturatedError` instead of queueing without bound.
+    In ``process`` mode the submitted callables must be picklable module-level
+    functions.
+    """
+
+    def __init__(
+        self,
+        max_workers: Optional[int] = None,
+        max_pending: Optional[int] = None,
+        mode: str = "thread",
+        retry_after: int = 2,
+        name: str = "cpu",
+    ):
+        self.mode = mode
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.max_pending = max_pending or self.max_workers * 4
+        self.retry_after = retry_after
+        self.name = name
+        self._executor: Optional[Executor] = None
+
+        self.in_flight = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.stage_timings: Dict[str, Dict[str, float]] = {}
+
+    @classmethod
+    def from_env(cls, prefix: str = "CPU_POOL", name: str = "cpu") -> "CPUWorkerPool":
+        """Build a pool from <prefix>_MODE/_WORKERS/_MAX_PENDING/_RETRY_AFTER env vars"""
+        workers = os.getenv(f"{prefix}_WORKERS")
+        max_pending = os.getenv(f"{prefix}_MAX_PENDING")
+        return cls(
+            max_workers=int(workers) if workers else None,
+            max_pending=int(max_pending) if max_pending else None,
+            mode=os.getenv(f"{prefix}_MODE", "thread"),
+            retry_after=int(os.getenv(f"{prefix}_RETRY_AFTER", "2")),
+            name=name,
+        )
+
+    @property
+    def executor(self) -> Executor:
+        """Create the underlying executor on first use"""
+        if self._executor is None:
+            if self.mode == "process":
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+            else:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers, thread_name_prefix=f"{self.name}-worker"
+                )
+        return self._executor
+
+    @asynccontextmanager
+    async def slot(self):
+        """Admit one request into the pool or raise PoolSaturatedError"""
+        if self.in_flight >= self.max_pending:
+            self.rejected += 1
+            logger.warning(f"{self.name} pool saturated ({self.in_flight}/{self.max_pending} in flight)")
+            raise PoolSaturatedError(self.retry_after)
+
+        self.in_flight += 1
+        self.admitted += 1
+        try:
+            yield self
+        finally:
+            self.in_flight -= 1
+
+    async def run(self, stage: str, fn: Callable, *args) -> Any:
+        """Run fn(*args) on a worker and record its timing under stage"""
+        submitted = time.perf_counter()
+        result, run_time = await asyncio.get_running_loop().run_in_executor(
+            self.executor, _timed_call, fn, args
+        )
+        self.record(f"{stage}_queue_wait", time.perf_counter() - submitted - run_time)
+        self.record(stage, run_time)
+        return result
+
+    def record(self, stage: str, seconds: float):
+        """Record the duration of a processing stage"""
+        timing = self.stage_timings.setdefault(stage, {'count': 0, 'total': 0.0, 'max': 0.0})
+        timing['count'] += 1
+        timing['total'] += seconds
+        timing['max'] = max(timing['max'], seconds)
+        observe_stage(stage, seconds)
+
+    def shutdown(self):
+        """Shut down the worker executor"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def stats(self) -> Dict[str, Any]:
+        """Return admission counters and per-stage timings"""
+        return {
+            'mode': self.mode,
+            'workers': self.max_workers,
+            'max_pending': self.max_pending,
+            'in_flight': self.in_flight,
+            'admitted': self.admitted,
+            'rejected': self.rejected,
+            'stages': {
+                stage: {
+                    'count': timing['count'],
+                    'avg_ms': round(timing['total'] / timing['count'] * 1000, 3),
+                    'max_ms': round(timing['max'] * 1000, 3),
+                }
+                for stage, timing in self.stage_timings.items()
+            },
+        }
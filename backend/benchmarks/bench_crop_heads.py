@@ -0,0 +1,93 @@
+"""
+Shared backbone + per-crop heads vs one full model per crop.
+
+Usage (from backend/):
+    python -m benchmarks.bench_crop_heads --mode shared
+    python -m benchmarks.bench_crop_heads --mode separate
+
+Each mode runs in its own process so RSS is comparable. Reports resident
+memory after loading, memory per extra crop, and the latency of scoring one
+image for every crop.
+"""
+import argparse
+import logging
+import resource
+import statistics
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+
+def rss_mb() -> float:
+    """Resident set size of this process"""
+    with open('/proc/self/statm') as f:
+        pages = int(f.read().split()[1])
+    return pages * resource.getpagesize() / 1e6
+
+
+def run(mode: str, iterations: int):
+    logging.basicConfig(level=logging.WARNING)
+    import tensorflow as tf
+
+    from app.services.ai_service import AIService
+    from app.services.crop_heads import CropHeads
+
+    service = AIService()
+    crops = list(service.disease_classes)
+    image = np.random.default_rng(0).random((1, 224, 224, 3), dtype=np.float32)
+    baseline = rss_mb()
+
+    if mode == 'shared':
+        backbone = service._create_disease_model()
+        heads = CropHeads.initialize(service.disease_classes, backbone.output_shape[-1])
+
+        def score_all():
+            features = backbone(image, training=False).numpy()
+            return heads.predict_all(features)
+
+        per_crop = f"{heads.nbytes(crops[0]) / 1024:.1f} KiB per crop head"
+    else:
+        models = {}
+        for crop, classes in service.disease_classes.items():
+            backbone = service._create_disease_model()
+            models[crop] = tf.keras.Sequential([backbone, tf.keras.layers.Dense(len(classes), activation='softmax')])
+
+        def score_all():
+            return {crop: model(image, training=False).numpy() for crop, model in models.items()}
+
+        params = models[crops[0]].count_params()
+        per_crop = f"{params * 4 / 1e6:.1f} MB of weights per crop model"
+
+    score_all()
+    loaded = rss_mb()
+
+    timings = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        score_all()
+        timings.append(time.perf_counter() - started)
+
+    print(
+        f"{mode:<9} crops={len(crops)}  model RSS={loaded - baseline:7.1f} MB  ({per_crop})  "
+        f"all-crop latency mean={statistics.mean(timings) * 1000:.2f}ms p50={statistics.median(timings) * 1000:.2f}ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--mode', choices=['shared', 'separate', 'both'], default='both')
+    parser.add_argument('--iterations', type=int, default=20)
+    args = parser.parse_args()
+
+    if args.mode == 'both':
+        for mode in ('shared', 'separate'):
+            subprocess.run([sys.executable, '-m', 'benchmarks.bench_crop_heads', '--mode', mode,
+                            '--iterations', str(args.iterations)], check=True)
+    else:
+        run(args.mode, args.iterations)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,132 @@
+"""
+Microbenchmarks for AIService hot paths, runnable offline with stub models.
+
+Usage (from backend/):
+    python -m benchmarks.bench_hot_paths --output reports/hot_paths.json
+    python -m benchmarks.bench_hot_paths --iterations 50 --only preprocess,tips
+
+Covers image preprocessing, backbone prediction (single and batched),
+end-to-end detection with the result cache and near-duplicate index off,
+single and bulk loan scoring, and farming tip lookup. STUB_MODELS and the
+other OFFLINE_ENVIRONMENT settings are applied unless already set, so a
+real model can be measured by exporting e.g. STUB_MODELS=false first.
+"""
+import argparse
+import asyncio
+import io
+import time
+from types import SimpleNamespace
+from typing import Any, Dict, List
+
+import numpy as np
+from PIL import Image
+
+from benchmarks.reporting import latency_summary, time_calls, use_offline_environment, write_report
+
+use_offline_environment()
+
+BENCHMARKS = ('preprocess', 'predict', 'detect', 'loan', 'tips')
+
+
+def make_photos(count: int, size=(1600, 1200), seed: int = 0) -> List[bytes]:
+    """Distinct phone-like JPEGs, so nothing is served from a cache"""
+    rng = np.random.default_rng(seed)
+    photos = []
+    for _ in range(count):
+        base = np.linspace(0, 255, size[0], dtype=np.float32)[None, :, None]
+        pixels = np.clip(base + rng.normal(0, 40, (size[1], size[0], 3)), 0, 255).astype(np.uint8)
+        buffer = io.BytesIO()
+        Image.fromarray(pixels, 'RGB').save(buffer, format='JPEG', quality=85)
+        photos.append(buffer.getvalue())
+    return photos
+
+
+async def time_async(fn, iterations: int, warmup: int = 2) -> Dict[str, Any]:
+    for i in range(warmup):
+        await fn(i)
+    latencies = []
+    started = time.perf_counter()
+    for i in range(iterations):
+        call_started = time.perf_counter()
+        await fn(warmup + i)
+        latencies.append(time.perf_counter() - call_started)
+    return latency_summary(latencies, time.perf_counter() - started)
+
+
+async def run(args) -> Dict[str, Any]:
+    import os
+
+    os.environ.setdefault('DETECTION_CACHE_MAX_ENTRIES', '0')
+    os.environ.setdefault('NEAR_DUPLICATE_ENABLED', 'false')
+
+    from app.services.ai_service import AIService
+    from app.services.image_preprocessing import preprocess_image
+    from app.services.loan_scoring import LoanFeatureMatrix, LoanScores
+    from app.services.loan_scoring import synthetic_applicants
+
+    only = set(args.only.split(',')) if args.only else set(BENCHMARKS)
+    service = AIService()
+    await service.initialize_models()
+    results: Dict[str, Any] = {}
+
+    photos = make_photos(args.iterations + 5) if only & {'preprocess', 'detect'} else []
+
+    if 'preprocess' in only:
+        index = iter(range(10 ** 9))
+        results['preprocess_1600x1200'] = time_calls(lambda: preprocess_image(photos[next(index) % len(photos)]), args.iterations)
+
+    if only & {'predict', 'detect'}:
+        await service.wait_for_disease_model()
+
+    if 'predict' in only:
+        pixels = np.random.default_rng(0).integers(0, 255, (32, 224, 224, 3), dtype=np.uint8)
+        for batch_size in (1, 32):
+            def predict(n=batch_size):
+                batch = service._fill_disease_batch(list(pixels[:n]))
+                service.crop_heads.predict(service.disease_backend.predict(batch), 'maize')
+            results[f'predict_batch_{batch_size}'] = time_calls(predict, args.iterations)
+
+    if 'detect' in only:
+        results['detect_disease_end_to_end'] = await time_async(
+            lambda i: service.detect_disease_from_bytes(photos[i % len(photos)], 'maize'), args.iterations
+        )
+
+    if 'loan' in only:
+        applicants = synthetic_applicants(args.bulk_size)
+        results['assess_loan'] = await time_async(
+            lambda i: service.assess_loan(SimpleNamespace(**{k: v for k, v in applicants[i % len(applicants)].items() if k != 'applicant_id'})),
+            args.iterations * 10
+        )
+        features = LoanFeatureMatrix.from_records(applicants)
+
+        def score_bulk():
+            LoanScores(features, service._risk_noise(features))
+        bulk = time_calls(score_bulk, max(3, args.iterations // 10))
+        bulk['applicants_per_s'] = round(args.bulk_size / (bulk['mean_ms'] / 1000), 1)
+        results[f'loan_scores_bulk_{args.bulk_size}'] = bulk
+
+    if 'tips' in only:
+        filters = [(None, None), ('maize', None), ('beans', 'long_rains'), ('coffee', 'dry'), ('unknown', 'monsoon')]
+        index = iter(range(10 ** 9))
+        results['farming_tips_lookup'] = time_calls(
+            lambda: service.farming_tips.lookup(*filters[next(index) % len(filters)]), args.iterations * 100
+        )
+
+    await service.shutdown()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--iterations', type=int, default=100)
+    parser.add_argument('--bulk-size', type=int, default=10000)
+    parser.add_argument('--only', help=f"Comma-separated subset of {','.join(BENCHMARKS)}")
+    parser.add_argument('--output', help='Write a JSON report here')
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    write_report(args.output, 'hot_paths', results, {'iterations': args.iterations, 'bulk_size': args.bulk_size})
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+"""
+Latency/throughput of the disease model on each CPU inference backend.
+
+Usage (from backend/):
+    python -m benchmarks.bench_inference_backends --model-dir /tmp/agriwise-models
+    python -m benchmarks.bench_inference_backends --backends keras onnx --batch-sizes 1 8 32
+
+Exports the model for every backend first (so it runs on a fresh box with
+stub weights) and skips backends whose runtime is not installed.
+"""
+import argparse
+import logging
+import statistics
+import time
+
+import numpy as np
+
+from app.services.inference_backends import BACKENDS, KerasBackend, create_backend, model_path
+from app.services.model_export import EXPORTERS, check_parity
+
+
+def bench_backend(backend, batch_sizes, iterations: int):
+    """Print per-batch latency and images/second for each batch size"""
+    rng = np.random.default_rng(0)
+    for batch_size in batch_sizes:
+        batch = rng.random((batch_size, 224, 224, 3), dtype=np.float32)
+        backend.predict(batch)  # warm-up, also resizes TFLite tensors
+
+        timings = []
+        for _ in range(iterations):
+            started = time.perf_counter()
+            backend.predict(batch)
+            timings.append(time.perf_counter() - started)
+
+        mean = statistics.mean(timings)
+        print(
+            f"{backend.name:<7} batch={batch_size:<3} latency mean={mean * 1000:8.2f}ms "
+            f"p50={statistics.median(timings) * 1000:8.2f}ms  throughput={batch_size / mean:8.1f} img/s"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--backends', nargs='+', choices=BACKENDS, default=list(BACKENDS))
+    parser.add_argument('--batch-sizes', nargs='+', type=int, default=[1, 8, 32])
+    parser.add_argument('--iterations', type=int, default=20)
+    parser.add_argument('--model-dir', default='/tmp/agriwise-models')
+    parser.add_argument('--threads', type=int, help='Intra-op threads for ONNX Runtime / TFLite')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+
+    from app.services.ai_service import AIService
+
+    service = AIService()
+    service.model_cache_dir = args.model_dir
+    reference = KerasBackend(service._load_keras_disease_model())
+    parity_input = np.random.default_rng(1).random((8, 224, 224, 3), dtype=np.float32)
+
+    for name in args.backends:
+        if name == 'keras':
+            backend = reference
+        else:
+            path = model_path(args.model_dir, service.model_version, name)
+            try:
+                EXPORTERS[name](reference.model, path)
+                backend = create_backend(name, path, args.threads)
+            except ImportError as e:
+                print(f"{name:<7} skipped ({e})")
+                continue
+
+            parity = check_parity(reference, backend, parity_input)
+            print(f"{name:<7} parity max_abs_diff={parity['max_abs_diff']:.2e} top1={parity['top1_agreement']:.0%}")
+
+        bench_backend(backend, args.batch_sizes, args.iterations)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+"""
+Benchmark the in-memory market price store.
+
+Usage (from backend/):
+    python -m benchmarks.bench_market_store [--years 3] [--markets 300] [--crops 10]
+
+Generates daily prices for every crop at every market, loads all but the
+last day, then times appending the last day incrementally, filtered
+latest-price queries, rolling averages and history reads, against
+filtering the full DataFrame with pandas on every request. Rolling
+averages are cross-checked against pandas.
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from app.services.market_store import MarketPriceStore
+from benchmarks.reporting import time_calls
+
+CROPS = ['Maize', 'Beans', 'Tomatoes', 'Potatoes', 'Cabbages', 'Kale', 'Onions', 'Bananas', 'Avocados', 'Coffee',
+         'Tea', 'Sorghum', 'Millet', 'Cassava', 'Rice']
+
+
+def make_prices(years: int, markets: int, crops: int, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range(end='2024-06-30', periods=365 * years, freq='D')
+    crop_names, market_names = CROPS[:crops], [f'Market {i}' for i in range(markets)]
+    grid = pd.MultiIndex.from_product([crop_names, market_names, dates], names=['crop', 'market', 'date']).to_frame(index=False)
+    walk = rng.normal(0, 0.02, len(grid)).reshape(crops * markets, len(dates)).cumsum(axis=1)
+    grid['price'] = np.round(100 * np.exp(walk).ravel(), 2)
+    grid['unit'] = 'KES/kg'
+    # Markets don't report every day
+    return grid[rng.random(len(grid)) > 0.1].reset_index(drop=True)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--years', type=int, default=3)
+    parser.add_argument('--markets', type=int, default=300)
+    parser.add_argument('--crops', type=int, default=10)
+    args = parser.parse_args()
+
+    frame = make_prices(args.years, args.markets, args.crops)
+    last_day = frame['date'].max()
+    history, today = frame[frame['date'] < last_day], frame[frame['date'] == last_day]
+    print(f"{len(frame):,} observations, {args.crops} crops x {args.markets} markets x {args.years} years")
+
+    store = MarketPriceStore()
+    started = time.perf_counter()
+    store.append(history)
+    print(f"initial load:        {time.perf_counter() - started:8.2f} s")
+    started = time.perf_counter()
+    added = store.append(today)
+    print(f"append one day:      {(time.perf_counter() - started) * 1000:8.1f} ms ({added} rows)")
+    print(f"re-append same day:  {store.append(today)} rows added")
+
+    results = {
+        'query crop': time_calls(lambda: store.query('maize'), 10000),
+        'query crop+market': time_calls(lambda: store.query('maize', 'Market 7'), 10000),
+        'query market': time_calls(lambda: store.query(None, 'market 7'), 10000),
+        'rolling 30d average': time_calls(lambda: store.rolling_average('beans', 'market 3', 30), 10000),
+        'history 30 days': time_calls(lambda: store.history('beans', 'market 3', 30), 2000),
+        'pandas filter + agg': time_calls(
+            lambda: frame[(frame['crop'] == 'Maize') & (frame['market'] == 'Market 7')]
+            .sort_values('date').tail(30)['price'].mean(), 50
+        ),
+    }
+    for name, summary in results.items():
+        print(f"{name:20s} p50={summary['p50_ms'] * 1000:9.2f} us  p99={summary['p99_ms'] * 1000:9.2f} us")
+
+    series = frame[(frame['crop'] == 'Beans') & (frame['market'] == 'Market 3')].set_index('date')['price']
+    for window in (7, 30):
+        expected = series[series.index > last_day - pd.Timedelta(days=window)].mean()
+        actual = store.rolling_average('beans', 'market 3', window)
+        print(f"{window}d average parity: {'OK' if abs(expected - actual) < 1e-9 else f'MISMATCH {expected} != {actual}'}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+"""
+Benchmark the per-request cost of metrics collection.
+
+Usage (from backend/):
+    python -m benchmarks.bench_metrics_overhead [--requests 50000]
+
+Drives a small FastAPI app directly through its ASGI interface (no network)
+with and without MetricsMiddleware, and reports the added time per request,
+the cost of a ``span``, and how long rendering /metrics takes. The target
+is under 50 us of overhead per request.
+"""
+import argparse
+import asyncio
+import time
+
+from fastapi import FastAPI
+
+from app.core.metrics import REGISTRY, MetricsMiddleware, span
+
+TARGET_US = 50
+
+
+def make_app(with_metrics: bool) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/api/v1/weather/{location}")
+    async def weather(location: str):
+        return {"location": location}
+
+    if with_metrics:
+        app.add_middleware(MetricsMiddleware)
+    return app
+
+
+async def drive(app, requests: int) -> float:
+    """Mean seconds per request through the ASGI app"""
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        pass
+
+    def scope(i: int):
+        return {
+            "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+            "scheme": "http", "path": f"/api/v1/weather/town{i % 50}", "raw_path": b"", "root_path": "",
+            "query_string": b"", "headers": [], "client": ("127.0.0.1", 1234), "server": ("test", 80),
+        }
+
+    for i in range(1000):
+        await app(scope(i), receive, send)
+    started = time.perf_counter()
+    for i in range(requests):
+        await app(scope(i), receive, send)
+    return (time.perf_counter() - started) / requests
+
+
+async def run(requests: int):
+    baseline = min([await drive(make_app(False), requests) for _ in range(3)])
+    instrumented = min([await drive(make_app(True), requests) for _ in range(3)])
+    overhead_us = (instrumented - baseline) * 1e6
+    print(f"request without metrics: {baseline * 1e6:7.1f} us")
+    print(f"request with metrics:    {instrumented * 1e6:7.1f} us")
+    print(f"middleware overhead:     {overhead_us:7.1f} us/request (target < {TARGET_US} us)")
+
+    started = time.perf_counter()
+    for _ in range(requests):
+        with span("benchmark"):
+            pass
+    print(f"span:                    {(time.perf_counter() - started) / requests * 1e6:7.2f} us")
+
+    started = time.perf_counter()
+    body = REGISTRY.render()
+    print(f"render /metrics:         {(time.perf_counter() - started) * 1e3:7.2f} ms ({len(body)} bytes)")
+    print("PASS" if overhead_us < TARGET_US else "FAIL")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=50000)
+    asyncio.run(run(parser.parse_args().requests))
+
+
+if __name__ == "__main__":
+    main()
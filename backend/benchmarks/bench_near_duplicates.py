@@ -0,0 +1,135 @@
+"""
+Benchmark the perceptual-hash near-duplicate index.
+
+Usage (from backend/):
+    python -m benchmarks.bench_near_duplicates --entries 1000000
+    python -m benchmarks.bench_near_duplicates --images /path/to/leaf/photos
+
+Reports lookup latency for hits and misses on an index of --entries random
+hashes, and the near-duplicate hit rate for images that were recompressed
+and rescaled the way messaging apps do.
+"""
+import argparse
+import io
+import random
+import statistics
+import time
+from typing import List
+
+import numpy as np
+from PIL import Image
+
+from app.services.image_preprocessing import preprocess_image
+from app.services.near_duplicate_index import HammingIndex
+from benchmarks.bench_preprocessing import load_corpus
+
+
+def flip_bits(phash: int, count: int, rng: random.Random) -> int:
+    for bit in rng.sample(range(64), count):
+        phash ^= 1 << bit
+    return phash
+
+
+def percentile(values: List[float], pct: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct))]
+
+
+def bench_lookup_latency(entries: int, max_distance: int, queries: int):
+    """Measure lookup latency on an index filled with random hashes"""
+    rng = random.Random(0)
+    index = HammingIndex(capacity=entries, max_distance=max_distance)
+
+    started = time.perf_counter()
+    hashes = [rng.getrandbits(64) for _ in range(entries)]
+    for i, phash in enumerate(hashes):
+        index.add(phash, i)
+    print(f"Built index of {entries:,} entries in {time.perf_counter() - started:.1f}s")
+
+    for label, make_query in (
+        ('near hit', lambda: flip_bits(rng.choice(hashes), rng.randint(0, max_distance), rng)),
+        ('miss', lambda: rng.getrandbits(64)),
+    ):
+        timings = []
+        hits = 0
+        for _ in range(queries):
+            query = make_query()
+            started = time.perf_counter()
+            match = index.search(query)
+            timings.append((time.perf_counter() - started) * 1e6)
+            hits += match is not None
+        print(
+            f"{label:<9} mean={statistics.mean(timings):7.1f}us  p50={percentile(timings, 0.5):7.1f}us  "
+            f"p99={percentile(timings, 0.99):7.1f}us  matched={hits / queries:.1%}"
+        )
+
+
+def recompress(image_data: bytes, quality: int, scale: float) -> bytes:
+    """Simulate a messaging app forwarding a photo"""
+    image = Image.open(io.BytesIO(image_data)).convert('RGB')
+    image = image.resize((int(image.width * scale), int(image.height * scale)))
+    buffer = io.BytesIO()
+    image.save(buffer, format='JPEG', quality=quality)
+    return buffer.getvalue()
+
+
+def make_structured_corpus(count: int, size=(1600, 1200)) -> List[bytes]:
+    """Generate photos with large smooth structures (like leaves and lesions) plus sensor noise"""
+    rng = np.random.default_rng(1)
+    corpus = []
+    for _ in range(count):
+        coarse = Image.fromarray(rng.integers(0, 256, (6, 8, 3), dtype=np.uint8), 'RGB')
+        pixels = np.asarray(coarse.resize(size, Image.Resampling.BICUBIC), dtype=np.float32)
+        pixels = np.clip(pixels + rng.normal(0, 8, pixels.shape), 0, 255).astype(np.uint8)
+        buffer = io.BytesIO()
+        Image.fromarray(pixels, 'RGB').save(buffer, format='JPEG', quality=90)
+        corpus.append(buffer.getvalue())
+    return corpus
+
+
+def bench_hit_rate(corpus: List[bytes], max_distance: int):
+    """Index the originals, then look up recompressed copies and unrelated images"""
+    index = HammingIndex(capacity=len(corpus), max_distance=max_distance)
+    originals = [preprocess_image(data)[1] for data in corpus]
+    for i, phash in enumerate(originals):
+        index.add(phash, i)
+
+    variants = [(40, 0.5), (60, 0.3), (75, 0.25)]
+    for quality, scale in variants:
+        distances = []
+        correct = 0
+        for i, data in enumerate(corpus):
+            phash = preprocess_image(recompress(data, quality, scale))[1]
+            distances.append((phash ^ originals[i]).bit_count())
+            match = index.search(phash)
+            correct += match is not None and match[1] == i
+        print(
+            f"quality={quality:<3} scale={scale:<5} hit rate={correct / len(corpus):.1%}  "
+            f"median distance={statistics.median(distances)}"
+        )
+
+    # Different images should not match each other
+    false_matches = 0
+    for i, phash in enumerate(originals):
+        match = index.search(phash)
+        false_matches += match is not None and match[1] != i
+    print(f"false matches between distinct images: {false_matches}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--entries', type=int, default=1000000)
+    parser.add_argument('--queries', type=int, default=10000)
+    parser.add_argument('--max-distance', type=int, default=4)
+    parser.add_argument('--images', help='Directory of real photos for the hit-rate benchmark')
+    parser.add_argument('--synthetic', type=int, default=50)
+    args = parser.parse_args()
+
+    bench_lookup_latency(args.entries, args.max_distance, args.queries)
+
+    corpus = load_corpus(args.images) if args.images else make_structured_corpus(args.synthetic)
+    bench_hit_rate(corpus, args.max_distance)
+
+
+if __name__ == '__main__':
+    main()
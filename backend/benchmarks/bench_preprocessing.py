@@ -0,0 +1,106 @@
+"""
+Compare the fast preprocessing pipeline against the original PIL path.
+
+Usage (from backend/):
+    python -m benchmarks.bench_preprocessing --images /path/to/phone/photos
+    python -m benchmarks.bench_preprocessing --synthetic 20
+
+Without --images a corpus of synthetic 12 MP JPEGs (4032x3024, some with
+EXIF rotation) is generated in memory.
+"""
+import argparse
+import io
+import statistics
+import time
+from pathlib import Path
+from typing import Callable, List
+
+import numpy as np
+from PIL import Image
+
+from app.services.image_preprocessing import TensorBuffer, preprocess_image
+
+
+def legacy_preprocess(image_data: bytes) -> np.ndarray:
+    """The original AIService.detect_disease preprocessing"""
+    image = Image.open(io.BytesIO(image_data))
+    if image.mode != 'RGB':
+        image = image.convert('RGB')
+    image = image.resize((224, 224))
+    image_array = np.array(image) / 255.0
+    return np.expand_dims(image_array, axis=0)
+
+
+def make_synthetic_corpus(count: int, size=(4032, 3024)) -> List[bytes]:
+    """Generate phone-sized JPEGs with texture so they compress realistically"""
+    rng = np.random.default_rng(0)
+    corpus = []
+    for i in range(count):
+        base = np.linspace(0, 255, size[0], dtype=np.float32)[None, :, None]
+        noise = rng.normal(0, 40, (size[1], size[0], 3))
+        pixels = np.clip(base + noise, 0, 255).astype(np.uint8)
+        image = Image.fromarray(pixels, 'RGB')
+
+        exif = Image.Exif()
+        if i % 3 == 0:
+            exif[0x0112] = 6  # Rotated 90 degrees, as most portrait phone shots are
+
+        buffer = io.BytesIO()
+        image.save(buffer, format='JPEG', quality=90, exif=exif.tobytes())
+        corpus.append(buffer.getvalue())
+    return corpus
+
+
+def load_corpus(directory: str) -> List[bytes]:
+    """Load every image file in a directory"""
+    paths = sorted(
+        p for p in Path(directory).iterdir()
+        if p.suffix.lower() in {'.jpg', '.jpeg', '.png', '.webp'}
+    )
+    return [p.read_bytes() for p in paths]
+
+
+def time_pipeline(name: str, fn: Callable[[bytes], np.ndarray], corpus: List[bytes], repeat: int):
+    """Run fn over the corpus and print latency and output size"""
+    timings = []
+    output = None
+    for _ in range(repeat):
+        for image_data in corpus:
+            started = time.perf_counter()
+            output = fn(image_data)
+            timings.append((time.perf_counter() - started) * 1000)
+
+    timings.sort()
+    p95 = timings[int(len(timings) * 0.95) - 1] if len(timings) > 1 else timings[0]
+    print(
+        f"{name:<10} mean={statistics.mean(timings):8.2f}ms  "
+        f"p50={statistics.median(timings):8.2f}ms  p95={p95:8.2f}ms  "
+        f"output={output.dtype}, {output.nbytes / 1024:.0f} KiB"
+    )
+    return statistics.mean(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--images', help='Directory of real-sized images to benchmark on')
+    parser.add_argument('--synthetic', type=int, default=10, help='Number of synthetic images when --images is not set')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.images) if args.images else make_synthetic_corpus(args.synthetic)
+    total_mb = sum(len(c) for c in corpus) / 1e6
+    print(f"Corpus: {len(corpus)} images, {total_mb:.1f} MB")
+
+    buffer = TensorBuffer(capacity=1)
+
+    def fast_preprocess(image_data: bytes) -> np.ndarray:
+        pixels, _, _ = preprocess_image(image_data)
+        return buffer.fill(0, pixels)
+
+    legacy = time_pipeline('legacy', legacy_preprocess, corpus, args.repeat)
+    fast = time_pipeline('fast', fast_preprocess, corpus, args.repeat)
+    print(f"Speedup: {legacy / fast:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,154 @@
+"""
+Benchmark length-bucketed batching for the text models.
+
+Usage (from backend/):
+    python -m benchmarks.bench_text_batching --model distilbert-base-uncased --texts 2000
+    python -m benchmarks.bench_text_batching --random-weights --threads 1 2 4 --output reports/nlp.json
+
+Generates farmer-style texts with a skewed length distribution (mostly
+short messages, some long narratives) and measures texts per second for:
+
+- ``naive``: one pipeline call per text, as the service used to;
+- ``pipeline_batched``: the pipeline's own batching (batch_size, truncation),
+  which pads every batch to its longest text in arrival order;
+- ``bucketed``: TextClassifier, sorted into length buckets, for each
+  --threads setting of PyTorch intra-op threads;
+- ``queued``: concurrent single-text requests through the InferenceBatcher
+  queue in front of TextClassifier, as /api/v1/text-analysis runs them.
+
+Labels are cross-checked against the pipeline. --random-weights builds a
+DistilBERT-sized model with random weights and a tokenizer trained on the
+generated texts, for machines without the Hugging Face model cache.
+"""
+import argparse
+import asyncio
+import os
+import time
+
+import numpy as np
+
+from app.services.inference_batcher import InferenceBatcher
+from app.services.text_inference import TextClassifier, configure_torch_threads
+from benchmarks.reporting import latency_summary, write_report
+
+WORDS = (
+    'maize beans tomatoes potatoes kale coffee tea rain drought harvest price market fertilizer seed planting '
+    'leaves yellow spots rust blight pests aphids loan season acre yield irrigation soil weeding spraying '
+    'sold bought cooperative transport buyer shillings good bad late early dry wet sick healthy field farm'
+).split()
+
+
+def make_texts(count: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    lengths = np.clip(rng.lognormal(2.8, 0.9, count).astype(int), 3, 300)
+    return [' '.join(rng.choice(WORDS, size=length)) for length in lengths]
+
+
+def random_weight_pipeline(texts):
+    from tokenizers import Tokenizer, models, normalizers, pre_tokenizers, trainers
+    from transformers import DistilBertConfig, DistilBertForSequenceClassification, PreTrainedTokenizerFast, pipeline
+    import torch
+
+    tokenizer = Tokenizer(models.WordPiece(unk_token='[UNK]'))
+    tokenizer.normalizer = normalizers.BertNormalizer(lowercase=True)
+    tokenizer.pre_tokenizer = pre_tokenizers.BertPreTokenizer()
+    tokenizer.train_from_iterator(texts, trainers.WordPieceTrainer(
+        vocab_size=1000, special_tokens=['[PAD]', '[UNK]', '[CLS]', '[SEP]', '[MASK]']
+    ))
+    tokenizer = PreTrainedTokenizerFast(
+        tokenizer_object=tokenizer, unk_token='[UNK]', pad_token='[PAD]', cls_token='[CLS]', sep_token='[SEP]',
+        model_max_length=512, model_input_names=['input_ids', 'attention_mask'],
+    )
+    torch.manual_seed(0)
+    model = DistilBertForSequenceClassification(DistilBertConfig(vocab_size=tokenizer.vocab_size, num_labels=3)).eval()
+    return pipeline('text-classification', model=model, tokenizer=tokenizer)
+
+
+def pretrained_pipeline(name: str):
+    from transformers import AutoModelForSequenceClassification, AutoTokenizer, pipeline
+
+    cache_dir = os.path.join(os.getenv('MODEL_CACHE_DIR', '/app/models'), 'huggingface')
+    tokenizer = AutoTokenizer.from_pretrained(name, cache_dir=cache_dir)
+    model = AutoModelForSequenceClassification.from_pretrained(name, cache_dir=cache_dir)
+    return pipeline('text-classification', model=model, tokenizer=tokenizer)
+
+
+def throughput(fn, texts) -> dict:
+    started = time.perf_counter()
+    fn(texts)
+    elapsed = time.perf_counter() - started
+    return {'count': len(texts), 'elapsed_s': round(elapsed, 3), 'throughput_per_s': round(len(texts) / elapsed, 1)}
+
+
+async def run_queued(classifier: TextClassifier, texts, concurrency: int) -> dict:
+    batcher = InferenceBatcher(classifier.classify, max_batch_size=128, max_wait_ms=5, name='bench', prepare_fn=list)
+    queue = iter(texts)
+    latencies = []
+
+    async def client():
+        for text in queue:
+            started = time.perf_counter()
+            await batcher.submit(text)
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    await batcher.stop()
+    return latency_summary(latencies, elapsed)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--model', default='distilbert-base-uncased')
+    parser.add_argument('--random-weights', action='store_true')
+    parser.add_argument('--texts', type=int, default=1000)
+    parser.add_argument('--naive-texts', type=int, default=200, help='The per-text baseline is slow; time a subset')
+    parser.add_argument('--max-length', type=int, default=128)
+    parser.add_argument('--batch-size', type=int, default=32)
+    parser.add_argument('--threads', type=int, nargs='+', default=[os.cpu_count() or 1])
+    parser.add_argument('--concurrency', type=int, default=64)
+    parser.add_argument('--output', help='Write a JSON report here')
+    args = parser.parse_args()
+
+    texts = make_texts(args.texts)
+    pipe = random_weight_pipeline(texts) if args.random_weights else pretrained_pipeline(args.model)
+    print(f"{len(texts)} texts, {np.mean([len(t.split()) for t in texts]):.0f} words on average, "
+          f"max_length={args.max_length}, batch_size={args.batch_size}")
+
+    configure_torch_threads(args.threads[0])
+    results = {
+        'naive': throughput(
+            lambda batch: [pipe(text, truncation=True, max_length=args.max_length) for text in batch],
+            texts[:args.naive_texts]
+        ),
+        'pipeline_batched': throughput(
+            lambda batch: pipe(batch, batch_size=args.batch_size, truncation=True, max_length=args.max_length), texts
+        ),
+    }
+    classifier = None
+    for threads in args.threads:
+        configure_torch_threads(threads)
+        classifier = TextClassifier(pipe, max_length=args.max_length, max_batch_size=args.batch_size)
+        results[f'bucketed_threads_{threads}'] = throughput(classifier.classify, texts)
+        results[f'bucketed_threads_{threads}']['padding_efficiency'] = classifier.stats()['padding_efficiency']
+    results['queued'] = asyncio.run(run_queued(classifier, texts, args.concurrency))
+
+    for name, result in results.items():
+        extra = f"  padding efficiency {result['padding_efficiency']:.0%}" if 'padding_efficiency' in result else ''
+        print(f"{name:24s} {result['throughput_per_s']:8.1f} texts/s{extra}")
+
+    expected = pipe(texts[:200], batch_size=args.batch_size, truncation=True, max_length=args.max_length)
+    actual = classifier.classify(texts[:200])
+    agreement = np.mean([e['label'] == a['label'] for e, a in zip(expected, actual)])
+    max_diff = max(abs(e['score'] - a['score']) for e, a in zip(expected, actual))
+    print(f"parity with the pipeline: {agreement:.1%} same labels, max score difference {max_diff:.1e}")
+
+    write_report(args.output, 'text_batching', {'queued': results['queued']}, config={
+        **vars(args), 'throughput': {name: r['throughput_per_s'] for name, r in results.items()},
+        'label_agreement': float(agreement),
+    })
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""
+Benchmark per-request JWT verification cost in get_current_user.
+
+Usage (from backend/):
+    python -m benchmarks.bench_token_cache [--requests 20000] [--users 500]
+
+Times token verification with python-jose (what verify_token does), PyJWT,
+and VerifiedTokenCache in front of each, for a workload of --requests
+requests spread over --users active tokens. Backends that aren't installed
+are skipped.
+"""
+import argparse
+import os
+import random
+import time
+
+from app.core.token_cache import VerifiedTokenCache
+
+SECRET_KEY = os.getenv('SECRET_KEY', 'benchmark-secret-key')
+ALGORITHM = os.getenv('ALGORITHM', 'HS256')
+
+
+def verifiers():
+    try:
+        from jose import jwt as jose_jwt
+
+        yield 'python-jose', lambda token: jose_jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except ImportError:
+        print("python-jose not installed, skipping")
+    try:
+        import jwt
+
+        yield 'pyjwt', lambda token: jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except ImportError:
+        print("PyJWT not installed, skipping")
+
+
+def make_tokens(users: int):
+    from jose import jwt as jose_jwt
+
+    now = int(time.time())
+    return [
+        jose_jwt.encode({'sub': str(i), 'iat': now, 'exp': now + 3600}, SECRET_KEY, algorithm=ALGORITHM)
+        for i in range(users)
+    ]
+
+
+def time_per_request(verify, workload) -> float:
+    started = time.perf_counter()
+    for token in workload:
+        verify(token)
+    return (time.perf_counter() - started) / len(workload)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--requests', type=int, default=20000)
+    parser.add_argument('--users', type=int, default=500)
+    args = parser.parse_args()
+
+    tokens = make_tokens(args.users)
+    rng = random.Random(0)
+    workload = [rng.choice(tokens) for _ in range(args.requests)]
+
+    print(f"{args.requests} requests over {args.users} tokens ({ALGORITHM})")
+    for name, verify in verifiers():
+        uncached = time_per_request(verify, workload)
+        cache = VerifiedTokenCache(verify)
+        cached = time_per_request(cache.verify, workload)
+        stats = cache.stats()
+        print(
+            f"{name:12s} uncached {uncached * 1e6:7.1f} us/request   "
+            f"cached {cached * 1e6:6.1f} us/request ({uncached / cached:.0f}x, hit rate {stats['hit_rate']:.1%})"
+        )
+
+
+if __name__ == '__main__':
+    main()
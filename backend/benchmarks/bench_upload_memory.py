@@ -0,0 +1,139 @@
+"""
+Peak memory of upload ingestion under concurrent large uploads.
+
+Usage (from backend/):
+    python -m benchmarks.bench_upload_memory
+    python -m benchmarks.bench_upload_memory --concurrency 20 --size-mb 20
+
+Simulates a burst of concurrent uploads, as Starlette hands them to the
+endpoint (a SpooledTemporaryFile behind an UploadFile), and compares:
+
+    legacy    await file.read(), full-resolution PIL decode, resize
+    streaming ingest_upload() into one buffer, memoryview into preprocess_image
+
+for valid JPEGs, oversized files (rejected from the declared size) and
+images whose header declares huge dimensions (rejected after the first
+chunk, without reading the rest). Each case runs in a fresh process and
+reports the Python heap peak (tracemalloc) and the growth of peak RSS
+(VmHWM, which also covers Pillow's native decode buffers).
+"""
+import argparse
+import asyncio
+import io
+import json
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+from PIL import Image
+from starlette.datastructures import Headers, UploadFile
+
+from app.services.image_preprocessing import preprocess_image
+from app.services.upload_ingestion import UploadRejected, ingest_upload
+
+
+def make_jpeg(width: int, height: int, size_bytes: int) -> bytes:
+    """A decodable JPEG padded with a trailing comment block up to size_bytes"""
+    rng = np.random.default_rng(0)
+    small = rng.integers(0, 255, (height // 16, width // 16, 3), dtype=np.uint8)
+    buffer = io.BytesIO()
+    Image.fromarray(small).resize((width, height)).save(buffer, format='JPEG', quality=90)
+    data = buffer.getvalue()
+    return data + bytes(max(0, size_bytes - len(data)))
+
+
+def make_bomb_header(width: int, height: int, size_bytes: int) -> bytes:
+    """A JPEG whose SOF0 header declares width x height, followed by junk"""
+    sof = b'\xff\xc0\x00\x11\x08' + height.to_bytes(2, 'big') + width.to_bytes(2, 'big') + b'\x03' + bytes(9)
+    return b'\xff\xd8\xff\xe0\x00\x10JFIF\x00\x01\x01\x00\x00\x01\x00\x01\x00\x00' + sof + bytes(size_bytes)
+
+
+def make_upload(data: bytes) -> UploadFile:
+    spooled = tempfile.SpooledTemporaryFile(max_size=1024 * 1024)
+    spooled.write(data)
+    spooled.seek(0)
+    return UploadFile(spooled, size=len(data), filename='leaf.jpg', headers=Headers({'content-type': 'image/jpeg'}))
+
+
+def peak_rss_mb() -> float:
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith('VmHWM:'):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+async def legacy_ingest(upload: UploadFile):
+    data = await upload.read()
+    image = Image.open(io.BytesIO(data)).convert('RGB').resize((224, 224))
+    return (np.array(image) / 255.0).shape
+
+
+async def streaming_ingest(upload: UploadFile):
+    ingested = await ingest_upload(upload, kind='image')
+    return preprocess_image(ingested.view)[0].shape
+
+
+CASES = {
+    'valid': lambda args: make_jpeg(4000, 3000, int(args.size_mb * 1024 * 1024)),
+    'oversized': lambda args: make_jpeg(1024, 768, int(args.oversize_mb * 1024 * 1024)),
+    'huge-dimensions': lambda args: make_bomb_header(60000, 60000, int(args.size_mb * 1024 * 1024)),
+}
+MODES = {'legacy': legacy_ingest, 'streaming': streaming_ingest}
+
+
+async def run_burst(ingest, payload: bytes, concurrency: int):
+    uploads = [make_upload(payload) for _ in range(concurrency)]
+    baseline_rss = peak_rss_mb()
+    tracemalloc.start()
+    start = time.perf_counter()
+    results = await asyncio.gather(*(ingest(u) for u in uploads), return_exceptions=True)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    for upload in uploads:
+        await upload.close()
+
+    return {
+        'heap_peak_mb': peak / 1e6,
+        'rss_growth_mb': peak_rss_mb() - baseline_rss,
+        'seconds': elapsed,
+        'rejected': sum(isinstance(r, UploadRejected) for r in results),
+        'errors': sum(isinstance(r, Exception) and not isinstance(r, UploadRejected) for r in results),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--concurrency', type=int, default=20)
+    parser.add_argument('--size-mb', type=float, default=8.0, help='Size of the valid uploads')
+    parser.add_argument('--oversize-mb', type=float, default=20.0)
+    parser.add_argument('--single', nargs=2, metavar=('CASE', 'MODE'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.single:
+        case, mode = args.single
+        payload = CASES[case](args)
+        print(json.dumps(asyncio.run(run_burst(MODES[mode], payload, args.concurrency))))
+        return
+
+    print(f"{args.concurrency} concurrent uploads per case, each case in a fresh process\n")
+    print(f"{'case':16} {'mode':10} {'heap MB':>9} {'RSS +MB':>9} {'time s':>8} {'rejected':>9} {'errors':>7}")
+    for case in CASES:
+        for mode in MODES:
+            output = subprocess.run(
+                [sys.executable, '-m', 'benchmarks.bench_upload_memory', '--single', case, mode,
+                 '--concurrency', str(args.concurrency), '--size-mb', str(args.size_mb),
+                 '--oversize-mb', str(args.oversize_mb)],
+                capture_output=True, text=True, check=True
+            ).stdout
+            r = json.loads(output.strip().splitlines()[-1])
+            print(f"{case:16} {mode:10} {r['heap_peak_mb']:9.1f} {r['rss_growth_mb']:9.1f} "
+                  f"{r['seconds']:8.2f} {r['rejected']:9d} {r['errors']:7d}")
+
+
+if __name__ == '__main__':
+    main()
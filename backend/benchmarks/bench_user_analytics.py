@@ -0,0 +1,88 @@
+"""
+Benchmark: incremental per-user analytics vs recomputing from history.
+
+Usage (from backend/):
+    python -m benchmarks.bench_user_analytics [--events 20000] [--users 50]
+
+Records synthetic detection and loan events over the last 60 days into a
+temporary event log, then compares reading one user's analytics from the
+incrementally maintained aggregate with replaying that user's events, and
+checks that a rebuild from the log reproduces the same aggregates.
+"""
+import argparse
+import asyncio
+import random
+import tempfile
+import time
+
+from app.services.user_analytics import EventLog, UserAnalytics, event_increments, summarize
+
+DISEASES = ['Healthy', 'Leaf Blight', 'Rust', 'Gray Leaf Spot']
+SEVERITIES = ['low', 'medium', 'high']
+
+
+def make_events(count: int, users: int, seed: int = 7):
+    rng = random.Random(seed)
+    now = time.time()
+    for _ in range(count):
+        user_id = f'user{rng.randrange(users)}'
+        ts = now - rng.uniform(0, 60 * 86400)
+        if rng.random() < 0.8:
+            yield 'disease_detection', user_id, ts, {
+                'crop_type': rng.choice(['maize', 'beans', 'cassava']),
+                'disease': rng.choice(DISEASES),
+                'severity': rng.choice(SEVERITIES),
+                'confidence': round(rng.uniform(60, 99), 2),
+            }
+        else:
+            yield 'loan_assessment', user_id, ts, {'eligible': rng.random() < 0.6, 'risk_score': round(rng.random(), 3)}
+
+
+def recompute(event_log: EventLog, user_id: str):
+    """The history-scanning alternative: fold every event of the user on read"""
+    fields = {}
+    for event in event_log.replay():
+        if event['user_id'] == user_id:
+            for name, value in event_increments(event).items():
+                fields[name] = fields.get(name, 0) + value
+    return summarize(fields)
+
+
+async def run(args):
+    with tempfile.TemporaryDirectory() as directory:
+        analytics = UserAnalytics(event_log=EventLog(directory))
+        started = time.perf_counter()
+        for event_type, user_id, ts, result in make_events(args.events, args.users):
+            await analytics.record(event_type, user_id, result, timestamp=ts)
+        elapsed = time.perf_counter() - started
+        print(f"record: {args.events} events in {elapsed:.2f}s ({args.events / elapsed:,.0f}/s, event log included)")
+
+        reads = 1000
+        started = time.perf_counter()
+        for i in range(reads):
+            await analytics.get(f'user{i % args.users}')
+        incremental = (time.perf_counter() - started) / reads
+        print(f"get (incremental): {incremental * 1e6:.0f} us/read")
+
+        started = time.perf_counter()
+        recompute(analytics.event_log, 'user0')
+        scan = time.perf_counter() - started
+        print(f"get (recompute from history): {scan * 1e6:.0f} us/read ({scan / incremental:.0f}x slower)")
+
+        before = {f'user{i}': await analytics.get(f'user{i}') for i in range(args.users)}
+        started = time.perf_counter()
+        applied = await analytics.rebuild()
+        print(f"rebuild: {applied} events in {time.perf_counter() - started:.2f}s")
+        after = {f'user{i}': await analytics.get(f'user{i}') for i in range(args.users)}
+        print(f"rebuild parity: {'OK' if before == after else 'MISMATCH'}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--events', type=int, default=20000)
+    parser.add_argument('--users', type=int, default=50)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == '__main__':
+    main()
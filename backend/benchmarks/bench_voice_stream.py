@@ -0,0 +1,248 @@
+"""
+Benchmark and check streaming voice commands against one-shot uploads.
+
+Usage (from backend/):
+    python -m benchmarks.bench_voice_stream [--speech-seconds 4] [--chunk-ms 100]
+
+Uses synthetic speech (modulated noise over a quiet background) and the
+STUB_MODELS recognizer, which reveals a fixed sentence word by word.
+
+1. Protocol checks through a WebSocket app driving VoiceStreamManager:
+   events arrive in order with an early intent before the end of speech;
+   mu-law and PCM16 streams give the same transcript; an oversized chunk
+   is rejected with 1009; a stream over the concurrency cap is closed with
+   1013; tokens are taken from the handshake (Authorization header or
+   'bearer' subprotocol) or a first auth message, never the query string.
+2. Latency on simulated 2G/3G uplinks, in virtual time, with the real
+   per-chunk processing cost: when the farmer hears the intent and the
+   final transcript, measured from when they stop speaking, compared with
+   uploading the whole recording and processing it in one shot (1 s, like
+   the mock voice command).
+3. Processing cost per second of audio, i.e. how many live streams one
+   worker thread keeps up with.
+
+Exits non-zero if a check fails.
+"""
+import argparse
+import json
+import sys
+import time
+
+import numpy as np
+
+from app.services.stub_models import StubStreamRecognizer
+from app.services.voice_streaming import (
+    AUTH_SUBPROTOCOL, MESSAGE_TOO_BIG, POLICY_VIOLATION, TRY_AGAIN_LATER, VoiceStreamManager, VoiceStreamSession,
+    handshake_token, receive_auth_token
+)
+
+# (uplink kbit/s, round trip ms) of typical mobile links
+LINKS = {
+    '2G (EDGE)': (60, 600),
+    '3G': (300, 200),
+}
+ONE_SHOT_PROCESSING_SECONDS = 1.0
+TOKEN = 'test-token'
+
+
+def make_speech(sample_rate: int, speech_seconds: float, silence_seconds: float = 0.5, seed: int = 0) -> np.ndarray:
+    """Background noise, then syllable-modulated loud noise, then a second of background"""
+    rng = np.random.default_rng(seed)
+    total = int(sample_rate * (silence_seconds + speech_seconds + 1.0))
+    audio = rng.normal(0, 60, total)
+    start, end = int(sample_rate * silence_seconds), int(sample_rate * (silence_seconds + speech_seconds))
+    t = np.arange(end - start) / sample_rate
+    envelope = 0.35 + 0.65 * np.abs(np.sin(2 * np.pi * 2.5 * t))
+    audio[start:end] += rng.normal(0, 4000, end - start) * envelope
+    return np.clip(audio, -32768, 32767).astype('<i2')
+
+
+def encode_mulaw(pcm: np.ndarray) -> bytes:
+    """G.711 mu-law encoding (the client side of encoding=mulaw)"""
+    x = np.clip(pcm.astype(np.int32), -32635, 32635)
+    sign = np.where(x < 0, 0x80, 0)
+    x = np.abs(x) + 0x84
+    exponent = np.floor(np.log2(x)).astype(np.int32) - 7
+    mantissa = (x >> (exponent + 3)) & 0x0F
+    return (~(sign | (exponent << 4) | mantissa) & 0xFF).astype(np.uint8).tobytes()
+
+
+def chunks(audio: bytes, bytes_per_chunk: int):
+    return [audio[i:i + bytes_per_chunk] for i in range(0, len(audio), bytes_per_chunk)]
+
+
+def stub_manager(max_streams: int = 50) -> VoiceStreamManager:
+    return VoiceStreamManager(lambda language, rate: (lambda: StubStreamRecognizer(language, rate)), max_streams=max_streams)
+
+
+def make_app(manager: VoiceStreamManager):
+    from starlette.applications import Starlette
+    from starlette.routing import WebSocketRoute
+
+    async def endpoint(websocket):
+        # The same authentication steps as main.stream_voice_command, with a fixed token
+        token, subprotocol = handshake_token(websocket.headers)
+        if token is not None and token != TOKEN:
+            await websocket.close(code=POLICY_VIOLATION)
+            return
+        await websocket.accept(subprotocol=subprotocol)
+        if token is None and await receive_auth_token(websocket, timeout=1.0) != TOKEN:
+            await websocket.close(code=POLICY_VIOLATION)
+            return
+        if not manager.try_acquire():
+            await websocket.close(code=TRY_AGAIN_LATER)
+            return
+        params = websocket.query_params
+        await manager.serve(websocket, params.get('language', 'swahili'), int(params.get('sample_rate', 16000)),
+                            params.get('encoding', 'pcm16'))
+
+    return Starlette(routes=[WebSocketRoute('/stream', endpoint)])
+
+
+AUTH = {'headers': {'Authorization': f'Bearer {TOKEN}'}}
+
+
+def stream_over_websocket(client, audio: bytes, query: str, bytes_per_chunk: int):
+    events = []
+    with client.websocket_connect(f'/stream?{query}', **AUTH) as ws:
+        events.append(ws.receive_json())
+        for chunk in chunks(audio, bytes_per_chunk):
+            ws.send_bytes(chunk)
+        ws.send_text(json.dumps({'type': 'end'}))
+        while events[-1]['type'] not in ('done', 'error'):
+            events.append(ws.receive_json())
+    return events
+
+
+def run_checks(args) -> dict:
+    from starlette.testclient import TestClient
+    from starlette.websockets import WebSocketDisconnect
+
+    rate = 8000
+    speech = make_speech(rate, args.speech_seconds)
+    speech_end_ms = (0.5 + args.speech_seconds) * 1000
+    checks = {}
+
+    manager = stub_manager(max_streams=1)
+    with TestClient(make_app(manager)) as client:
+        events = stream_over_websocket(client, speech.tobytes(), f'sample_rate={rate}', rate * 2 * args.chunk_ms // 1000)
+        kinds = [event['type'] for event in events]
+        intent = next((event for event in events if event['type'] == 'intent'), None)
+        checks['event order'] = (
+            kinds[0] == 'ready' and kinds[1] == 'speech_start' and 'partial' in kinds
+            and kinds.index('intent') < kinds.index('final') < kinds.index('done')
+        )
+        checks['early intent before speech ends'] = (
+            intent is not None and intent['action'] == 'market_prices' and intent['at_ms'] < speech_end_ms
+        )
+
+        mulaw_events = stream_over_websocket(client, encode_mulaw(speech), f'sample_rate={rate}&encoding=mulaw',
+                                             rate * args.chunk_ms // 1000)
+        checks['mu-law matches PCM16'] = mulaw_events[-1]['transcripts'] == events[-1]['transcripts']
+
+        with client.websocket_connect(f'/stream?sample_rate={rate}', **AUTH) as ws:
+            ws.receive_json()
+            ws.send_bytes(b'\0' * (manager.max_chunk_bytes + 2))
+            error = ws.receive_json()
+        checks['oversized chunk rejected'] = error['type'] == 'error' and error['code'] == MESSAGE_TOO_BIG
+
+        with client.websocket_connect('/stream', **AUTH) as first:
+            first.receive_json()
+            try:
+                with client.websocket_connect('/stream', **AUTH) as second:
+                    second.receive_json()
+                rejected_code = None
+            except WebSocketDisconnect as e:
+                rejected_code = e.code
+        checks['concurrency cap'] = rejected_code == TRY_AGAIN_LATER and manager.stats()['rejected'] == 1
+
+        with client.websocket_connect('/stream', subprotocols=[AUTH_SUBPROTOCOL, TOKEN]) as ws:
+            ready = ws.receive_json()
+            accepted_subprotocol = ws.accepted_subprotocol
+        with client.websocket_connect('/stream') as ws:
+            ws.send_text(json.dumps({'type': 'auth', 'token': TOKEN}))
+            ready_after_message = ws.receive_json()
+        checks['token via subprotocol or message'] = (
+            ready['type'] == 'ready' and accepted_subprotocol == AUTH_SUBPROTOCOL
+            and ready_after_message['type'] == 'ready'
+        )
+
+        codes = []
+        for headers, first_message in (({'Authorization': 'Bearer wrong'}, None), ({}, {'type': 'end'})):
+            try:
+                with client.websocket_connect('/stream', headers=headers) as ws:
+                    if first_message:
+                        ws.send_text(json.dumps(first_message))
+                    ws.receive_json()
+            except WebSocketDisconnect as e:
+                codes.append(e.code)
+        checks['unauthenticated streams rejected'] = codes == [POLICY_VIOLATION, POLICY_VIOLATION]
+    return checks
+
+
+def simulate_link(args, encoding: str, kbps: float, rtt_ms: float):
+    """When the client hears the intent, the final transcript and the one-shot answer, in seconds after speech ends"""
+    rate = 8000 if encoding == 'mulaw' else 16000
+    speech = make_speech(rate, args.speech_seconds)
+    audio = encode_mulaw(speech) if encoding == 'mulaw' else speech.tobytes()
+    bytes_per_chunk = len(audio) * args.chunk_ms // (len(speech) * 1000 // rate)
+    session = VoiceStreamSession(lambda: StubStreamRecognizer('swahili', rate), rate, encoding)
+
+    link_free = server_free = 0.0
+    heard = {}
+    for index, chunk in enumerate(chunks(audio, bytes_per_chunk)):
+        recorded = (index + 1) * args.chunk_ms / 1000
+        link_free = max(link_free, recorded) + len(chunk) * 8 / (kbps * 1000)
+        started = time.perf_counter()
+        events = session.feed(chunk)
+        server_free = max(server_free, link_free + rtt_ms / 2000) + time.perf_counter() - started
+        for event in events:
+            heard.setdefault(event['type'], server_free + rtt_ms / 2000)
+    for event in session.finish():
+        heard.setdefault(event['type'], server_free + rtt_ms / 2000)
+
+    speech_end = 0.5 + args.speech_seconds
+    one_shot_upload = len(audio) * 8 / (kbps * 1000) + rtt_ms / 1000
+    return {
+        'intent_s': heard['intent'] - speech_end,
+        'final_s': heard['final'] - speech_end,
+        'one_shot_s': (len(speech) / rate - speech_end) + one_shot_upload + ONE_SHOT_PROCESSING_SECONDS + rtt_ms / 2000,
+    }
+
+
+def processing_cost(args) -> float:
+    """Seconds of processing per second of streamed audio"""
+    rate = 16000
+    audio = make_speech(rate, 20).tobytes()
+    session = VoiceStreamSession(lambda: StubStreamRecognizer('swahili', rate), rate, max_stream_seconds=60)
+    started = time.perf_counter()
+    for chunk in chunks(audio, rate * 2 * args.chunk_ms // 1000):
+        session.feed(chunk)
+    return (time.perf_counter() - started) / (len(audio) / 2 / rate)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--speech-seconds', type=float, default=4.0)
+    parser.add_argument('--chunk-ms', type=int, default=100)
+    args = parser.parse_args()
+
+    print("Latency after the farmer stops speaking (negative: heard while still speaking)")
+    for link, (kbps, rtt_ms) in LINKS.items():
+        for encoding in ('pcm16', 'mulaw'):
+            result = simulate_link(args, encoding, kbps, rtt_ms)
+            print(f"  {link:10s} {encoding:6s} intent {result['intent_s']:+6.2f}s  final {result['final_s']:+6.2f}s  "
+                  f"one-shot upload {result['one_shot_s']:+6.2f}s")
+
+    cost = processing_cost(args)
+    print(f"VAD + session cost: {cost * 1000:.2f} ms per second of audio (~{1 / cost:.0f} streams per thread, "
+          f"before recognition)")
+
+    checks = run_checks(args)
+    for name, passed in checks.items():
+        print(f"{name:32s} {'PASS' if passed else 'FAIL'}")
+    sys.exit(0 if all(checks.values()) else 1)
+
+
+if __name__ == '__main__':
+    main()
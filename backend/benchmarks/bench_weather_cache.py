@@ -0,0 +1,148 @@
+"""
+Benchmark and check the weather forecast cache against a local fake provider.
+
+Usage (from backend/):
+    python -m benchmarks.bench_weather_cache [--requests 20000] [--locations 300]
+
+Simulates farmers asking for forecasts with a skewed (Zipf-like) location
+popularity, half as county names in varying spelling and half as GPS
+coordinates around those counties, and compares upstream calls and latency
+with and without ForecastCache. Then checks that:
+- 1000 concurrent misses for one location make a single upstream call;
+- an expired forecast is served immediately while one background refresh runs;
+- a provider outage serves the last forecast instead of failing.
+
+Exits non-zero if a check fails.
+"""
+import argparse
+import asyncio
+import random
+import sys
+import time
+
+import numpy as np
+
+from app.services.forecast_cache import ForecastCache
+from benchmarks.reporting import latency_summary
+
+
+class FakeWeatherProvider:
+    """Stands in for WeatherService.get_forecast: fixed latency, counted calls"""
+
+    def __init__(self, latency: float = 0.15):
+        self.latency = latency
+        self.calls = 0
+        self.failing = False
+
+    async def get_forecast(self, location: str):
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        if self.failing:
+            raise RuntimeError("provider unavailable")
+        return {'location': location, 'temperature': 24.0, 'humidity': 61, 'forecast': ['sunny'] * 5}
+
+
+class FakeClock:
+    def __init__(self, now: float = 1_700_000_000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def make_requests(count: int, locations: int, seed: int = 0):
+    rng = random.Random(seed)
+    weights = 1 / np.arange(1, locations + 1)
+    picks = np.random.default_rng(seed).choice(locations, size=count, p=weights / weights.sum())
+    centers = [(-1.5 + (i % 20) * 0.15, 35.0 + (i // 20) * 0.15) for i in range(locations)]
+    requests = []
+    for pick in picks:
+        if rng.random() < 0.5:
+            name = f'County {pick}'
+            requests.append(rng.choice([name, name.upper(), f'  {name.lower()},  Kenya']))
+        else:
+            lat, lon = centers[pick]
+            requests.append(f'{lat + rng.uniform(-0.01, 0.01):.5f},{lon + rng.uniform(-0.01, 0.01):.5f}')
+    return requests
+
+
+async def simulate(requests, get, concurrency: int) -> dict:
+    queue = iter(requests)
+    latencies = []
+
+    async def farmer():
+        for location in queue:
+            started = time.perf_counter()
+            await get(location)
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(farmer() for _ in range(concurrency)))
+    return latency_summary(latencies, time.perf_counter() - started)
+
+
+async def check_single_flight() -> bool:
+    provider = FakeWeatherProvider(latency=0.05)
+    cache = ForecastCache(provider.get_forecast)
+    await asyncio.gather(*(cache.get('Nakuru') for _ in range(1000)))
+    return provider.calls == 1
+
+
+async def check_stale_while_revalidate() -> bool:
+    provider, clock = FakeWeatherProvider(latency=0.05), FakeClock()
+    cache = ForecastCache(provider.get_forecast, update_interval=600, stale_seconds=1800, clock=clock)
+    await cache.get('Kisumu')
+    clock.now += 700
+    started = time.perf_counter()
+    await asyncio.gather(*(cache.get('Kisumu') for _ in range(50)))
+    served_stale_fast = time.perf_counter() - started < provider.latency / 2
+    await asyncio.sleep(provider.latency * 2)
+    return served_stale_fast and provider.calls == 2 and cache.stats()['stale_hits'] == 50
+
+
+async def check_stale_if_error() -> bool:
+    provider, clock = FakeWeatherProvider(latency=0.01), FakeClock()
+    cache = ForecastCache(provider.get_forecast, stale_seconds=0, clock=clock)
+    first = await cache.get('Eldoret')
+    provider.failing = True
+    clock.now += 3600
+    return await cache.get('Eldoret') == first
+
+
+async def run(args) -> bool:
+    requests = make_requests(args.requests, args.locations)
+
+    provider = FakeWeatherProvider(args.provider_latency)
+    uncached = await simulate(requests[: args.requests // 10], provider.get_forecast, args.concurrency)
+    print(f"no cache:   {provider.calls} upstream calls for {uncached['count']} requests, "
+          f"p50={uncached['p50_ms']:.1f}ms p99={uncached['p99_ms']:.1f}ms")
+
+    provider = FakeWeatherProvider(args.provider_latency)
+    cache = ForecastCache(provider.get_forecast)
+    cached = await simulate(requests, cache.get, args.concurrency)
+    print(f"with cache: {provider.calls} upstream calls for {cached['count']} requests, "
+          f"p50={cached['p50_ms']:.3f}ms p99={cached['p99_ms']:.1f}ms, {cached['throughput_per_s']:.0f} req/s")
+    print(f"            {cache.stats()}")
+
+    checks = {
+        'single-flight': await check_single_flight(),
+        'stale-while-revalidate': await check_stale_while_revalidate(),
+        'stale-if-error': await check_stale_if_error(),
+    }
+    for name, passed in checks.items():
+        print(f"{name:24s} {'PASS' if passed else 'FAIL'}")
+    return all(checks.values())
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--requests', type=int, default=20000)
+    parser.add_argument('--locations', type=int, default=300)
+    parser.add_argument('--concurrency', type=int, default=200)
+    parser.add_argument('--provider-latency', type=float, default=0.15)
+    args = parser.parse_args()
+    sys.exit(0 if asyncio.run(run(args)) else 1)
+
+
+if __name__ == '__main__':
+    main()
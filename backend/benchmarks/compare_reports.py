@@ -0,0 +1,58 @@
+"""
+Compare two benchmark JSON reports, e.g. from two commits.
+
+Usage (from backend/):
+    python -m benchmarks.compare_reports reports/base.json reports/new.json
+    python -m benchmarks.compare_reports base.json new.json --metric p99_ms --threshold 10
+
+Prints p50/p95/p99 and throughput for every benchmark present in both
+reports with the relative change, and exits non-zero when the chosen
+latency metric regressed by more than --threshold percent anywhere.
+"""
+import argparse
+import json
+import sys
+
+METRICS = ('p50_ms', 'p95_ms', 'p99_ms', 'throughput_per_s')
+
+
+def change(base: float, new: float) -> float:
+    return (new - base) / base * 100 if base else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('base')
+    parser.add_argument('new')
+    parser.add_argument('--metric', default='p95_ms', choices=METRICS[:3])
+    parser.add_argument('--threshold', type=float, default=15.0, help='Allowed regression in percent')
+    args = parser.parse_args()
+
+    with open(args.base) as f:
+        base = json.load(f)
+    with open(args.new) as f:
+        new = json.load(f)
+
+    print(f"base: {base['environment'].get('commit')} ({base['created_at']})")
+    print(f"new:  {new['environment'].get('commit')} ({new['created_at']})")
+    regressions = []
+    for name in sorted(set(base['results']) & set(new['results'])):
+        before, after = base['results'][name], new['results'][name]
+        if not before.get('count') or not after.get('count'):
+            continue
+        cells = []
+        for metric in METRICS:
+            if before.get(metric) is None or after.get(metric) is None:
+                continue
+            cells.append(f"{metric}={after[metric]:.3f} ({change(before[metric], after[metric]):+.1f}%)")
+        print(f"{name:28s} " + "  ".join(cells))
+        if change(before[args.metric], after[args.metric]) > args.threshold:
+            regressions.append(name)
+
+    if regressions:
+        print(f"{args.metric} regressed more than {args.threshold}% in: {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
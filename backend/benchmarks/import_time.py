@@ -0,0 +1,87 @@
+"""
+Measure import time of backend modules with ``python -X importtime``.
+
+Usage (from backend/):
+    python -m benchmarks.import_time
+    python -m benchmarks.import_time --module main --budget-ms 1500
+
+Each module is imported in a fresh interpreter. The script prints the
+cumulative import time and the slowest imports, and exits non-zero when a
+module exceeds its budget or pulls in an ML framework at import time.
+"""
+import argparse
+import re
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+# Import-time budgets in milliseconds
+DEFAULT_BUDGETS = {
+    'app.services.ai_service': 600,
+    'main': 1500,
+}
+
+# Frameworks that must only be imported when a model is actually loaded
+HEAVY_MODULES = ('tensorflow', 'torch', 'transformers', 'cv2', 'onnxruntime')
+
+LINE_PATTERN = re.compile(r'import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)')
+
+
+def measure(module: str) -> Tuple[float, List[Tuple[str, float]]]:
+    """Import module in a fresh interpreter; return total ms and per-package cumulative ms"""
+    completed = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        capture_output=True, text=True,
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{completed.stderr[-2000:]}")
+
+    imports: Dict[str, float] = {}
+    total_ms = 0.0
+    for line in completed.stderr.splitlines():
+        match = LINE_PATTERN.match(line)
+        if not match:
+            continue
+        cumulative_ms = int(match.group(2)) / 1000
+        name = match.group(4)
+        imports[name] = cumulative_ms
+        if name == module:
+            total_ms = cumulative_ms
+
+    slowest = sorted(imports.items(), key=lambda item: item[1], reverse=True)
+    return total_ms, slowest
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--module', action='append', help='Module to measure (repeatable)')
+    parser.add_argument('--budget-ms', type=float, help='Budget applied to every --module')
+    parser.add_argument('--top', type=int, default=10)
+    args = parser.parse_args()
+
+    budgets = {m: args.budget_ms or DEFAULT_BUDGETS.get(m, 1000) for m in args.module} if args.module else DEFAULT_BUDGETS
+
+    failed = False
+    for module, budget in budgets.items():
+        try:
+            total_ms, slowest = measure(module)
+        except RuntimeError as e:
+            print(e)
+            failed = True
+            continue
+
+        heavy = sorted({name.split('.')[0] for name, _ in slowest if name.split('.')[0] in HEAVY_MODULES})
+        status = 'OK' if total_ms <= budget and not heavy else 'OVER BUDGET'
+        print(f"{module}: {total_ms:.1f}ms (budget {budget:.0f}ms) {status}")
+        if heavy:
+            print(f"  heavy frameworks imported eagerly: {', '.join(heavy)}")
+        for name, ms in slowest[1:args.top + 1]:
+            print(f"  {ms:8.1f}ms  {name}")
+
+        failed = failed or status != 'OK'
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
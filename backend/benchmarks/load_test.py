@@ -0,0 +1,176 @@
+"""
+In-process load generator for the API.
+
+Usage (from backend/):
+    python -m benchmarks.load_test --concurrency 32 --duration 30 --output reports/load.json
+    python -m benchmarks.load_test --mix detect=1,tips=6,market=3 --requests 5000
+
+Drives ``main:app`` through httpx's ASGI transport (no sockets, no server
+process), running the app's startup and shutdown handlers around the run.
+Each of --concurrency virtual clients loops picking a scenario from the
+weighted --mix:
+
+- ``detect``: a disease-detection upload, drawn from --distinct-images
+  phone-sized JPEGs (repeats exercise the result cache, like re-uploads);
+- ``tips``: farming-tips polling that revalidates with the ETag it last saw;
+- ``market``: a market-prices query for a random crop and location;
+- ``analytics``: the user's analytics.
+
+Latency percentiles and throughput are reported per scenario and overall.
+The OFFLINE_ENVIRONMENT settings (stub models, no Redis) are applied unless
+already set; the database and external services are whatever the app is
+configured with.
+"""
+import argparse
+import asyncio
+import importlib
+import random
+import time
+from collections import Counter, defaultdict
+from typing import Any, Dict, List, Tuple
+
+from benchmarks.reporting import latency_summary, use_offline_environment, write_report
+
+use_offline_environment()
+
+CROPS = ('maize', 'beans', 'tomatoes', 'coffee', 'tea', 'potatoes')
+LOCATIONS = ('Nairobi', 'Nakuru', 'Kisumu', 'Eldoret', 'Meru', 'Mombasa')
+SEASONS = ('long_rains', 'short_rains', 'dry', None)
+
+DEFAULT_MIX = 'detect=1,tips=6,market=3'
+
+
+def parse_mix(text: str) -> Tuple[List[str], List[float]]:
+    scenarios, weights = [], []
+    for part in text.split(','):
+        name, _, weight = part.partition('=')
+        if name not in SCENARIOS:
+            raise SystemExit(f"Unknown scenario '{name}', expected one of {', '.join(SCENARIOS)}")
+        scenarios.append(name)
+        weights.append(float(weight or 1))
+    return scenarios, weights
+
+
+class Client:
+    """One virtual user: its own token, RNG and tip ETags"""
+
+    def __init__(self, http, token: str, photos: List[bytes], seed: int):
+        self.http = http
+        self.headers = {'Authorization': f'Bearer {token}'}
+        self.photos = photos
+        self.rng = random.Random(seed)
+        self.etags: Dict[Tuple[str, Any], str] = {}
+
+    async def detect(self):
+        photo = self.rng.choice(self.photos)
+        return await self.http.post(
+            '/api/v1/disease-detection', params={'crop_type': 'maize'},
+            files={'file': ('leaf.jpg', photo, 'image/jpeg')}, headers=self.headers,
+        )
+
+    async def tips(self):
+        key = (self.rng.choice(CROPS), self.rng.choice(SEASONS))
+        params = {'crop_type': key[0], **({'season': key[1]} if key[1] else {})}
+        headers = dict(self.headers)
+        if key in self.etags:
+            headers['If-None-Match'] = self.etags[key]
+        response = await self.http.get('/api/v1/farming-tips', params=params, headers=headers)
+        if 'etag' in response.headers:
+            self.etags[key] = response.headers['etag']
+        return response
+
+    async def market(self):
+        params = {'crop': self.rng.choice(CROPS), 'location': self.rng.choice(LOCATIONS)}
+        return await self.http.get('/api/v1/market-prices', params=params, headers=self.headers)
+
+    async def analytics(self):
+        return await self.http.get('/api/v1/analytics', headers=self.headers)
+
+
+SCENARIOS = ('detect', 'tips', 'market', 'analytics')
+
+
+def make_token(user_id: str) -> str:
+    from app.core.security import create_access_token
+
+    return create_access_token(data={'sub': user_id})
+
+
+async def run(args) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    import httpx
+
+    from benchmarks.bench_hot_paths import make_photos
+
+    module_name, _, attribute = args.app.partition(':')
+    app = getattr(importlib.import_module(module_name), attribute or 'app')
+    scenarios, weights = parse_mix(args.mix)
+    photos = make_photos(args.distinct_images, size=(1280, 960)) if 'detect' in scenarios else []
+
+    latencies: Dict[str, List[float]] = defaultdict(list)
+    statuses: Dict[str, Counter] = defaultdict(Counter)
+    remaining = args.requests
+    deadline = None
+
+    async def client_loop(client: Client):
+        nonlocal remaining
+        while True:
+            if args.requests:
+                if remaining <= 0:
+                    return
+                remaining -= 1
+            elif time.perf_counter() >= deadline:
+                return
+            scenario = client.rng.choices(scenarios, weights)[0]
+            started = time.perf_counter()
+            try:
+                status = (await getattr(client, scenario)()).status_code
+            except Exception as e:
+                status = type(e).__name__
+            latencies[scenario].append(time.perf_counter() - started)
+            statuses[scenario][str(status)] += 1
+
+    transport = httpx.ASGITransport(app=app)
+    async with app.router.lifespan_context(app):
+        if args.warmup:
+            await asyncio.sleep(args.warmup)
+        async with httpx.AsyncClient(transport=transport, base_url='http://loadtest', timeout=None) as http:
+            clients = [
+                Client(http, make_token(f'loadtest-{i % args.users}'), photos, seed=i)
+                for i in range(args.concurrency)
+            ]
+            started = time.perf_counter()
+            deadline = started + args.duration
+            await asyncio.gather(*(client_loop(client) for client in clients))
+            elapsed = time.perf_counter() - started
+
+    results = {scenario: latency_summary(values, elapsed) for scenario, values in sorted(latencies.items())}
+    for scenario, summary in results.items():
+        summary['status_codes'] = dict(statuses[scenario])
+    results['overall'] = latency_summary([value for values in latencies.values() for value in values], elapsed)
+    config = {
+        'app': args.app, 'mix': args.mix, 'concurrency': args.concurrency, 'users': args.users,
+        'duration_s': args.duration if not args.requests else None, 'requests': args.requests or None,
+        'distinct_images': args.distinct_images, 'elapsed_s': round(elapsed, 3),
+    }
+    return results, config
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--app', default='main:app', help='ASGI app as module:attribute')
+    parser.add_argument('--mix', default=DEFAULT_MIX, help='Weighted scenarios, e.g. detect=1,tips=6')
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--users', type=int, default=100, help='Distinct user tokens shared by the clients')
+    parser.add_argument('--duration', type=float, default=20.0, help='Seconds to run (ignored with --requests)')
+    parser.add_argument('--requests', type=int, default=0, help='Stop after this many requests instead')
+    parser.add_argument('--distinct-images', type=int, default=50)
+    parser.add_argument('--warmup', type=float, default=1.0, help='Seconds to let models load before starting')
+    parser.add_argument('--output', help='Write a JSON report here')
+    args = parser.parse_args()
+
+    results, config = asyncio.run(run(args))
+    write_report(args.output, 'load_test', results, config)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+"""
+Accuracy-regression report for the int8 disease model against the float model.
+
+Usage (from backend/):
+    python -m benchmarks.quantization_report --images ./eval --model-dir ./models --output int8_report.json
+
+--images should contain one directory per crop (maize, beans, tomatoes,
+potatoes). Images inside <crop>/<class_name>/ are treated as labelled and
+also yield float vs int8 accuracy; otherwise only agreement between the two
+models is reported. Crops without images are evaluated on random pixels and
+flagged as synthetic. The int8 model is created from the same images if it
+has not been exported yet.
+"""
+import argparse
+import json
+import logging
+import os
+import statistics
+import time
+from pathlib import Path
+
+import numpy as np
+
+from app.services.inference_backends import KerasBackend, create_backend, model_path
+from app.services.quantization import compare_predictions, find_images, load_batch, quantize_int8
+
+
+def predict_in_batches(backend, inputs: np.ndarray, batch_size: int = 32) -> np.ndarray:
+    return np.concatenate([backend.predict(inputs[i:i + batch_size]) for i in range(0, len(inputs), batch_size)])
+
+
+def mean_latency_ms(backend, batch: np.ndarray, iterations: int = 10) -> float:
+    backend.predict(batch)
+    timings = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        backend.predict(batch)
+        timings.append(time.perf_counter() - started)
+    return statistics.mean(timings) * 1000
+
+
+def crop_inputs(images_dir, crop: str, classes):
+    """Return (inputs, labels or None, synthetic flag) for one crop"""
+    crop_dir = Path(images_dir) / crop if images_dir else None
+    paths = find_images(str(crop_dir)) if crop_dir and crop_dir.is_dir() else []
+    if not paths:
+        return np.random.default_rng(0).random((32, 224, 224, 3), dtype=np.float32), None, True
+
+    labels = [p.parent.name for p in paths]
+    if all(label in classes for label in labels):
+        return load_batch(paths), np.array([classes.index(label) for label in labels]), False
+    return load_batch(paths), None, False
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--images', help='Evaluation images, one directory per crop')
+    parser.add_argument('--model-dir', default=os.getenv('MODEL_CACHE_DIR', '/tmp/agriwise-models'))
+    parser.add_argument('--output', help='Write the report as JSON')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+
+    from app.services.ai_service import AIService
+
+    service = AIService()
+    service.model_cache_dir = args.model_dir
+    float_backend = KerasBackend(service._load_keras_disease_model())
+    service._load_disease_model()  # loads the per-crop heads
+
+    int8_path = model_path(args.model_dir, service.model_version, 'tflite', precision='int8')
+    if not os.path.exists(int8_path):
+        calibration = find_images(args.images) if args.images else []
+        quantize_int8(float_backend.model, int8_path, calibration)
+    int8_backend = create_backend('tflite', int8_path)
+
+    sample = np.random.default_rng(1).random((8, 224, 224, 3), dtype=np.float32)
+    report = {
+        'model_version': service.model_version,
+        'float_model_bytes': os.path.getsize(model_path(args.model_dir, service.model_version, 'keras')),
+        'heads_bytes': service.crop_heads.nbytes(),
+        'int8_model_bytes': os.path.getsize(int8_path),
+        'float_latency_ms_batch8': mean_latency_ms(float_backend, sample),
+        'int8_latency_ms_batch8': mean_latency_ms(int8_backend, sample),
+        'crops': {},
+    }
+
+    for crop, classes in service.disease_classes.items():
+        inputs, labels, synthetic = crop_inputs(args.images, crop, classes)
+        crop_report = compare_predictions(
+            service.crop_heads.predict(predict_in_batches(float_backend, inputs), crop),
+            service.crop_heads.predict(predict_in_batches(int8_backend, inputs), crop),
+            labels
+        )
+        crop_report['synthetic'] = synthetic
+        report['crops'][crop] = crop_report
+
+    print(f"model size: float={report['float_model_bytes'] / 1e6:.2f} MB  int8={report['int8_model_bytes'] / 1e6:.2f} MB")
+    print(f"latency (batch 8): float={report['float_latency_ms_batch8']:.2f}ms  int8={report['int8_latency_ms_batch8']:.2f}ms")
+    print(f"{'crop':<10} {'n':>5} {'top1 agree':>11} {'mean |diff|':>12} {'acc drop':>9}")
+    for crop, crop_report in report['crops'].items():
+        drop = f"{crop_report['accuracy_drop']:+.3f}" if 'accuracy_drop' in crop_report else 'n/a'
+        print(
+            f"{crop:<10} {crop_report['samples']:>5} {crop_report['top1_agreement']:>11.1%} "
+            f"{crop_report['mean_abs_diff']:>12.2e} {drop:>9}{'  (synthetic)' if crop_report['synthetic'] else ''}"
+        )
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+"""
+Shared helpers for the benchmark suite: offline settings, latency
+percentiles and JSON reports that can be compared across commits with
+``python -m benchmarks.compare_reports``.
+"""
+import json
+import os
+import platform
+import subprocess
+import tempfile
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+# Settings that let AIService run on a CPU-only box without network, Redis or trained weights
+OFFLINE_ENVIRONMENT = {
+    'STUB_MODELS': 'true',
+    'RANDOM_SEED_POLICY': 'reproducible',
+    'ANALYTICS_EVENT_LOG_DIR': '',
+    'DETECTION_CACHE_REDIS': 'false',
+    'ANALYTICS_REDIS': 'false',
+    'JOB_QUEUE_BACKEND': 'local',
+}
+
+
+def use_offline_environment():
+    """Apply OFFLINE_ENVIRONMENT (keeping anything set explicitly); call before importing app modules"""
+    for name, value in OFFLINE_ENVIRONMENT.items():
+        os.environ.setdefault(name, value)
+    os.environ.setdefault('MODEL_CACHE_DIR', tempfile.mkdtemp(prefix='agriwise-bench-models-'))
+
+
+def latency_summary(latencies: Sequence[float], elapsed: Optional[float] = None) -> Dict[str, Any]:
+    """Percentiles in milliseconds, plus throughput when the wall-clock time is known"""
+    if not len(latencies):
+        return {'count': 0}
+    values = np.asarray(latencies) * 1000
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    summary = {
+        'count': int(values.size),
+        'mean_ms': round(float(values.mean()), 4),
+        'p50_ms': round(float(p50), 4),
+        'p95_ms': round(float(p95), 4),
+        'p99_ms': round(float(p99), 4),
+        'max_ms': round(float(values.max()), 4),
+    }
+    total = elapsed if elapsed is not None else float(np.sum(latencies))
+    summary['throughput_per_s'] = round(values.size / total, 2) if total > 0 else None
+    return summary
+
+
+def time_calls(fn, iterations: int, warmup: int = 3) -> Dict[str, Any]:
+    """Call fn repeatedly and summarize per-call latency"""
+    for _ in range(warmup):
+        fn()
+    latencies: List[float] = []
+    started = time.perf_counter()
+    for _ in range(iterations):
+        call_started = time.perf_counter()
+        fn()
+        latencies.append(time.perf_counter() - call_started)
+    return latency_summary(latencies, time.perf_counter() - started)
+
+
+def environment() -> Dict[str, Any]:
+    """What the numbers were measured on"""
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, timeout=5
+        ).stdout.strip() or None
+    except Exception:
+        commit = None
+    return {
+        'commit': commit,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'numpy': np.__version__,
+        'stub_models': os.getenv('STUB_MODELS', 'false').lower() == 'true',
+    }
+
+
+def write_report(path: Optional[str], suite: str, results: Dict[str, Any], config: Optional[Dict[str, Any]] = None):
+    """Print the results and, with a path, write them as a JSON report"""
+    report = {
+        'suite': suite,
+        'created_at': datetime.utcnow().isoformat(),
+        'environment': environment(),
+        'config': config or {},
+        'results': results,
+    }
+    for name, summary in results.items():
+        if summary.get('count'):
+            print(
+                f"{name:28s} n={summary['count']:<7d} p50={summary['p50_ms']:9.3f}ms "
+                f"p95={summary['p95_ms']:9.3f}ms p99={summary['p99_ms']:9.3f}ms "
+                f"{summary['throughput_per_s'] or 0:10.1f}/s"
+            )
+    if path:
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Wrote {path}")
+    return report
@@ -0,0 +1,158 @@
+"""
+Measure per-worker memory of the API under gunicorn for several worker counts.
+
+Usage (from backend/):
+    python -m benchmarks.worker_memory --workers 1 4 8 --output reports/memory.json
+    python -m benchmarks.worker_memory --workers 4 --env SHARED_WEIGHTS=false --env GUNICORN_PRELOAD=false
+
+For each worker count, starts ``gunicorn -c gunicorn.conf.py`` on a local
+port, waits until --ready-path has answered ready on enough fresh
+connections to have reached every worker (and until /health reports the
+models loaded, when it says so), lets memory settle, then reads
+``/proc/<pid>/smaps_rollup`` for the master and each worker:
+
+- RSS counts every resident page, shared or not, so it overstates the total;
+- PSS splits each shared page between the processes mapping it, so the sum
+  over processes is the real footprint;
+- USS (private pages) is what one more worker would cost.
+
+Linux only. Runs the app as configured (real models unless STUB_MODELS is
+set, in which case the numbers say little about model weights).
+"""
+import argparse
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from typing import Dict, List
+
+from benchmarks.reporting import write_report
+
+FIELDS = {'Rss': 'rss_mb', 'Pss': 'pss_mb', 'Private_Clean': 'private_clean', 'Private_Dirty': 'private_dirty'}
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def process_memory(pid: int) -> Dict[str, float]:
+    """RSS, PSS and USS of a process in MB"""
+    values = {}
+    with open(f'/proc/{pid}/smaps_rollup') as f:
+        for line in f:
+            parts = line.split()
+            if parts[0].rstrip(':') in FIELDS:
+                values[FIELDS[parts[0].rstrip(':')]] = int(parts[1]) / 1024
+    return {
+        'rss_mb': round(values['rss_mb'], 1),
+        'pss_mb': round(values['pss_mb'], 1),
+        'uss_mb': round(values['private_clean'] + values['private_dirty'], 1),
+    }
+
+
+def children(pid: int) -> List[int]:
+    with open(f'/proc/{pid}/task/{pid}/children') as f:
+        return [int(child) for child in f.read().split()]
+
+
+def is_ready(url: str) -> bool:
+    try:
+        # A new connection per request, so requests spread over the workers
+        with urllib.request.urlopen(url, timeout=5) as response:
+            body = response.read()
+    except (urllib.error.URLError, ConnectionError, socket.timeout):
+        return False
+    try:
+        return json.loads(body).get('models_ready', True) is not False
+    except (ValueError, AttributeError):
+        return True
+
+
+def wait_until_ready(server: subprocess.Popen, url: str, workers: int, timeout: float):
+    """Wait for enough consecutive ready answers that every worker has very likely been reached"""
+    deadline = time.monotonic() + timeout
+    streak = 0
+    while streak < workers * 4:
+        if server.poll() is not None:
+            raise RuntimeError(f"Server exited with code {server.returncode}, rerun with --verbose to see why")
+        if time.monotonic() > deadline:
+            raise TimeoutError(f"{url} not ready after {timeout:.0f}s")
+        if is_ready(url):
+            streak += 1
+        else:
+            streak = 0
+            time.sleep(0.5)
+
+
+def measure(args, workers: int) -> Dict[str, float]:
+    port = free_port()
+    env = dict(os.environ, WEB_CONCURRENCY=str(workers), GUNICORN_BIND=f'127.0.0.1:{port}')
+    env.update(args.overrides)
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', args.config, args.app],
+        env=env, stdout=subprocess.DEVNULL, stderr=None if args.verbose else subprocess.DEVNULL,
+    )
+    try:
+        wait_until_ready(server, f'http://127.0.0.1:{port}{args.ready_path}', workers, args.timeout)
+        time.sleep(args.settle)
+        pids = children(server.pid)
+        if len(pids) != workers:
+            raise RuntimeError(f"Expected {workers} workers, found {len(pids)}")
+        master = process_memory(server.pid)
+        per_worker = [process_memory(pid) for pid in pids]
+    finally:
+        server.send_signal(signal.SIGTERM)
+        try:
+            server.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            server.kill()
+
+    def mean(field: str) -> float:
+        return round(sum(w[field] for w in per_worker) / workers, 1)
+
+    return {
+        'workers': workers,
+        'worker_rss_mb': mean('rss_mb'),
+        'worker_pss_mb': mean('pss_mb'),
+        'worker_uss_mb': mean('uss_mb'),
+        'master_rss_mb': master['rss_mb'],
+        'total_rss_mb': round(master['rss_mb'] + sum(w['rss_mb'] for w in per_worker), 1),
+        'total_pss_mb': round(master['pss_mb'] + sum(w['pss_mb'] for w in per_worker), 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 4, 8])
+    parser.add_argument('--app', default='main:app')
+    parser.add_argument('--config', default='gunicorn.conf.py')
+    parser.add_argument('--ready-path', default='/health')
+    parser.add_argument('--timeout', type=float, default=600, help='Seconds to wait for models to load')
+    parser.add_argument('--settle', type=float, default=5, help='Seconds to wait after ready before measuring')
+    parser.add_argument('--env', action='append', default=[], help='NAME=value set for the server, repeatable')
+    parser.add_argument('--verbose', action='store_true', help='Show the server log')
+    parser.add_argument('--output', help='Write a JSON report here')
+    args = parser.parse_args()
+    args.overrides = dict(item.split('=', 1) for item in args.env)
+
+    results = {}
+    print(f"{'workers':>7s} {'RSS/worker':>11s} {'PSS/worker':>11s} {'USS/worker':>11s} {'total RSS':>10s} {'total PSS':>10s}")
+    for workers in args.workers:
+        result = results[f'workers_{workers}'] = measure(args, workers)
+        print(
+            f"{workers:7d} {result['worker_rss_mb']:9.1f}MB {result['worker_pss_mb']:9.1f}MB "
+            f"{result['worker_uss_mb']:9.1f}MB {result['total_rss_mb']:8.1f}MB {result['total_pss_mb']:8.1f}MB"
+        )
+
+    write_report(args.output, 'worker_memory', results, config={'app': args.app, 'env': args.overrides})
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,51 @@
+"""
+Gunicorn settings for serving with several worker processes.
+
+Usage (from backend/):
+    gunicorn -c gunicorn.conf.py main:app
+    WEB_CONCURRENCY=8 gunicorn -c gunicorn.conf.py main:app
+
+Memory is shared between workers in two ways:
+
+- The app and the libraries in GUNICORN_PRELOAD_MODULES are imported once
+  in the master before it forks (GUNICORN_PRELOAD=true), so their code and
+  module-level data are shared copy-on-write. The collector is frozen
+  before forking so it doesn't copy those pages by touching their objects.
+- Text model weights are memory-mapped from the model cache
+  (SHARED_WEIGHTS=true, the default here), so every worker reads the same
+  page-cache pages.
+
+Models themselves still load in each worker after the fork, since the
+TensorFlow and PyTorch thread pools don't survive it. Measure the effect
+with ``python -m benchmarks.worker_memory``.
+"""
+import gc
+import importlib
+import logging
+import multiprocessing
+import os
+
+os.environ.setdefault('SHARED_WEIGHTS', 'true')
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:8000')
+workers = int(os.getenv('WEB_CONCURRENCY', str(min(4, multiprocessing.cpu_count()))))
+worker_class = 'uvicorn.workers.UvicornWorker'
+preload_app = os.getenv('GUNICORN_PRELOAD', 'true').lower() == 'true'
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '120'))
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', '30'))
+keepalive = 5
+
+# Imported in the master; TensorFlow is left out because it isn't fork-safe once initialized
+preload_modules = [name for name in os.getenv('GUNICORN_PRELOAD_MODULES', 'transformers').split(',') if name]
+
+
+def when_ready(server):
+    """Runs in the master after the app is loaded, before the first worker is forked"""
+    if not preload_app:
+        return
+    for name in preload_modules:
+        try:
+            importlib.import_module(name)
+        except ImportError as e:
+            logging.getLogger('gunicorn.error').warning(f"Could not preload {name}: {str(e)}")
+    gc.freeze()
@@ -1,11 +1,13 @@
-from fastapi import FastAPI, HTTPException, Depends, UploadFile, File, BackgroundTasks
+from fastapi import FastAPI, HTTPException, Depends, UploadFile, File, BackgroundTasks, Header, Body, WebSocket
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from fastapi.responses import JSONResponse
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 import uvicorn
 import os
 import logging
+import asyncio
 from typing import List, Optional
 import json
 from datetime import datetime, timedelta
@@ -16,8 +18,24 @@ from app.core.database import engine, SessionLocal
 from app.models import models
 from app.schemas import schemas
 from app.api.v1.api import api_router
-from app.core.security import create_access_token, verify_token
+from app.core.security import create_access_token
+from app.core.metrics import MetricsMiddleware, render_latest, span
+from app.core.token_cache import VerifiedTokenCache
 from app.services.ai_service import AIService
+from app.services.farming_tips import etag_matches
+from app.services.forecast_cache import ForecastCache
+from app.services.job_queue import InvalidJobError, JobServices, create_job_queue
+from app.services.loan_scoring import read_applicant_file
+from app.services.market_store import MarketDataEngine
+from app.services.model_registry import ModelNotReadyError
+from app.services.voice_streaming import (
+    TRY_AGAIN_LATER, VoiceStreamManager, handshake_token, receive_auth_token
+)
+from app.services.upload_ingestion import (
+    MAX_AUDIO_BYTES, MAX_BATCH_BYTES, MAX_IMAGE_BYTES, RequestSizeLimitMiddleware, UploadRejected,
+    ingest_batch, ingest_upload
+)
+from app.services.worker_pool import PoolSaturatedError
 from app.services.weather_service import WeatherService
 from app.services.market_service import MarketService
 from app.services.voice_service import VoiceService
@@ -47,14 +65,45 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Reject oversized uploads from Content-Length before the multipart body is spooled
+# (slack covers the multipart framing and form fields around the file)
+UPLOAD_BODY_SLACK = 64 * 1024
+MAX_LOAN_FILE_BYTES = int(os.getenv("MAX_LOAN_FILE_BYTES", str(100 * 1024 * 1024)))
+app.add_middleware(
+    RequestSizeLimitMiddleware,
+    limits={
+        "/api/v1/disease-detection": MAX_IMAGE_BYTES + UPLOAD_BODY_SLACK,
+        "/api/v1/disease-detection/batch": MAX_BATCH_BYTES + UPLOAD_BODY_SLACK,
+        "/api/v1/voice-assistant": MAX_AUDIO_BYTES + UPLOAD_BODY_SLACK,
+        "/api/v1/loan-assessment/bulk-file": MAX_LOAN_FILE_BYTES + UPLOAD_BODY_SLACK,
+    },
+)
+
+# Request count, latency and in-flight metrics per route; outermost, so rejected requests count too
+app.add_middleware(MetricsMiddleware)
+
+# Tips are per-user authenticated responses; let clients reuse them briefly, then revalidate
+FARMING_TIPS_CACHE_CONTROL = f"private, max-age={os.getenv('FARMING_TIPS_MAX_AGE', '60')}"
+
+MAX_BULK_TEXTS = int(os.getenv("NLP_BULK_MAX_TEXTS", "10000"))
+
 # Security
 security = HTTPBearer()
+# Tokens are signature-checked once, then served from cache until they expire
+token_cache = VerifiedTokenCache.from_env()
 
 # Initialize services
 ai_service = AIService()
 weather_service = WeatherService()
+# Forecasts are shared per location (or geohash cell) until the provider's next update
+weather_cache = ForecastCache.from_env(weather_service.get_forecast)
 market_service = MarketService()
+# Price history served from memory when a price file is configured (MARKET_PRICES_PATH)
+market_engine = MarketDataEngine.from_env()
 voice_service = VoiceService()
+# Live voice commands over WebSocket, capped per worker (VOICE_STREAM_MAX_CONCURRENT)
+voice_streams = VoiceStreamManager.from_env()
+job_queue = create_job_queue(JobServices(ai_service, voice_service))
 
 # Dependency to get database session
 def get_db():
@@ -67,7 +116,7 @@ def get_db():
 # Dependency to get current user
 async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
     try:
-        payload = verify_token(credentials.credentials)
+        payload = token_cache.verify(credentials.credentials)
         user_id: str = payload.get("sub")
         if user_id is None:
             raise HTTPException(status_code=401, detail="Invalid token")
@@ -75,6 +124,28 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
     except Exception as e:
         raise HTTPException(status_code=401, detail="Invalid token")
 
+def ndjson_response(records) -> StreamingResponse:
+    """Stream an async iterator of dicts as newline-delimited JSON"""
+    async def lines():
+        async for record in records:
+            yield json.dumps(record) + "\n"
+    
+    # Tell nginx to pass each line on as it is produced instead of buffering the response
+    return StreamingResponse(lines(), media_type="application/x-ndjson", headers={"X-Accel-Buffering": "no"})
+
+def job_accepted(job: dict) -> JSONResponse:
+    """202 response for work queued with async_mode"""
+    return JSONResponse(
+        status_code=202,
+        content={
+            "success": True,
+            "job_id": job["job_id"],
+            "status": job["status"],
+            "status_url": f"/api/v1/jobs/{job['job_id']}",
+            "timestamp": datetime.utcnow().isoformat()
+        }
+    )
+
 # Include API routes
 app.include_router(api_router, prefix="/api/v1")
 
@@ -85,7 +156,9 @@ async def health_check():
         "status": "healthy",
         "timestamp": datetime.utcnow(),
         "version": "1.0.0",
-        "service": "AGRIWISE AI Backend"
+        "service": "AGRIWISE AI Backend",
+        "models_ready": ai_service.models_loaded,
+        "models": ai_service.get_model_status()
     }
 
 # Root endpoint
@@ -104,32 +177,95 @@ async def root():
 async def detect_disease(
     file: UploadFile = File(...),
     crop_type: str = "maize",
+    compare_crops: Optional[str] = None,
+    async_mode: bool = False,
+    callback_url: Optional[str] = None,
+    priority: Optional[str] = None,
     current_user: str = Depends(get_current_user)
 ):
     """
-    Detect crop diseases using AI
+    Detect crop diseases using AI.
+    
+    compare_crops is an optional comma-separated list of other crops to score
+    the same image against. With async_mode the image is queued and a job ID
+    is returned; poll /api/v1/jobs/{job_id} or pass a callback_url.
     """
     try:
-        # Validate file type
-        if not file.content_type.startswith("image/"):
-            raise HTTPException(status_code=400, detail="File must be an image")
+        extra_crops = [c.strip() for c in compare_crops.split(",")] if compare_crops else None
+        
+        if async_mode:
+            upload = await ingest_upload(file, kind='image')
+            job = await job_queue.enqueue(
+                'disease_detection', {'crop_type': crop_type, 'compare_crops': extra_crops}, current_user,
+                blob=upload.view, priority=priority, callback_url=callback_url
+            )
+            return job_accepted(job)
         
-        # Process image with AI
-        result = await ai_service.detect_disease(file, crop_type)
+        # Process image with AI; the upload is size- and format-checked while it streams in
+        result = await ai_service.detect_disease(file, crop_type, extra_crops, user_id=current_user)
         
         # Log the detection
         logger.info(f"Disease detection completed for user {current_user}, crop: {crop_type}")
         
-        return {
-            "success": True,
-            "result": result,
-            "timestamp": datetime.utcnow()
-        }
+        with span("serialize"):
+            return JSONResponse(jsonable_encoder({
+                "success": True,
+                "result": result,
+                "timestamp": datetime.utcnow()
+            }))
     
+    except HTTPException:
+        raise
+    except UploadRejected as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    except InvalidJobError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except PoolSaturatedError as e:
+        raise HTTPException(
+            status_code=503,
+            detail="Server busy processing images, please retry",
+            headers={"Retry-After": str(e.retry_after)}
+        )
+    except ModelNotReadyError as e:
+        raise HTTPException(
+            status_code=503,
+            detail="Disease detection model is still loading, please retry",
+            headers={"Retry-After": str(e.retry_after)}
+        )
     except Exception as e:
         logger.error(f"Error in disease detection: {str(e)}")
         raise HTTPException(status_code=500, detail="Error processing image")
 
+# Batch Disease Detection Endpoint
+@app.post("/api/v1/disease-detection/batch")
+async def detect_disease_batch(
+    files: List[UploadFile] = File(...),
+    crop_type: str = "maize",
+    current_user: str = Depends(get_current_user)
+):
+    """
+    Detect crop diseases in many images (or zip archives of images) at once.
+    
+    Streams NDJSON: one "result" or "error" line per image as it completes,
+    then a "summary" line with the field-level disease prevalence.
+    """
+    try:
+        # Read everything up front; the uploads are closed once this handler returns
+        images = await ingest_batch(files)
+        await ai_service.wait_for_disease_model()
+    except UploadRejected as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    except ModelNotReadyError as e:
+        raise HTTPException(
+            status_code=503,
+            detail="Disease detection model is still loading, please retry",
+            headers={"Retry-After": str(e.retry_after)}
+        )
+    
+    logger.info(f"Batch disease detection of {len(images)} images for user {current_user}, crop: {crop_type}")
+    
+    return ndjson_response(ai_service.detect_disease_batch(images, crop_type, user_id=current_user))
+
 # Weather Forecast Endpoint
 @app.get("/api/v1/weather/{location}")
 async def get_weather_forecast(
@@ -140,7 +276,7 @@ async def get_weather_forecast(
     Get weather forecast for a specific location
     """
     try:
-        weather_data = await weather_service.get_forecast(location)
+        weather_data = await weather_cache.get(location)
         return {
             "success": True,
             "location": location,
@@ -162,7 +298,10 @@ async def get_market_prices(
     Get current market prices for crops
     """
     try:
-        prices = await market_service.get_prices(crop, location)
+        if market_engine is not None:
+            prices = market_engine.store.query(crop, location)
+        else:
+            prices = await market_service.get_prices(crop, location)
         return {
             "success": True,
             "prices": prices,
@@ -172,23 +311,57 @@ async def get_market_prices(
         logger.error(f"Error getting market prices: {str(e)}")
         raise HTTPException(status_code=500, detail="Error fetching market data")
 
+@app.get("/api/v1/market-prices/history")
+async def get_market_price_history(
+    crop: str,
+    location: str,
+    days: int = 30,
+    current_user: str = Depends(get_current_user)
+):
+    """
+    Daily prices of a crop at one market, with its 7- and 30-day averages
+    """
+    if market_engine is None:
+        raise HTTPException(status_code=404, detail="Price history is not available")
+    
+    latest = market_engine.store.latest(crop, location)
+    if latest is None:
+        raise HTTPException(status_code=404, detail="No prices for this crop and market")
+    return {
+        "success": True,
+        "latest": latest,
+        "history": market_engine.store.history(crop, location, days),
+        "timestamp": datetime.utcnow()
+    }
+
 # Voice Assistant Endpoint
 @app.post("/api/v1/voice-assistant")
 async def process_voice_command(
     audio_file: UploadFile = File(...),
     language: str = "swahili",
+    async_mode: bool = False,
+    callback_url: Optional[str] = None,
+    priority: Optional[str] = None,
     current_user: str = Depends(get_current_user)
 ):
     """
     Process voice commands in local languages
     """
     try:
-        # Validate audio file
-        if not audio_file.content_type.startswith("audio/"):
-            raise HTTPException(status_code=400, detail="File must be an audio file")
+        # Validate size and container format from the first bytes; the recognizer reads the same buffer
+        upload = await ingest_upload(audio_file, kind='audio')
+        # Drop the spooled copy of the upload now rather than after the response
+        await audio_file.close()
+        
+        if async_mode:
+            job = await job_queue.enqueue(
+                'voice_command', {'language': language, 'filename': audio_file.filename}, current_user,
+                blob=upload.view, priority=priority, callback_url=callback_url
+            )
+            return job_accepted(job)
         
         # Process voice command
-        response = await voice_service.process_voice(audio_file, language)
+        response = await voice_service.process_voice(upload.as_upload_file(audio_file.filename), language)
         
         return {
             "success": True,
@@ -196,50 +369,199 @@ async def process_voice_command(
             "language": language,
             "timestamp": datetime.utcnow()
         }
+    except UploadRejected as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    except InvalidJobError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Error processing voice command: {str(e)}")
         raise HTTPException(status_code=500, detail="Error processing voice command")
 
+@app.websocket("/api/v1/voice-assistant/stream")
+async def stream_voice_command(
+    websocket: WebSocket,
+    language: str = "swahili",
+    sample_rate: int = 16000,
+    encoding: str = "pcm16"
+):
+    """
+    Stream a voice command as it is recorded: send mono 16-bit PCM (or
+    encoding=mulaw) as binary messages and {"type": "end"} when done; partial transcripts and the
+    intent come back as JSON events (see app/services/voice_streaming.py).
+    Authenticate with an Authorization header, the subprotocols
+    ['bearer', <token>], or a first message {"type": "auth", "token": ...}.
+    """
+    def verify(token: Optional[str]) -> Optional[str]:
+        try:
+            return token_cache.verify(token).get("sub") if token else None
+        except Exception:
+            return None
+    
+    token, subprotocol = handshake_token(websocket.headers)
+    user_id = verify(token)
+    if token is not None and user_id is None:
+        # Closing before accept rejects the handshake with 403
+        await websocket.close(code=1008)
+        return
+    
+    await websocket.accept(subprotocol=subprotocol)
+    if user_id is None:
+        user_id = verify(await receive_auth_token(websocket))
+        if user_id is None:
+            await websocket.close(code=1008, reason="Authentication required")
+            return
+    
+    if not voice_streams.try_acquire():
+        await websocket.close(code=TRY_AGAIN_LATER, reason="Too many voice streams, please retry")
+        return
+    
+    logger.info(f"Voice stream opened for user {user_id}, language: {language}")
+    await voice_streams.serve(websocket, language, sample_rate, encoding)
+
 # Loan Assessment Endpoint
 @app.post("/api/v1/loan-assessment")
 async def assess_loan_eligibility(
     assessment_data: schemas.LoanAssessmentRequest,
+    async_mode: bool = False,
+    callback_url: Optional[str] = None,
+    priority: Optional[str] = None,
     current_user: str = Depends(get_current_user)
 ):
     """
     Assess loan eligibility using AI
     """
     try:
+        if async_mode:
+            job = await job_queue.enqueue(
+                'loan_assessment', assessment_data.dict(), current_user,
+                priority=priority, callback_url=callback_url
+            )
+            return job_accepted(job)
+        
         # Process loan assessment
-        result = await ai_service.assess_loan(assessment_data)
+        result = await ai_service.assess_loan(assessment_data, user_id=current_user)
         
         return {
             "success": True,
             "assessment": result,
             "timestamp": datetime.utcnow()
         }
+    except InvalidJobError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Error in loan assessment: {str(e)}")
         raise HTTPException(status_code=500, detail="Error processing loan assessment")
 
+# Bulk Loan Assessment Endpoints
+@app.post("/api/v1/loan-assessment/bulk")
+async def assess_loans_bulk(
+    applicants: List[schemas.LoanAssessmentRequest],
+    current_user: str = Depends(get_current_user)
+):
+    """
+    Assess many loan applicants at once, streaming NDJSON results
+    """
+    logger.info(f"Bulk loan assessment of {len(applicants)} applicants for user {current_user}")
+    return ndjson_response(ai_service.assess_loans_bulk(applicants))
+
+@app.post("/api/v1/loan-assessment/bulk-file")
+async def assess_loan_file(
+    file: UploadFile = File(...),
+    current_user: str = Depends(get_current_user)
+):
+    """
+    Assess every applicant in a CSV or Parquet file (one column per
+    LoanAssessmentRequest field, plus an optional applicant_id), streaming
+    NDJSON results
+    """
+    try:
+        data = await file.read()
+        applicants = await asyncio.to_thread(read_applicant_file, data)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error reading loan applicant file: {str(e)}")
+        raise HTTPException(status_code=400, detail="Could not parse applicant file, send CSV or Parquet")
+    
+    logger.info(f"Bulk loan assessment of {len(applicants)} applicants from {file.filename} for user {current_user}")
+    return ndjson_response(ai_service.assess_loans_bulk(applicants))
+
+# Text Analysis Endpoints
+@app.post("/api/v1/text-analysis")
+async def analyze_text(
+    text: str = Body(..., embed=True),
+    model: str = "sentiment",
+    current_user: str = Depends(get_current_user)
+):
+    """
+    Classify one text with the sentiment or classification model
+    """
+    try:
+        result = await ai_service.classify_text(text, model)
+        return {
+            "success": True,
+            "model": model,
+            "classification": result,
+            "timestamp": datetime.utcnow()
+        }
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except ModelNotReadyError as e:
+        raise HTTPException(
+            status_code=503,
+            detail="Text model is still loading, please retry",
+            headers={"Retry-After": str(e.retry_after)}
+        )
+    except Exception as e:
+        logger.error(f"Error in text analysis: {str(e)}")
+        raise HTTPException(status_code=500, detail="Error analyzing text")
+
+@app.post("/api/v1/text-analysis/bulk")
+async def analyze_texts_bulk(
+    texts: List[str] = Body(..., embed=True),
+    model: str = "sentiment",
+    current_user: str = Depends(get_current_user)
+):
+    """
+    Classify many texts at once, streaming NDJSON results
+    """
+    if len(texts) > MAX_BULK_TEXTS:
+        raise HTTPException(status_code=413, detail=f"At most {MAX_BULK_TEXTS} texts per request")
+    try:
+        await ai_service.wait_for_text_model(model)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except ModelNotReadyError as e:
+        raise HTTPException(
+            status_code=503,
+            detail="Text model is still loading, please retry",
+            headers={"Retry-After": str(e.retry_after)}
+        )
+    
+    logger.info(f"Bulk text analysis of {len(texts)} texts for user {current_user}, model: {model}")
+    return ndjson_response(ai_service.classify_texts_bulk(texts, model))
+
 # Farming Tips Endpoint
 @app.get("/api/v1/farming-tips")
 async def get_farming_tips(
     crop_type: Optional[str] = None,
     season: Optional[str] = None,
+    if_none_match: Optional[str] = Header(None),
     current_user: str = Depends(get_current_user)
 ):
     """
     Get personalized farming tips
+    
+    Responses are precomputed per crop/season and carry an ETag; clients
+    sending it back in If-None-Match get 304 Not Modified.
     """
     try:
-        tips = await ai_service.get_farming_tips(crop_type, season)
+        entry = ai_service.farming_tips.lookup(crop_type, season)
+        headers = {"ETag": entry.etag, "Cache-Control": FARMING_TIPS_CACHE_CONTROL}
         
-        return {
-            "success": True,
-            "tips": tips,
-            "timestamp": datetime.utcnow()
-        }
+        if etag_matches(if_none_match, entry.etag):
+            return Response(status_code=304, headers=headers)
+        return Response(content=entry.body, media_type="application/json", headers=headers)
     except Exception as e:
         logger.error(f"Error getting farming tips: {str(e)}")
         raise HTTPException(status_code=500, detail="Error fetching farming tips")
@@ -264,6 +586,71 @@ async def get_analytics(
         logger.error(f"Error getting analytics: {str(e)}")
         raise HTTPException(status_code=500, detail="Error fetching analytics")
 
+# Prometheus Metrics Endpoint
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """
+    Request, stage and model metrics in the Prometheus text format
+    """
+    body, content_type = render_latest()
+    return Response(body, media_type=content_type)
+
+# Job Status Endpoint
+@app.get("/api/v1/jobs/{job_id}")
+async def get_job(
+    job_id: str,
+    current_user: str = Depends(get_current_user)
+):
+    """
+    Status and result of work queued with async_mode
+    """
+    job = await job_queue.get(job_id)
+    if job is None or job["user_id"] != current_user:
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    return {
+        "success": True,
+        "job": job,
+        "timestamp": datetime.utcnow()
+    }
+
+# Logout Endpoint
+@app.post("/api/v1/auth/logout")
+async def logout(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    current_user: str = Depends(get_current_user)
+):
+    """
+    Revoke the presented token in every worker
+    """
+    try:
+        token_cache.revoke(credentials.credentials)
+    except Exception as e:
+        logger.error(f"Error revoking token: {str(e)}")
+        raise HTTPException(status_code=503, detail="Could not log out, please retry")
+    return {
+        "success": True,
+        "message": "Logged out",
+        "timestamp": datetime.utcnow()
+    }
+
+# Inference Metrics Endpoint
+@app.get("/api/v1/inference/stats")
+async def get_inference_stats(
+    current_user: str = Depends(get_current_user)
+):
+    """
+    Get inference batching, auth cache, weather cache and voice stream metrics
+    """
+    return {
+        "success": True,
+        "stats": ai_service.get_inference_stats(),
+        "auth": token_cache.stats(),
+        "weather_cache": weather_cache.stats(),
+        "voice_streams": voice_streams.stats(),
+        "timestamp": datetime.utcnow()
+    }
+
 # Error handlers
 @app.exception_handler(HTTPException)
 async def http_exception_handler(request, exc):
@@ -272,8 +659,9 @@ async def http_exception_handler(request, exc):
         content={
             "success": False,
             "error": exc.detail,
-            "timestamp": datetime.utcnow()
-        }
+            "timestamp": datetime.utcnow().isoformat()
+        },
+        headers=getattr(exc, "headers", None)
     )
 
 @app.exception_handler(Exception)
@@ -284,7 +672,7 @@ async def general_exception_handler(request, exc):
         content={
             "success": False,
             "error": "Internal server error",
-            "timestamp": datetime.utcnow()
+            "timestamp": datetime.utcnow().isoformat()
         }
     )
 
@@ -294,15 +682,27 @@ async def startup_event():
     logger.info("Starting AGRIWISE AI Backend...")
     logger.info("Initializing AI services...")
     
-    # Initialize AI models
+    # Start loading AI models in the background; endpoints report 503 until
+    # the model they need is ready
     await ai_service.initialize_models()
     
+    # Load price history and keep appending new observations
+    if market_engine is not None:
+        await market_engine.start()
+    
     logger.info("AGRIWISE AI Backend started successfully!")
 
 # Shutdown event
 @app.on_event("shutdown")
 async def shutdown_event():
     logger.info("Shutting down AGRIWISE AI Backend...")
+    
+    # Stop inference workers
+    await job_queue.close()
+    await weather_cache.close()
+    if market_engine is not None:
+        await market_engine.close()
+    await ai_service.shutdown()
 
 if __name__ == "__main__":
     uvicorn.run(
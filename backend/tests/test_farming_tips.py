@@ -0,0 +1,85 @@
+"""
+Farming tips are served from precomputed responses with a stable ETag, and
+a client sending it back in If-None-Match gets 304 Not Modified.
+"""
+import json
+import os
+
+import pytest
+
+from app.services.farming_tips import FarmingTipsIndex, etag_matches
+
+TIPS = {
+    'seasons': ['long_rains', 'dry'],
+    'tips': [
+        {'title': 'Soil Health', 'applicable_crops': ['all'], 'applicable_seasons': ['all']},
+        {'title': 'Maize Spacing', 'applicable_crops': ['maize'], 'applicable_seasons': ['long_rains']},
+    ],
+}
+
+
+@pytest.fixture
+def tips_path(tmp_path):
+    path = tmp_path / 'farming_tips.json'
+    path.write_text(json.dumps(TIPS))
+    return path
+
+
+@pytest.mark.parametrize('header,matches', [
+    (None, False),
+    ('', False),
+    ('"abc"', True),
+    ('W/"abc"', True),
+    ('"other", "abc"', True),
+    ('*', True),
+    ('"abcd"', False),
+])
+def test_etag_matches(header, matches):
+    assert etag_matches(header, '"abc"') is matches
+
+
+def test_lookup_is_precomputed_and_stable(tips_path):
+    index = FarmingTipsIndex(str(tips_path))
+    entry = index.lookup(' Maize ', 'LONG_RAINS')
+    assert [tip['title'] for tip in entry.tips] == ['Soil Health', 'Maize Spacing']
+    assert index.lookup('maize', 'long_rains') is entry
+    assert json.loads(entry.body)['tips'] == entry.tips
+    # Unknown crops get the general tips
+    assert [tip['title'] for tip in index.lookup('cassava').tips] == ['Soil Health']
+    assert index.lookup('cassava').etag != entry.etag
+
+
+def test_etag_changes_when_the_file_changes(tips_path):
+    index = FarmingTipsIndex(str(tips_path), check_interval=0)
+    before = index.lookup('maize').etag
+
+    changed = dict(TIPS, tips=TIPS['tips'] + [{'title': 'Mulching', 'applicable_crops': ['all']}])
+    tips_path.write_text(json.dumps(changed))
+    stat = os.stat(tips_path)
+    os.utime(tips_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+
+    after = index.lookup('maize')
+    assert after.etag != before
+    assert not etag_matches(before, after.etag)
+    assert 'Mulching' in [tip['title'] for tip in after.tips]
+
+
+def test_endpoint_returns_304_for_a_matching_etag():
+    # main imports the app's settings and database modules
+    pytest.importorskip('app.core.config')
+    from fastapi.testclient import TestClient
+
+    import main
+
+    main.app.dependency_overrides[main.get_current_user] = lambda: 'farmer'
+    try:
+        client = TestClient(main.app)
+        first = client.get('/api/v1/farming-tips', params={'crop_type': 'maize'})
+        repeat = client.get('/api/v1/farming-tips', params={'crop_type': 'maize'},
+                            headers={'If-None-Match': first.headers['ETag']})
+    finally:
+        main.app.dependency_overrides.clear()
+    assert first.status_code == 200
+    assert repeat.status_code == 304
+    assert repeat.content == b''
+    assert repeat.headers['ETag'] == first.headers['ETag']
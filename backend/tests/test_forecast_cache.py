@@ -0,0 +1,140 @@
+"""
+Forecast cache: concurrent misses share one upstream call, and expired
+entries are served stale while a single background refresh runs.
+"""
+import asyncio
+
+from app.services.forecast_cache import ForecastCache, normalize_location
+
+
+class Clock:
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def make_cache(clock, fetch, **kwargs):
+    return ForecastCache(fetch, update_interval=600, publish_delay=0, stale_seconds=1800,
+                         refresh_ahead=0, clock=clock, **kwargs)
+
+
+def test_concurrent_misses_share_one_fetch():
+    calls = []
+
+    async def fetch(query):
+        calls.append(query)
+        await asyncio.sleep(0.01)
+        return {'location': query}
+
+    async def run():
+        cache = make_cache(Clock(), fetch)
+        results = await asyncio.gather(*(cache.get(name) for name in ('Nakuru', 'nakuru', ' NAKURU, Kenya ') * 10))
+        return cache, results
+
+    cache, results = asyncio.run(run())
+    assert len(calls) == 1
+    assert all(result is results[0] for result in results)
+    assert cache.misses == 30
+    assert cache.coalesced == 29
+
+
+def test_cancelled_caller_does_not_cancel_the_shared_fetch():
+    calls = []
+
+    async def fetch(query):
+        calls.append(query)
+        await asyncio.sleep(0.02)
+        return query
+
+    async def run():
+        cache = make_cache(Clock(), fetch)
+        first = asyncio.ensure_future(cache.get('Eldoret'))
+        second = asyncio.ensure_future(cache.get('Eldoret'))
+        await asyncio.sleep(0.005)
+        first.cancel()
+        return await second
+
+    assert asyncio.run(run()) == 'Eldoret'
+    assert len(calls) == 1
+
+
+def test_stale_entry_is_served_while_one_refresh_runs():
+    clock = Clock(1000.0)
+    versions = iter(range(1, 10))
+    release = None
+
+    async def fetch(query):
+        if release is not None:
+            await release.wait()
+        return next(versions)
+
+    async def run():
+        nonlocal release
+        cache = make_cache(clock, fetch)
+        assert await cache.get('Kisumu') == 1
+
+        # Past the provider update (fresh until 1200) but inside the stale window
+        clock.now = 1300.0
+        release = asyncio.Event()
+        stale = [await cache.get('Kisumu') for _ in range(5)]
+        await asyncio.sleep(0)
+        assert cache.background_refreshes == 1
+        assert cache.upstream_calls == 2
+
+        release.set()
+        await asyncio.sleep(0)
+        await asyncio.sleep(0)
+        return cache, stale, await cache.get('Kisumu')
+
+    cache, stale, refreshed = asyncio.run(run())
+    assert stale == [1] * 5
+    assert cache.stale_hits == 5
+    assert refreshed == 2
+
+
+def test_expired_past_the_stale_window_blocks_on_a_fetch():
+    clock = Clock(1000.0)
+    versions = iter(range(1, 10))
+
+    async def fetch(query):
+        return next(versions)
+
+    async def run():
+        cache = make_cache(clock, fetch)
+        await cache.get('Kisumu')
+        clock.now = 1200.0 + 1800.0 + 1
+        return cache, await cache.get('Kisumu')
+
+    cache, value = asyncio.run(run())
+    assert value == 2
+    assert cache.misses == 2
+    assert cache.stale_hits == 0
+
+
+def test_provider_failure_serves_the_last_forecast():
+    clock = Clock(1000.0)
+    failing = False
+
+    async def fetch(query):
+        if failing:
+            raise ConnectionError('provider down')
+        return 'forecast'
+
+    async def run():
+        nonlocal failing
+        cache = make_cache(clock, fetch)
+        await cache.get('Meru')
+        clock.now = 1200.0 + 1800.0 + 1
+        failing = True
+        return cache, await cache.get('Meru')
+
+    cache, value = asyncio.run(run())
+    assert value == 'forecast'
+    assert cache.served_on_error == 1
+
+
+def test_nearby_coordinates_share_a_geohash_key():
+    assert normalize_location('-0.3031,36.0800', 5)[0] == normalize_location('-0.3040,36.0810', 5)[0]
+    assert normalize_location('-0.3031,36.0800', 5)[0] != normalize_location('-1.2921,36.8219', 5)[0]
@@ -0,0 +1,73 @@
+"""
+Uploads are decoded at reduced resolution where the format allows and
+always come out as (224, 224, 3) uint8 pixels, oriented per EXIF.
+"""
+import io
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from app.services.image_preprocessing import (
+    EXIF_ORIENTATION, MODEL_INPUT_SIZE, TensorBuffer, decode_image, preprocess_image
+)
+
+
+def encode(image: Image.Image, format: str, orientation: int = 1) -> bytes:
+    buffer = io.BytesIO()
+    options = {}
+    if orientation != 1:
+        exif = Image.Exif()
+        exif[EXIF_ORIENTATION] = orientation
+        options['exif'] = exif
+    image.save(buffer, format, **options)
+    return buffer.getvalue()
+
+
+def gradient(width: int, height: int) -> Image.Image:
+    x = np.linspace(0, 255, width, dtype=np.uint8)
+    y = np.linspace(0, 255, height, dtype=np.uint8)
+    red, green = np.meshgrid(x, y)
+    return Image.fromarray(np.stack([red, green, np.full_like(red, 128)], axis=-1))
+
+
+def test_large_jpeg_is_draft_decoded_above_the_model_size():
+    image, orientation = decode_image(encode(gradient(2000, 1500), 'JPEG'))
+    assert orientation == 1
+    assert image.mode == 'RGB'
+    assert image.width < 2000 and image.height < 1500
+    assert image.width >= MODEL_INPUT_SIZE[0] and image.height >= MODEL_INPUT_SIZE[1]
+
+
+@pytest.mark.parametrize('format,mode', [('JPEG', 'RGB'), ('PNG', 'RGB'), ('PNG', 'L'), ('PNG', 'RGBA')])
+def test_preprocess_output_shape(format, mode):
+    data = encode(gradient(640, 480).convert(mode), format)
+    pixels, phash, timings = preprocess_image(data)
+    assert pixels.shape == (224, 224, 3)
+    assert pixels.dtype == np.uint8
+    assert 0 <= phash < 2 ** 64
+    assert set(timings) == {'decode', 'resize', 'hash'}
+
+
+def test_draft_decode_matches_full_decode():
+    data = encode(gradient(1600, 1200), 'JPEG')
+    fast, _, _ = preprocess_image(data)
+    full = np.asarray(Image.open(io.BytesIO(data)).convert('RGB').resize(MODEL_INPUT_SIZE, Image.Resampling.BILINEAR))
+    assert np.abs(fast.astype(int) - full.astype(int)).mean() < 3
+
+
+def test_exif_orientation_is_applied():
+    # Orientation 6: stored landscape, displayed rotated 90 degrees clockwise
+    image = gradient(400, 300)
+    upright, _, _ = preprocess_image(encode(image, 'JPEG'))
+    rotated, _, _ = preprocess_image(encode(image, 'JPEG', orientation=6))
+    assert np.abs(rotated.astype(int) - np.rot90(upright, -1).astype(int)).mean() < 3
+
+
+def test_tensor_buffer_normalizes_into_slots():
+    buffer = TensorBuffer(2)
+    pixels, _, _ = preprocess_image(encode(gradient(300, 300), 'PNG'))
+    buffer.fill(1, pixels)
+    batch = buffer.view(2)
+    assert batch.shape == (2, 224, 224, 3) and batch.dtype == np.float32
+    np.testing.assert_allclose(batch[1], pixels / 255.0, atol=1e-6)
@@ -0,0 +1,82 @@
+"""
+Concurrent requests are grouped into one model call, flushed when the
+batch is full or the oldest request has waited max_wait_ms, and every
+caller gets its own row back (or the batch's error).
+"""
+import asyncio
+import time
+
+import numpy as np
+
+from app.services.inference_batcher import InferenceBatcher
+
+
+class RecordingModel:
+    """Doubles its input and remembers the size of every batch"""
+
+    def __init__(self):
+        self.batch_sizes = []
+
+    def __call__(self, batch: np.ndarray) -> np.ndarray:
+        self.batch_sizes.append(len(batch))
+        return batch * 2
+
+
+async def submit_all(batcher: InferenceBatcher, count: int):
+    try:
+        return await asyncio.gather(*(batcher.submit(np.full(3, i, dtype=np.float32)) for i in range(count)))
+    finally:
+        await batcher.stop()
+
+
+def test_full_batches_flush_without_waiting():
+    model = RecordingModel()
+    batcher = InferenceBatcher(model, max_batch_size=4, max_wait_ms=10_000)
+    started = time.perf_counter()
+    results = asyncio.run(submit_all(batcher, 8))
+
+    assert time.perf_counter() - started < 5
+    assert model.batch_sizes == [4, 4]
+    assert [row.tolist() for row in results] == [[2.0 * i] * 3 for i in range(8)]
+
+
+def test_partial_batch_flushes_after_max_wait():
+    model = RecordingModel()
+    batcher = InferenceBatcher(model, max_batch_size=32, max_wait_ms=20)
+    started = time.perf_counter()
+    results = asyncio.run(submit_all(batcher, 3))
+
+    assert time.perf_counter() - started >= 0.02
+    assert model.batch_sizes == [3]
+    assert [row[0] for row in results] == [0.0, 2.0, 4.0]
+    assert batcher.stats()['batch_size_histogram'] == {3: 1}
+
+
+def test_batch_error_reaches_every_caller():
+    def broken(batch):
+        raise ValueError('model crashed')
+
+    async def run():
+        batcher = InferenceBatcher(broken, max_batch_size=4, max_wait_ms=5)
+        results = await asyncio.gather(*(batcher.submit(np.zeros(3)) for _ in range(3)), return_exceptions=True)
+        # The loop keeps serving after a failed batch
+        batcher.predict_fn = RecordingModel()
+        after = await batcher.submit(np.ones(3))
+        await batcher.stop()
+        return results, after
+
+    results, after = asyncio.run(run())
+    assert all(isinstance(result, ValueError) and str(result) == 'model crashed' for result in results)
+    assert after.tolist() == [2.0, 2.0, 2.0]
+
+
+def test_stop_fails_requests_in_a_forming_batch():
+    async def run():
+        batcher = InferenceBatcher(RecordingModel(), max_batch_size=4, max_wait_ms=10_000)
+        waiting = asyncio.ensure_future(batcher.submit(np.zeros(3)))
+        await asyncio.sleep(0.01)
+        await batcher.stop()
+        return await asyncio.gather(asyncio.wait_for(waiting, 1), return_exceptions=True)
+
+    (result,) = asyncio.run(run())
+    assert isinstance(result, RuntimeError) and 'stopped' in str(result)
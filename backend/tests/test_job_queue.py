@@ -0,0 +1,50 @@
+"""
+Local background jobs record their outcome, and back off instead of
+failing while the worker pool is saturated.
+"""
+import asyncio
+
+from app.services.job_queue import SATURATED_ATTEMPTS, JobServices, LocalJobQueue
+from app.services.worker_pool import PoolSaturatedError
+
+
+class SaturatedAIService:
+    """Rejects the first ``rejections`` calls as the saturated worker pool does"""
+
+    def __init__(self, rejections: int):
+        self.rejections = rejections
+        self.calls = 0
+
+    async def assess_loan(self, application, user_id=None):
+        self.calls += 1
+        if self.calls <= self.rejections:
+            raise PoolSaturatedError(retry_after=0)
+        return {'eligible': True, 'risk_score': 0.2, 'farm_size': application.farm_size}
+
+
+def run_loan_job(ai_service):
+    async def run():
+        queue = LocalJobQueue(JobServices(ai_service=ai_service))
+        job = await queue.enqueue('loan_assessment', {'farm_size': 2.5}, user_id='7')
+        await queue.join()
+        finished = await queue.get(job['job_id'])
+        await queue.close()
+        return finished
+
+    return asyncio.run(run())
+
+
+def test_saturated_pool_is_retried():
+    ai_service = SaturatedAIService(rejections=2)
+    job = run_loan_job(ai_service)
+    assert job['status'] == 'succeeded'
+    assert job['result'] == {'eligible': True, 'risk_score': 0.2, 'farm_size': 2.5}
+    assert ai_service.calls == 3
+
+
+def test_job_fails_once_retries_run_out():
+    ai_service = SaturatedAIService(rejections=SATURATED_ATTEMPTS)
+    job = run_loan_job(ai_service)
+    assert job['status'] == 'failed'
+    assert job['finished_at'] is not None
+    assert ai_service.calls == SATURATED_ATTEMPTS
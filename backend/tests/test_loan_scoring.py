@@ -0,0 +1,54 @@
+"""
+Bulk loan scoring gives every applicant the same assessment as the
+single-applicant endpoint, whoever else is in the file.
+"""
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from app.services.loan_scoring import LoanFeatureMatrix, synthetic_applicants
+from app.services.rng import RandomSource
+
+
+@pytest.fixture(scope='module')
+def service():
+    from app.services.ai_service import AIService
+
+    service = AIService()
+    service.random = RandomSource('reproducible', 1234)
+    return service
+
+
+def assess_bulk(service, applicants, chunk_size: int = 10000):
+    async def collect():
+        return [record async for record in service.assess_loans_bulk(applicants, chunk_size=chunk_size)]
+
+    records = asyncio.run(collect())
+    return [record['assessment'] for record in records if record['type'] == 'result']
+
+
+def assess_single(service, applicant):
+    fields = {k: v for k, v in applicant.items() if k != 'applicant_id'}
+    return asyncio.run(service.assess_loan(SimpleNamespace(**fields)))
+
+
+def test_bulk_matches_single(service):
+    applicants = synthetic_applicants(300)
+    bulk = assess_bulk(service, applicants, chunk_size=64)
+    assert bulk == [assess_single(service, applicant) for applicant in applicants]
+
+
+def test_bulk_result_independent_of_batch(service):
+    applicants = synthetic_applicants(200)
+    alone = assess_bulk(service, applicants[:1])
+    with_others = assess_bulk(service, applicants)
+    reordered = assess_bulk(service, applicants[::-1])
+    assert alone[0] == with_others[0] == reordered[-1]
+
+
+def test_row_fingerprints_depend_only_on_the_row():
+    applicants = synthetic_applicants(50)
+    features = LoanFeatureMatrix.from_records(applicants)
+    assert features.row_fingerprints()[10:20] == features.slice(10, 20).row_fingerprints()
+    assert len(set(features.row_fingerprints())) == len(applicants)
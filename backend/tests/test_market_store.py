@@ -0,0 +1,44 @@
+"""
+The market price file is ingested incrementally, and a malformed row is
+skipped and counted instead of stopping ingestion.
+"""
+import asyncio
+
+from app.services.market_store import CsvPriceSource, MarketDataEngine
+
+HEADER = 'crop,market,date,price,unit\n'
+
+
+def append_lines(path, *lines):
+    with open(path, 'a') as f:
+        f.writelines(line + '\n' for line in lines)
+
+
+def test_malformed_rows_are_skipped_and_ingestion_continues(tmp_path):
+    path = tmp_path / 'prices.csv'
+    path.write_text(HEADER + 'Maize,Nairobi,2024-03-01,45.0,KES/kg\n')
+    engine = MarketDataEngine(CsvPriceSource(str(path)))
+    assert asyncio.run(engine.refresh()) == 1
+
+    append_lines(path, 'Maize,Nairobi,2024-03-02,n/a,KES/kg', 'Maize,Nairobi,not a date,46.0,KES/kg')
+    append_lines(path, 'Maize,Nairobi,2024-03-03,47.0,KES/kg')
+    assert asyncio.run(engine.refresh()) == 1
+    assert engine.last_error is None
+    assert engine.store.stats()['rejected'] == 2
+
+    # The bad rows are behind the committed offset and are not read again
+    append_lines(path, 'Beans,Kisumu,2024-03-03,120.0,KES/kg')
+    assert asyncio.run(engine.refresh()) == 1
+    assert engine.store.stats()['rejected'] == 2
+    assert [row['date'] for row in engine.store.history('maize', 'nairobi')] == ['2024-03-01', '2024-03-03']
+
+
+def test_partial_last_line_waits_for_the_next_refresh(tmp_path):
+    path = tmp_path / 'prices.csv'
+    path.write_text(HEADER + 'Maize,Nairobi,2024-03-01,45.0,KES/kg\nMaize,Nairobi,2024-03-0')
+    engine = MarketDataEngine(CsvPriceSource(str(path)))
+    assert asyncio.run(engine.refresh()) == 1
+
+    append_lines(path, '2,46.0,KES/kg')
+    assert asyncio.run(engine.refresh()) == 1
+    assert engine.store.latest('Maize', 'Nairobi')['price'] == 46.0
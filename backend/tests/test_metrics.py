@@ -0,0 +1,90 @@
+"""
+/metrics serves the Prometheus text format, and requests are labelled by
+route template rather than raw path.
+"""
+import re
+
+import pytest
+
+from app.core.metrics import HTTP_REQUESTS, MetricsMiddleware, MetricsRegistry, render_latest
+
+# One sample line: name, optional {labels}, value
+SAMPLE = re.compile(r'^[a-zA-Z_:][a-zA-Z0-9_:]*(\{[a-zA-Z_][a-zA-Z0-9_]*="(\\.|[^"\\])*"(,[a-zA-Z_][a-zA-Z0-9_]*="(\\.|[^"\\])*")*\})? \S+$')
+
+
+def test_counter_and_gauge_exposition():
+    registry = MetricsRegistry()
+    requests = registry.counter('test_requests_total', 'Requests', ('route',))
+    requests.inc('/a')
+    requests.inc('/a', amount=2)
+    requests.inc('/b "quoted"\n')
+    in_flight = registry.gauge('test_in_flight', 'In flight')
+    in_flight.set(0.5)
+
+    assert registry.render().splitlines() == [
+        '# HELP test_requests_total Requests',
+        '# TYPE test_requests_total counter',
+        'test_requests_total{route="/a"} 3',
+        'test_requests_total{route="/b \\"quoted\\"\\n"} 1',
+        '# HELP test_in_flight In flight',
+        '# TYPE test_in_flight gauge',
+        'test_in_flight 0.5',
+    ]
+
+
+def test_histogram_buckets_are_cumulative():
+    registry = MetricsRegistry()
+    latency = registry.histogram('test_seconds', 'Latency', ('stage',), buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 3.0):
+        latency.observe(value, 'decode')
+
+    lines = registry.render().splitlines()
+    assert lines[1] == '# TYPE test_seconds histogram'
+    assert lines[2:] == [
+        'test_seconds_bucket{stage="decode",le="0.1"} 2',
+        'test_seconds_bucket{stage="decode",le="1"} 3',
+        'test_seconds_bucket{stage="decode",le="+Inf"} 4',
+        'test_seconds_sum{stage="decode"} 3.65',
+        'test_seconds_count{stage="decode"} 4',
+    ]
+
+
+def test_registry_rejects_a_name_reused_for_another_type():
+    registry = MetricsRegistry()
+    assert registry.counter('test_total', 'A') is registry.counter('test_total', 'A')
+    with pytest.raises(ValueError):
+        registry.gauge('test_total', 'A')
+
+
+def test_middleware_labels_route_templates():
+    from starlette.applications import Starlette
+    from starlette.responses import PlainTextResponse, Response
+    from starlette.routing import Route
+    from starlette.testclient import TestClient
+
+    async def weather(request):
+        return PlainTextResponse(request.path_params['location'])
+
+    async def metrics(request):
+        body, content_type = render_latest()
+        return Response(body, headers={'Content-Type': content_type})
+
+    app = Starlette(routes=[Route('/weather/{location}', weather), Route('/metrics', metrics)])
+    app.add_middleware(MetricsMiddleware)
+    before = HTTP_REQUESTS.value('GET', '/weather/{location}', '200')
+    unmatched_before = HTTP_REQUESTS.value('GET', 'unmatched', '404')
+
+    with TestClient(app) as client:
+        client.get('/weather/nakuru')
+        client.get('/weather/kisumu')
+        client.get('/no/such/path')
+        response = client.get('/metrics')
+
+    assert HTTP_REQUESTS.value('GET', '/weather/{location}', '200') == before + 2
+    assert HTTP_REQUESTS.value('GET', 'unmatched', '404') == unmatched_before + 1
+    assert response.headers['content-type'].startswith('text/plain; version=0.0.4')
+    body = response.text
+    assert body.endswith('\n')
+    assert 'nakuru' not in body
+    for line in body.splitlines():
+        assert line.startswith('# HELP ') or line.startswith('# TYPE ') or SAMPLE.match(line), line
@@ -0,0 +1,77 @@
+"""
+Exported backbones serve the same diseases as the Keras model they were
+exported from. The export tests need TensorFlow (and tf2onnx plus
+onnxruntime for ONNX) and are skipped without them.
+"""
+import numpy as np
+import pytest
+
+from app.services.crop_heads import CropHeads
+from app.services.inference_backends import InferenceBackend, KerasBackend, create_backend, model_path
+from app.services.model_export import EXPORTERS, check_parity, parity_batch
+from app.services.stub_models import StubBackend
+
+DISEASE_CLASSES = {
+    'maize': ['Healthy', 'Leaf Blight', 'Rust', 'Gray Leaf Spot'],
+    'beans': ['Healthy', 'Angular Leaf Spot', 'Bean Rust'],
+}
+
+
+class ShiftedBackend(StubBackend):
+    name = 'shifted'
+
+    def __init__(self, shift: float):
+        super().__init__()
+        self.shift = shift
+
+    def predict(self, batch: np.ndarray) -> np.ndarray:
+        return super().predict(batch) + self.shift
+
+
+@pytest.fixture(scope='module')
+def batch():
+    return parity_batch(count=8)
+
+
+def heads_for(backend: InferenceBackend) -> CropHeads:
+    return CropHeads.initialize(DISEASE_CLASSES, backend.output_size)
+
+
+def test_identical_backends_pass(batch):
+    reference = StubBackend()
+    report = check_parity(reference, StubBackend(), batch, heads_for(reference))
+    assert report['passed']
+    assert report['top1_agreement'] == 1.0
+    assert set(report['crops']) == set(DISEASE_CLASSES)
+
+
+def test_feature_drift_fails_the_check(batch):
+    reference = StubBackend()
+    report = check_parity(reference, ShiftedBackend(1e-2), batch, heads_for(reference), atol=1e-4)
+    assert not report['passed']
+    assert report['max_abs_diff'] == pytest.approx(1e-2)
+
+
+@pytest.fixture(scope='module')
+def keras_backend():
+    tf = pytest.importorskip('tensorflow')
+    tf.keras.utils.set_random_seed(0)
+    model = tf.keras.Sequential([
+        tf.keras.Input((224, 224, 3)),
+        tf.keras.layers.Conv2D(4, 3, strides=4, activation='relu'),
+        tf.keras.layers.GlobalAveragePooling2D(),
+        tf.keras.layers.Dense(16, activation='relu'),
+    ])
+    return KerasBackend(model)
+
+
+@pytest.mark.parametrize('backend', sorted(EXPORTERS))
+def test_exported_backend_matches_keras(backend, keras_backend, batch, tmp_path):
+    if backend == 'onnx':
+        pytest.importorskip('tf2onnx')
+        pytest.importorskip('onnxruntime')
+    path = model_path(str(tmp_path), 'test', backend)
+    EXPORTERS[backend](keras_backend.model, path)
+
+    report = check_parity(keras_backend, create_backend(backend, path), batch, heads_for(keras_backend))
+    assert report['passed'], report
@@ -0,0 +1,70 @@
+"""
+Models still loading are reported as not ready instead of blocking the
+request, unless the caller asked to wait.
+"""
+import asyncio
+import threading
+
+import pytest
+
+from app.services.model_registry import ModelNotReadyError, ModelRegistry
+
+
+@pytest.fixture
+def registry():
+    registry = ModelRegistry(max_workers=2)
+    yield registry
+    registry.shutdown()
+
+
+def blocking_loader(release: threading.Event, model='model'):
+    def load():
+        release.wait(5)
+        return model
+    return load
+
+
+def test_zero_timeout_does_not_wait(registry):
+    release = threading.Event()
+    registry.register('slow', blocking_loader(release))
+    try:
+        with pytest.raises(ModelNotReadyError):
+            asyncio.run(asyncio.wait_for(registry.get('slow', timeout=0), 1))
+    finally:
+        release.set()
+
+
+def test_timeout_elapses_while_loading(registry):
+    release = threading.Event()
+    registry.register('slow', blocking_loader(release))
+    try:
+        with pytest.raises(ModelNotReadyError):
+            asyncio.run(registry.get('slow', timeout=0.05))
+        assert registry.status()['slow']['status'] == 'loading'
+    finally:
+        release.set()
+
+
+def test_none_waits_for_the_load(registry):
+    release = threading.Event()
+    registry.register('slow', blocking_loader(release))
+
+    async def get_after_release():
+        waiting = asyncio.ensure_future(registry.get('slow', timeout=None))
+        await asyncio.sleep(0.05)
+        assert not waiting.done()
+        release.set()
+        return await waiting
+
+    assert asyncio.run(get_after_release()) == 'model'
+    assert asyncio.run(registry.get('slow', timeout=0)) == 'model'
+
+
+def test_failed_load_is_not_ready(registry):
+    def fail():
+        raise RuntimeError('missing weights')
+
+    registry.register('broken', fail)
+    with pytest.raises(ModelNotReadyError):
+        asyncio.run(registry.get('broken', timeout=1))
+    assert registry.status()['broken'] == {'status': 'failed', 'load_time_s': None, 'error': 'missing weights'}
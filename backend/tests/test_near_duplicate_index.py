@@ -0,0 +1,88 @@
+"""
+The multi-index hash table finds exactly the entries a brute-force scan
+finds within the Hamming radius, evicts the oldest entries when full, and
+dHash matches recompressed copies of an image.
+"""
+import io
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from app.services.image_preprocessing import compute_dhash
+from app.services.near_duplicate_index import HammingIndex, NearDuplicateIndex, popcount64
+
+
+def flip_bits(phash: int, bits) -> int:
+    for bit in bits:
+        phash ^= 1 << int(bit)
+    return phash
+
+
+def test_popcount64():
+    values = np.array([0, 1, 0xFF, 2 ** 64 - 1, 0x8000000000000001], dtype=np.uint64)
+    assert popcount64(values).tolist() == [0, 1, 8, 64, 2]
+
+
+@pytest.mark.parametrize('distance', range(6))
+def test_search_finds_hashes_within_the_radius(distance):
+    rng = np.random.default_rng(distance)
+    index = HammingIndex(capacity=100, max_distance=4)
+    stored = int(rng.integers(0, 2 ** 63)) << 1
+    index.add(stored, 'stored')
+
+    query = flip_bits(stored, rng.choice(64, size=distance, replace=False))
+    match = index.search(query)
+    if distance <= 4:
+        assert match == (distance, 'stored')
+    else:
+        assert match is None
+
+
+def test_search_agrees_with_brute_force():
+    rng = np.random.default_rng(0)
+    index = HammingIndex(capacity=2000, max_distance=4)
+    hashes = [int(h) for h in rng.integers(0, 2 ** 63, size=1000, dtype=np.int64)]
+    for position, phash in enumerate(hashes):
+        index.add(phash, position)
+
+    stored = np.array(hashes, dtype=np.uint64)
+    for position in rng.choice(len(hashes), size=200):
+        query = flip_bits(hashes[position], rng.choice(64, size=rng.integers(0, 7), replace=False))
+        distances = popcount64(stored ^ np.uint64(query))
+        nearest = int(distances.min())
+        match = index.search(query)
+        if nearest <= 4:
+            assert match is not None and match[0] == nearest
+            assert distances[match[1]] == nearest
+        else:
+            assert match is None
+
+
+def test_oldest_entries_are_evicted():
+    index = HammingIndex(capacity=3, max_distance=2)
+    for value, phash in enumerate([0x0F, 0xF0F0, 0xFF0000, 0xF000000000]):
+        index.add(phash, value)
+    assert len(index) == 3
+    assert index.search(0x0F) is None
+    assert index.search(0xF000000000) == (0, 3)
+
+
+def test_indexes_are_per_crop():
+    index = NearDuplicateIndex(max_distance=4)
+    index.add('maize', 0xABCDEF, {'disease': 'Rust'})
+    assert index.lookup('maize', 0xABCDEF ^ 0b101) == {'disease': 'Rust'}
+    assert index.lookup('beans', 0xABCDEF) is None
+    assert index.stats()['hits'] == 1 and index.stats()['lookups'] == 2
+
+
+def test_dhash_survives_recompression():
+    rng = np.random.default_rng(0)
+    pixels = np.kron(rng.integers(0, 256, (12, 12, 3)), np.ones((40, 40, 1))).astype(np.uint8)
+    original = Image.fromarray(pixels)
+    buffer = io.BytesIO()
+    original.resize((320, 320)).save(buffer, 'JPEG', quality=60)
+    recompressed = Image.open(io.BytesIO(buffer.getvalue()))
+
+    distance = bin(compute_dhash(original) ^ compute_dhash(recompressed)).count('1')
+    assert distance <= 4
@@ -0,0 +1,64 @@
+"""
+Text classification batches texts of similar length together, within the
+batch size and padded-token budget, and returns results in input order.
+"""
+import numpy as np
+
+from app.services.stub_models import StubTextPipeline
+from app.services.text_inference import TextClassifier, length_buckets
+
+
+def test_buckets_respect_batch_size_and_token_budget():
+    rng = np.random.default_rng(0)
+    lengths = rng.integers(1, 120, size=500).tolist()
+
+    buckets = length_buckets(lengths, max_batch_size=16, max_tokens=512)
+
+    covered = np.concatenate(buckets)
+    assert sorted(covered.tolist()) == list(range(len(lengths)))
+    for bucket in buckets:
+        longest = max(lengths[i] for i in bucket)
+        assert 1 <= len(bucket) <= 16
+        assert len(bucket) * longest <= 512
+    # Sorted by length, so consecutive buckets don't overlap in length
+    for previous, current in zip(buckets, buckets[1:]):
+        assert max(lengths[i] for i in previous) <= min(lengths[i] for i in current)
+
+
+def test_sequence_over_the_token_budget_runs_alone():
+    buckets = length_buckets([5, 900, 5], max_batch_size=8, max_tokens=100)
+    assert [bucket.tolist() for bucket in buckets] == [[0, 2], [1]]
+
+
+def test_without_a_token_budget_only_batch_size_applies():
+    buckets = length_buckets([50] * 10, max_batch_size=4)
+    assert [len(bucket) for bucket in buckets] == [4, 4, 2]
+
+
+class RecordingPipeline(StubTextPipeline):
+    def __init__(self, task: str):
+        super().__init__(task)
+        self.calls = []
+
+    def __call__(self, inputs, **kwargs):
+        self.calls.append(list(inputs))
+        return super().__call__(inputs, **kwargs)
+
+
+def test_results_come_back_in_input_order():
+    texts = ['maize ' * n for n in (30, 1, 12, 2, 30, 7, 1)]
+    pipeline = RecordingPipeline('sentiment-analysis')
+    classifier = TextClassifier(pipeline, max_batch_size=3, max_tokens=1000)
+
+    results = classifier.classify(texts)
+
+    assert results == StubTextPipeline('sentiment-analysis')(texts)
+    assert all(len(call) <= 3 for call in pipeline.calls)
+    assert sorted(text for call in pipeline.calls for text in call) == sorted(texts)
+    # Shortest texts go first
+    assert pipeline.calls[0] == ['maize ', 'maize ', 'maize ' * 2]
+    assert classifier.stats()['texts'] == len(texts)
+
+
+def test_empty_input():
+    assert TextClassifier(StubTextPipeline('sentiment-analysis')).classify([]) == []
@@ -0,0 +1,96 @@
+"""
+Streaming voice: mu-law decoding, VAD utterance boundaries, and an intent
+sent as soon as the partial transcript is confident, before the final one.
+"""
+import numpy as np
+
+from app.services.stub_models import StubStreamRecognizer
+from app.services.voice_streaming import MULAW_TO_PCM16, EnergyVAD, IntentMatcher, VoiceStreamSession
+
+RATE = 16000
+
+
+def reference_mulaw(code: int) -> int:
+    """G.711 mu-law decoding, one byte at a time"""
+    code = ~code & 0xFF
+    magnitude = (((code & 0x0F) << 3) + 0x84) << ((code >> 4) & 0x07)
+    return 0x84 - magnitude if code & 0x80 else magnitude - 0x84
+
+
+def make_speech(speech_seconds: float, silence_seconds: float = 0.5, seed: int = 0) -> bytes:
+    """Background noise, then loud noise, then a second of background"""
+    rng = np.random.default_rng(seed)
+    audio = rng.normal(0, 60, int(RATE * (silence_seconds + speech_seconds + 1.0)))
+    start, end = int(RATE * silence_seconds), int(RATE * (silence_seconds + speech_seconds))
+    audio[start:end] += rng.normal(0, 4000, end - start)
+    return np.clip(audio, -32768, 32767).astype('<i2').tobytes()
+
+
+def stream(session: VoiceStreamSession, audio: bytes, chunk_bytes: int = 3200):
+    events = []
+    for offset in range(0, len(audio), chunk_bytes):
+        events.extend(session.feed(audio[offset:offset + chunk_bytes]))
+    return events + session.finish()
+
+
+def test_mulaw_table_matches_g711():
+    assert MULAW_TO_PCM16.dtype == np.dtype('<i2')
+    assert MULAW_TO_PCM16.tolist() == [reference_mulaw(code) for code in range(256)]
+    assert MULAW_TO_PCM16[0xFF] == 0 and MULAW_TO_PCM16[0x7F] == 0
+    assert MULAW_TO_PCM16[0x80] == 32124 and MULAW_TO_PCM16[0x00] == -32124
+
+
+def test_vad_needs_a_run_of_frames_to_start_and_end():
+    vad = EnergyVAD(start_frames=3, end_frames=4)
+    quiet, loud = -70.0, -10.0
+
+    # A two-frame click doesn't open an utterance
+    assert [vad.update(e) for e in (quiet, loud, loud, quiet)] == [None] * 4
+    assert [vad.update(loud) for _ in range(3)] == [None, None, 'start']
+    # A short pause doesn't close it
+    assert [vad.update(e) for e in (quiet, quiet, quiet, loud)] == [None] * 4
+    assert [vad.update(quiet) for _ in range(4)] == [None, None, None, 'end']
+    assert not vad.active
+
+
+def test_plural_keywords_match():
+    intents = IntentMatcher()
+    assert intents.match('my maize leaves have spots')['action'] == 'disease_detection'
+    assert intents.match('Prices at the markets?') == {'action': 'market_prices', 'confidence': 0.84}
+    assert intents.match('hello there') is None
+
+
+def test_intent_is_sent_before_the_final_transcript():
+    session = VoiceStreamSession(lambda: StubStreamRecognizer('english', RATE), RATE)
+
+    events = stream(session, make_speech(3.0))
+
+    types = [event['type'] for event in events]
+    assert types[0] == 'speech_start'
+    assert types.count('final') == 1 and types[-1] == 'final'
+    intent = events[types.index('intent')]
+    assert intent['early'] and intent['action'] == 'market_prices'
+    assert intent['confidence'] >= session.intent_confidence
+    # Sent on the partial that first reached the second keyword, not the whole sentence
+    assert intent['text'] == 'what is the price of maize at the market'
+    assert intent['at_ms'] < events[-1]['at_ms']
+    assert events[-1]['text'] == 'what is the price of maize at the market today'
+    assert events[-1]['intent']['action'] == 'market_prices'
+    assert session.early_intents == 1
+
+
+def test_silence_produces_no_events():
+    session = VoiceStreamSession(lambda: StubStreamRecognizer('english', RATE), RATE)
+    assert stream(session, make_speech(0.0)) == []
+    assert session.utterances == 0
+
+
+def test_long_speech_is_cut_into_utterances():
+    session = VoiceStreamSession(lambda: StubStreamRecognizer('english', RATE), RATE, max_utterance_seconds=1.0)
+
+    events = stream(session, make_speech(3.0))
+
+    types = [event['type'] for event in events]
+    assert types.count('final') == session.utterances >= 2
+    # Every cut utterance is followed by a fresh start for the speech that continues
+    assert types.count('speech_start') == types.count('final')
@@ -0,0 +1,80 @@
+"""
+Requests beyond the worker pool's admission limit are turned away with a
+retry hint, which the API answers with 503 and Retry-After.
+"""
+import asyncio
+import io
+
+import numpy as np
+import pytest
+
+from app.services.worker_pool import CPUWorkerPool, PoolSaturatedError
+
+
+def jpeg_bytes() -> bytes:
+    from PIL import Image
+
+    buffer = io.BytesIO()
+    Image.fromarray(np.zeros((32, 32, 3), dtype=np.uint8)).save(buffer, 'JPEG')
+    return buffer.getvalue()
+
+
+def test_slot_rejects_beyond_max_pending():
+    pool = CPUWorkerPool(max_workers=1, max_pending=2, retry_after=7)
+
+    async def run():
+        async with pool.slot(), pool.slot():
+            with pytest.raises(PoolSaturatedError) as rejected:
+                async with pool.slot():
+                    pass
+        # Admitted again once the slots are released
+        async with pool.slot():
+            return rejected.value
+
+    error = asyncio.run(run())
+    assert error.retry_after == 7
+    assert pool.stats()['rejected'] == 1
+    assert pool.stats()['admitted'] == 3
+    assert pool.in_flight == 0
+
+
+def test_saturated_pool_rejects_disease_detection(monkeypatch):
+    monkeypatch.setenv('STUB_MODELS', 'true')
+    from app.services.ai_service import AIService
+
+    service = AIService()
+    service.cpu_pool = CPUWorkerPool(max_workers=1, max_pending=1, retry_after=3)
+
+    async def run():
+        await service.initialize_models()
+        try:
+            async with service.cpu_pool.slot():
+                with pytest.raises(PoolSaturatedError):
+                    await service.detect_disease_from_bytes(jpeg_bytes())
+            return await service.detect_disease_from_bytes(jpeg_bytes())
+        finally:
+            await service.shutdown()
+
+    assert 'disease' in asyncio.run(run())
+
+
+def test_saturated_pool_returns_503(monkeypatch):
+    # main imports the app's settings and database modules
+    pytest.importorskip('app.core.config')
+    from fastapi.testclient import TestClient
+
+    import main
+
+    async def saturated(*args, **kwargs):
+        raise PoolSaturatedError(retry_after=3)
+
+    monkeypatch.setattr(main.ai_service, 'detect_disease', saturated)
+    main.app.dependency_overrides[main.get_current_user] = lambda: 'farmer'
+    try:
+        response = TestClient(main.app).post(
+            '/api/v1/disease-detection', files={'file': ('leaf.jpg', jpeg_bytes(), 'image/jpeg')}
+        )
+    finally:
+        main.app.dependency_overrides.clear()
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '3'